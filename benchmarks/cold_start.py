@@ -0,0 +1,162 @@
+'''
+Benchmark the cold start of each Cloud Function: the time to import its
+main module in a fresh interpreter, and then the time to construct the
+clients its first request needs.
+
+Clients are constructed for real, but with anonymous credentials, and the
+Secret Manager lookup of the API key is stubbed, so no network round-trip
+is measured. Constructing a client at import time again shows up as a
+longer import.
+
+Usage:
+    python benchmarks/cold_start.py --repeat 5
+    python benchmarks/cold_start.py --functions ingest_locations update_stops
+'''
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+cloud_path = Path(__file__).resolve().parents[1] / 'cloud'
+
+# Function: list_functions
+
+
+def list_functions() -> list:
+    '''
+    List the Cloud Functions, i.e. the directories of cloud holding a
+    main.py.
+
+    Returns:
+        list: The names of the functions.
+    '''
+
+    return sorted(path.parent.name for path in cloud_path.glob('*/main.py'))
+
+# Function: measure_cold_start
+
+
+def measure_cold_start(function: str) -> dict:
+    '''
+    Import the main module of a function and construct its clients, in the
+    current interpreter, which must not have imported them yet.
+
+    Args:
+        function (str): The name of the function.
+
+    Returns:
+        dict: The import and first-request times, in seconds.
+    '''
+
+    sys.path.insert(0, str(cloud_path / function))
+
+    start = time.perf_counter()
+
+    import main  # noqa: F401
+
+    imported = time.perf_counter()
+
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import bigquery
+    import clients
+
+    class BenchmarkBigQueryClient(bigquery.Client):
+        def __init__(self, *args, **kwargs):
+            super().__init__(project='cold-start-benchmark', credentials=AnonymousCredentials())
+
+    bigquery.Client = BenchmarkBigQueryClient
+
+    getters = [clients.get_bigquery_client]
+
+    if (cloud_path / function / 'keys.py').exists():
+        from google.cloud import secretmanager
+        import keys
+
+        class BenchmarkSecretManagerServiceClient(secretmanager.SecretManagerServiceClient):
+            def __init__(self, *args, **kwargs):
+                super().__init__(credentials=AnonymousCredentials())
+
+            def get_secret(self, request):
+                return secretmanager.Secret(
+                    name=request['name'],
+                    labels={'api_curitiba_156': 'cold-start-benchmark'}
+                )
+
+        secretmanager.SecretManagerServiceClient = BenchmarkSecretManagerServiceClient
+
+        getters.append(keys.get_api_key_bus_data)
+
+    ready = time.perf_counter()
+
+    for getter in getters:
+        getter()
+
+    requested = time.perf_counter()
+
+    return {
+        'import': imported - start,
+        'first_request': requested - ready
+    }
+
+# Function: run_cold_start
+
+
+def run_cold_start(function: str) -> dict:
+    '''
+    Measure the cold start of a function in a fresh interpreter.
+
+    Args:
+        function (str): The name of the function.
+
+    Returns:
+        dict: The interpreter, import and first-request times, in seconds.
+    '''
+
+    start = time.perf_counter()
+
+    completed = subprocess.run(
+        [sys.executable, __file__, '--child', function],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    total = time.perf_counter() - start
+
+    timing = json.loads(completed.stdout.strip().splitlines()[-1])
+    timing['process'] = total
+
+    return timing
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the cold start of the Cloud Functions.')
+    parser.add_argument('--functions', nargs='+', default=None)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure_cold_start(function=args.child)))
+        sys.exit()
+
+    functions = list_functions() if args.functions is None else args.functions
+
+    print('{0:<24} {1:>12} {2:>16} {3:>12}'.format('function', 'import (ms)', 'first req. (ms)', 'process (ms)'))
+
+    for function in functions:
+        timings = [run_cold_start(function=function) for _ in range(args.repeat)]
+
+        print(
+            '{0:<24} {1:12.1f} {2:16.1f} {3:12.1f}'.format(
+                function,
+                *[
+                    statistics.median(timing[key] for timing in timings) * 1e3
+                    for key in ['import', 'first_request', 'process']
+                ]
+            )
+        )
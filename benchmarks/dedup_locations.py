@@ -0,0 +1,179 @@
+'''
+Benchmark the deduplication of a set of locations against 1M recent
+locations: the original four independent isin checks, the exact
+composite-key fingerprint membership test over the whole window, and
+drop_seen_locations, which ingest_locations and the poller use, against
+the last-seen index summarized from the same recent locations, with its
+fingerprints stored and rehashed at every call.
+
+Rehashing a 1M-row window costs more than the four isin checks it would
+replace; drop_seen_locations only hashes the new locations and compares
+each one with the stored fingerprint of its own vehicle.
+
+Usage:
+    python benchmarks/dedup_locations.py --recent 1000000 --new 3000
+'''
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from timing import measure, report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cloud' / 'ingest_locations'))
+
+from fetch import fingerprint_locations  # noqa: E402
+from state import drop_seen_locations, summarize_last_seen  # noqa: E402
+
+# Function: generate_locations
+
+
+def generate_locations(
+        n_locations: int,
+        n_vehicles: int,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        seed: int = 0
+    ) -> pd.DataFrame:
+    '''
+    Generate locations of a fleet with minute-resolution update times.
+
+    Args:
+        n_locations (int): The number of locations.
+        n_vehicles (int): The number of vehicles.
+        start, end (pd.Timestamp): The range of update times.
+        seed (int): The random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: The locations.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    minutes = int((end - start) / pd.Timedelta(minutes=1))
+
+    return pd.DataFrame(
+        data={
+            'fleet_number': pd.Series(rng.integers(0, n_vehicles, n_locations)).map('BC{0:04d}'.format),
+            'update_datetime': start + pd.to_timedelta(rng.integers(0, minutes + 1, n_locations), unit='min'),
+            'latitude': (-25.43 + rng.uniform(-0.1, 0.1, n_locations)).astype(np.float32),
+            'longitude': (-49.27 + rng.uniform(-0.1, 0.1, n_locations)).astype(np.float32),
+            'line_number': '216'
+        }
+    )
+
+# Function: legacy_drop_potential_location_duplicates
+
+
+def legacy_drop_potential_location_duplicates(
+        recent_locations: pd.DataFrame,
+        set_of_locations: pd.DataFrame
+    ) -> pd.DataFrame:
+    '''
+    Drop locations as drop_potential_location_duplicates originally did,
+    whenever each key value appears on any recent location.
+    '''
+
+    condition = (
+        set_of_locations['fleet_number'].isin(recent_locations['fleet_number'])
+        & set_of_locations['update_datetime'].isin(recent_locations['update_datetime'])
+        & set_of_locations['latitude'].isin(recent_locations['latitude'])
+        & set_of_locations['longitude'].isin(recent_locations['longitude'])
+    )
+
+    return set_of_locations.loc[~condition]
+
+# Function: drop_recent_fingerprints
+
+
+def drop_recent_fingerprints(
+        recent_locations: pd.DataFrame,
+        set_of_locations: pd.DataFrame
+    ) -> pd.DataFrame:
+    '''
+    Drop locations whose composite-key fingerprint is among those of the
+    recent locations.
+    '''
+
+    recent_fingerprints = fingerprint_locations(locations=recent_locations)
+    fingerprints = fingerprint_locations(locations=set_of_locations)
+
+    return set_of_locations.loc[~fingerprints.isin(recent_fingerprints.to_numpy())]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the deduplication of locations.')
+    parser.add_argument('--recent', type=int, default=1000000)
+    parser.add_argument('--new', type=int, default=3000)
+    parser.add_argument('--vehicles', type=int, default=1500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    now = pd.Timestamp('2024-06-12 15:00', tz='America/Sao_Paulo')
+
+    recent_locations = generate_locations(
+        n_locations=args.recent,
+        n_vehicles=args.vehicles,
+        start=now - pd.Timedelta(hours=3),
+        end=now
+    )
+
+    # Half of the new locations are true duplicates of recent ones, and the
+    # others were reported within the last two minutes.
+    set_of_locations = pd.concat(
+        objs=[
+            recent_locations.sample(n=args.new // 2, random_state=0),
+            generate_locations(
+                n_locations=args.new - args.new // 2,
+                n_vehicles=args.vehicles,
+                start=now + pd.Timedelta(minutes=1),
+                end=now + pd.Timedelta(minutes=2),
+                seed=1
+            )
+        ],
+        ignore_index=True
+    )
+
+    legacy = measure(
+        lambda: legacy_drop_potential_location_duplicates(recent_locations, set_of_locations),
+        repeat=args.repeat
+    )
+    fingerprint = measure(
+        lambda: drop_recent_fingerprints(recent_locations, set_of_locations),
+        repeat=args.repeat
+    )
+    summary = measure(
+        lambda: summarize_last_seen(locations=recent_locations),
+        repeat=args.repeat
+    )
+    last_seen = summary['value']
+    live = measure(
+        lambda: drop_seen_locations(last_seen=last_seen, set_of_locations=set_of_locations),
+        repeat=args.repeat
+    )
+    rehashed = measure(
+        lambda: drop_seen_locations(last_seen=last_seen.drop(columns='fingerprint'), set_of_locations=set_of_locations),
+        repeat=args.repeat
+    )
+    hashing = measure(
+        lambda: fingerprint_locations(locations=set_of_locations),
+        repeat=args.repeat
+    )
+
+    pd.testing.assert_frame_equal(live['value'], rehashed['value'])
+
+    print('{0:,} recent locations, {1:,} new locations:'.format(args.recent, args.new))
+    report('  legacy four isin checks', legacy)
+    report('  fingerprint membership, whole window', fingerprint)
+    report('  summarize_last_seen (bootstrap only)', summary)
+    report('  drop_seen_locations, stored', live)
+    report('  drop_seen_locations, rehashed', rehashed)
+    report('  fingerprint_locations, new only', hashing)
+    print(
+        '  kept: legacy {0:,}, fingerprint {1:,}, drop_seen_locations {2:,}'.format(
+            legacy['value'].shape[0],
+            fingerprint['value'].shape[0],
+            live['value'].shape[0]
+        )
+    )
@@ -0,0 +1,152 @@
+'''
+Benchmark the batched map-matching of curitiba_bus_eta.matching on a
+synthetic network sized like the full one: building the RouteMatcher once,
+then snapping a batch of vehicle locations onto the routes of their lines,
+checked against an exhaustive search over every segment of each line.
+
+Usage:
+    python benchmarks/match_locations.py --lines 300 --points 1500 --locations 20000
+'''
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from network import generate_network, meters_per_degree
+from timing import measure, report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from curitiba_bus_eta.geometry import distances_to_segments, project  # noqa: E402
+from curitiba_bus_eta.matching import RouteMatcher  # noqa: E402
+
+# Function: generate_locations
+
+
+def generate_locations(
+        routes_unified: pd.DataFrame,
+        n_locations: int,
+        noise: float = 15,
+        seed: int = 1
+    ) -> pd.DataFrame:
+    '''
+    Place vehicle locations at random along the routes, a few meters off
+    them.
+
+    Args:
+        routes_unified (pd.DataFrame): The routes, sorted by line and order.
+        n_locations (int): The number of locations.
+        noise (float): The standard deviation, in meters, of the offset of
+            each location from its route. Defaults to 15.
+        seed (int): The random seed. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: The locations, with columns line_number, latitude and
+            longitude.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    line_numbers = routes_unified['line_number'].to_numpy()
+    coordinates = routes_unified[['latitude', 'longitude']].to_numpy(dtype=float)
+
+    # Pick segments, i.e. points followed by a point of the same line.
+    starts = np.flatnonzero(line_numbers[1:] == line_numbers[:-1])
+    starts = starts[rng.integers(0, len(starts), n_locations)]
+
+    fractions = rng.random(n_locations)[:, np.newaxis]
+    points = coordinates[starts] * (1 - fractions) + coordinates[starts + 1] * fractions
+    points += rng.normal(0, noise, points.shape) / meters_per_degree
+
+    return pd.DataFrame(
+        data={
+            'line_number': line_numbers[starts],
+            'latitude': points[:, 0],
+            'longitude': points[:, 1]
+        }
+    )
+
+# Function: exhaustive_match
+
+
+def exhaustive_match(
+        matcher: RouteMatcher,
+        locations: pd.DataFrame,
+        max_distance: float
+    ) -> np.ndarray:
+    '''
+    Match locations by comparing each one with every segment of its line,
+    keeping the closest, then earliest, segment within max_distance.
+
+    Returns:
+        np.ndarray: The index of the matched segment of each location, or
+            -1 if unmatched.
+    '''
+
+    P = project(locations[['latitude', 'longitude']].to_numpy(dtype=float), matcher.origin)
+    line_codes = np.searchsorted(matcher.line_numbers, locations['line_number'].to_numpy(dtype=str))
+
+    segments = np.full(len(P), -1)
+
+    for index, (point, line_code) in enumerate(zip(P, line_codes)):
+        segment_ids = np.flatnonzero(matcher.segment_lines == line_code)
+        distances, _ = distances_to_segments(matcher.A[segment_ids], matcher.B[segment_ids], point)
+        distances = np.abs(distances)
+
+        if distances.min() <= max_distance:
+            segments[index] = segment_ids[np.argmin(distances)]
+
+    return segments
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the map-matching of locations onto unified routes.')
+    parser.add_argument('--lines', type=int, default=300)
+    parser.add_argument('--points', type=int, default=1500)
+    parser.add_argument('--locations', type=int, default=20000)
+    parser.add_argument('--exhaustive-locations', type=int, default=500)
+    parser.add_argument('--max-distance', type=float, default=50)
+    parser.add_argument('--cell-size', type=float, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # One unified route per line: the outbound route of the synthetic network.
+    routes, _, _ = generate_network(n_lines=args.lines, n_points=args.points, n_stops=2)
+    routes_unified = routes.loc[routes['route_id'] % 2 == 0, ['line_number', 'order', 'latitude', 'longitude']]
+    routes_unified = routes_unified.reset_index(drop=True)
+
+    locations = generate_locations(routes_unified=routes_unified, n_locations=args.locations)
+
+    build = measure(lambda: RouteMatcher(routes_unified, cell_size=args.cell_size), repeat=args.repeat)
+    matcher = build['value']
+
+    match = measure(lambda: matcher.match(locations, max_distance=args.max_distance), repeat=args.repeat)
+    matched = match['value']
+
+    sample = locations.iloc[:args.exhaustive_locations]
+    exhaustive = measure(
+        lambda: exhaustive_match(matcher=matcher, locations=sample, max_distance=args.max_distance),
+        repeat=1
+    )
+
+    segments, _, _ = matcher.match_arrays(
+        sample['line_number'].to_numpy(dtype=str),
+        sample[['latitude', 'longitude']].to_numpy(dtype=float),
+        max_distance=args.max_distance
+    )
+    np.testing.assert_array_equal(segments, exhaustive['value'])
+
+    print(
+        '{0:,} lines x {1:,} points ({2:,} segments), {3:,} locations, {4:g} m:'.format(
+            args.lines,
+            args.points,
+            len(matcher.A),
+            args.locations,
+            args.max_distance
+        )
+    )
+    report('  build', build)
+    report('  match, batched', match, items=args.locations, unit='locations')
+    report('  exhaustive search', exhaustive, items=args.exhaustive_locations, unit='locations')
+    print('  matched: {0:.1%}'.format((matched['segment_order'] >= 0).mean()))
@@ -0,0 +1,233 @@
+'''
+Synthetic bus networks for the benchmarks, shaped like the routes.routes
+and routes.stops tables: each line has an outbound and an inbound route,
+each matched to an itinerary whose stops lie a few meters off the route.
+'''
+
+import numpy as np
+import pandas as pd
+
+# Preamble.
+
+# The center of Curitiba.
+center = np.array([-25.4284, -49.2733])
+
+# Meters per degree of latitude.
+meters_per_degree = 111195.0
+
+# Function: generate_shape
+
+
+def generate_shape(
+        rng: np.random.Generator,
+        n_points: int,
+        spacing: float = 15,
+        extent: float = 10000
+    ) -> np.ndarray:
+    '''
+    Generate a route shape as a random walk with smooth turns and the odd
+    street corner.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        n_points (int): The number of points.
+        spacing (float): The mean distance, in meters, between consecutive
+            points. Defaults to 15.
+        extent (float): The largest distance, in meters, from the center
+            of the city to the start of the shape. Defaults to 10000.
+
+    Returns:
+        np.ndarray: Array of shape (n_points, 2) holding (latitude,
+            longitude) pairs.
+    '''
+
+    turns = rng.normal(0, np.radians(5), n_points)
+    turns[rng.random(n_points) < 0.01] += rng.choice([-1, 1], 1) * np.pi / 2
+
+    headings = rng.uniform(0, 2 * np.pi) + np.cumsum(turns)
+    steps = spacing * rng.uniform(0.5, 1.5, n_points)
+
+    xy = rng.uniform(-extent, extent, 2) + np.cumsum(
+        np.column_stack([steps * np.sin(headings), steps * np.cos(headings)]),
+        axis=0
+    )
+
+    latitudes = center[0] + xy[:, 1] / meters_per_degree
+    longitudes = center[1] + xy[:, 0] / (meters_per_degree * np.cos(np.radians(center[0])))
+
+    return np.column_stack([latitudes, longitudes])
+
+# Function: generate_stops
+
+
+def generate_stops(
+        rng: np.random.Generator,
+        shape: np.ndarray,
+        n_stops: int,
+        noise: float = 10
+    ) -> np.ndarray:
+    '''
+    Place stops along a route shape, in order, a few meters off it.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        shape (np.ndarray): The (latitude, longitude) pairs of the shape.
+        n_stops (int): The number of stops.
+        noise (float): The standard deviation, in meters, of the offset of
+            each stop from the shape. Defaults to 10.
+
+    Returns:
+        np.ndarray: Array of shape (n_stops, 2) holding (latitude,
+            longitude) pairs.
+    '''
+
+    positions = np.linspace(0, shape.shape[0] - 1, n_stops)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, shape.shape[0] - 1)
+    fractions = (positions - lower)[:, np.newaxis]
+
+    stops = shape[lower] * (1 - fractions) + shape[upper] * fractions
+
+    return stops + rng.normal(0, noise, stops.shape) / meters_per_degree
+
+# Function: generate_network
+
+
+def generate_network(
+        n_lines: int,
+        n_points: int,
+        n_stops: int,
+        seed: int = 0
+    ) -> tuple:
+    '''
+    Generate a network of lines, each with an outbound and an inbound
+    route and their itineraries.
+
+    Args:
+        n_lines (int): The number of lines.
+        n_points (int): The number of points of each route.
+        n_stops (int): The number of stops of each itinerary.
+        seed (int): The random seed. Defaults to 0.
+
+    Returns:
+        tuple: The routes and stops, sorted as fetch_routes_from_bq and
+            fetch_stops_from_bq sort them, and the mapping from each line
+            number into the mapping from its route IDs into their
+            itinerary IDs.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    routes = []
+    stops = []
+    itinerary_ids = {}
+
+    for line in range(n_lines):
+        line_number = '{0:03d}'.format(line)
+        outbound = generate_shape(rng=rng, n_points=n_points)
+
+        itinerary_ids[line_number] = {}
+
+        for direction, shape in enumerate([outbound, outbound[::-1]]):
+            route_id = 2 * line + direction
+            itinerary_id = str(10000 + route_id)
+            stop_coordinates = generate_stops(rng=rng, shape=shape, n_stops=n_stops)
+
+            itinerary_ids[line_number][route_id] = itinerary_id
+
+            routes.append(
+                pd.DataFrame(
+                    data={
+                        'line_number': line_number,
+                        'route_id': route_id,
+                        'order': np.arange(n_points),
+                        'latitude': shape[:, 0],
+                        'longitude': shape[:, 1]
+                    }
+                )
+            )
+
+            stops.append(
+                pd.DataFrame(
+                    data={
+                        'line_number': line_number,
+                        'itinerary_id': itinerary_id,
+                        'group': '',
+                        'number': [str(100000 + 1000 * route_id + stop) for stop in range(n_stops)],
+                        'name': ['Stop {0}'.format(stop) for stop in range(n_stops)],
+                        'type': 'Novo mobiliário',
+                        'order': np.arange(1, n_stops + 1),
+                        'direction': ['Outbound', 'Inbound'][direction],
+                        'latitude': stop_coordinates[:, 0],
+                        'longitude': stop_coordinates[:, 1]
+                    }
+                )
+            )
+
+    routes = pd.concat(objs=routes, ignore_index=True)
+    stops = pd.concat(objs=stops, ignore_index=True)
+
+    return routes, stops, itinerary_ids
+
+# Function: generate_routes_unified
+
+
+def generate_routes_unified(
+        n_lines: int,
+        n_points: int,
+        n_stops: int,
+        stops_per_line: int,
+        seed: int = 0
+    ) -> pd.DataFrame:
+    '''
+    Generate unified routes shaped like the routes.routes_unified table,
+    one per line, with stops drawn from a pool shared by all lines.
+
+    Args:
+        n_lines (int): The number of lines.
+        n_points (int): The number of points of each route.
+        n_stops (int): The number of stops in the pool.
+        stops_per_line (int): The number of stops along each route.
+        seed (int): The random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: The unified routes, with the columns of
+            routes.routes_unified that RouteTable and RouteMatcher use.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    routes, _, _ = generate_network(n_lines=n_lines, n_points=n_points, n_stops=2, seed=seed)
+    routes = routes.loc[routes['route_id'] % 2 == 0].reset_index(drop=True)
+
+    # Steps between consecutive points, in meters east and north.
+    dx = np.diff(routes['longitude'].to_numpy()) * meters_per_degree * np.cos(np.radians(center[0]))
+    dy = np.diff(routes['latitude'].to_numpy()) * meters_per_degree
+    same_line = routes['line_number'].to_numpy()[1:] == routes['line_number'].to_numpy()[:-1]
+
+    lengths = np.where(same_line, np.hypot(dx, dy), np.nan)
+    bearings = np.degrees(np.arctan2(dx, dy)) % 360
+
+    chainages = np.cumsum(np.append(0, np.nan_to_num(lengths)))
+    chainages -= np.repeat(chainages[::n_points], n_points)
+
+    stop_numbers = np.full(routes.shape[0], None, dtype=object)
+    positions = np.linspace(0, n_points - 1, stops_per_line).astype(int)
+
+    for line in range(n_lines):
+        stop_numbers[line * n_points + positions] = [
+            str(100000 + stop) for stop in rng.choice(n_stops, stops_per_line, replace=False)
+        ]
+
+    return pd.DataFrame(
+        data={
+            'line_number': routes['line_number'],
+            'order': routes['order'],
+            'latitude': routes['latitude'],
+            'longitude': routes['longitude'],
+            'stop_number': stop_numbers,
+            'chainage': chainages,
+            'segment_length': np.append(lengths, np.nan),
+            'bearing': np.append(np.where(same_line, bearings, np.roll(bearings, 1)), bearings[-1])
+        }
+    )
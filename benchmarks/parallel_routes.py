@@ -0,0 +1,79 @@
+'''
+Benchmark the scaling of unified-route generation over a pool of forked
+processes, from one worker up to the number of CPUs available, on a
+synthetic network sized like the full one.
+
+Usage:
+    python benchmarks/parallel_routes.py --lines 300 --workers 1 2 4 8
+'''
+
+import argparse
+import os
+import sys
+from pathlib import Path
+import pandas as pd
+from network import generate_network
+from timing import measure, report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cloud' / 'update_routes_unified'))
+
+from fetch import split_by_line  # noqa: E402
+from parallel import generate_routes_unified  # noqa: E402
+
+
+if __name__ == '__main__':
+    n_cpus = len(os.sched_getaffinity(0))
+
+    parser = argparse.ArgumentParser(description='Benchmark unified-route generation over a process pool.')
+    parser.add_argument('--lines', type=int, default=300)
+    parser.add_argument('--points', type=int, default=1000)
+    parser.add_argument('--stops', type=int, default=40)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        nargs='+',
+        default=sorted({workers for workers in [1, 2, 4, 8] if workers <= n_cpus} | {n_cpus})
+    )
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    routes, stops, itinerary_ids = generate_network(
+        n_lines=args.lines,
+        n_points=args.points,
+        n_stops=args.stops
+    )
+
+    routes = split_by_line(table=routes)
+    stops = split_by_line(table=stops)
+
+    print(
+        '{0:,} lines x 2 routes x {1:,} points, {2} CPUs available:'.format(
+            args.lines,
+            args.points,
+            n_cpus
+        )
+    )
+
+    baseline = None
+
+    for workers in args.workers:
+        timing = measure(
+            lambda: pd.concat(
+                objs=generate_routes_unified(
+                    routes=routes,
+                    stops=stops,
+                    itinerary_ids=itinerary_ids,
+                    max_workers=workers
+                ),
+                ignore_index=True
+            ),
+            repeat=args.repeat
+        )
+
+        if baseline is None:
+            baseline = timing
+        else:
+            pd.testing.assert_frame_equal(baseline['value'], timing['value'])
+
+        report('  {0} worker(s)'.format(workers), timing, items=args.lines, unit='lines')
+        print('    speed-up: {0:.2f}x'.format(baseline['best'] / timing['best']))
@@ -0,0 +1,173 @@
+'''
+Benchmark the columnar getVeiculos parser of ingest_locations against the
+original one, which built the set of locations with a json_normalize and a
+concat per vehicle, on synthetic payloads.
+
+Usage:
+    python benchmarks/parse_locations.py --vehicles 50 300 1000
+'''
+
+import argparse
+import datetime as dt
+import random
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytz
+from timing import measure, report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cloud' / 'ingest_locations'))
+
+from convert import parse_request_datetime  # noqa: E402
+from parse import columns, translations, parse_set_of_locations  # noqa: E402
+
+# Function: generate_payload
+
+
+def generate_payload(
+        n_vehicles: int,
+        request_datetime: dt.datetime,
+        seed: int = 0
+    ) -> dict:
+    '''
+    Generate a getVeiculos payload with the fields and value domains of
+    the real API.
+
+    Args:
+        n_vehicles (int): The number of vehicles.
+        request_datetime (dt.datetime): The timezone-aware request
+            datetime, which update times precede by up to 10 minutes.
+        seed (int): The random seed. Defaults to 0.
+
+    Returns:
+        dict: The decoded payload, keyed by vehicle.
+    '''
+
+    rng = random.Random(seed)
+
+    payload = {}
+
+    for vehicle in range(n_vehicles):
+        update_datetime = request_datetime - dt.timedelta(minutes=rng.randint(0, 10))
+
+        payload[str(vehicle)] = {
+            'COD': 'BC{0:03d}'.format(vehicle),
+            'REFRESH': update_datetime.strftime('%H:%M'),
+            'LAT': '{0:.6f}'.format(-25.43 + rng.uniform(-0.1, 0.1)),
+            'LON': '{0:.6f}'.format(-49.27 + rng.uniform(-0.1, 0.1)),
+            'CODIGOLINHA': '216',
+            'ADAPT': rng.choice(['0', '1']),
+            'TIPO_VEIC': rng.choice(list(translations['bus_type'])),
+            'TABELA': str(rng.randint(1, 30)),
+            'SITUACAO': rng.choice(list(translations['status_time'])),
+            'SITUACAO2': rng.choice(list(translations['status_route'])),
+            'SENT': rng.choice(list(translations['direction'])),
+            'TCOUNT': str(rng.randint(1, 5)),
+            'SENTIDO': rng.choice(['Terminal Boqueirão', 'Centro', 'sem tabela'])
+        }
+
+    return payload
+
+# Function: legacy_parse_set_of_locations
+
+
+def legacy_parse_set_of_locations(
+        r_json: dict,
+        request_datetime: dt.datetime
+    ) -> pd.DataFrame:
+    '''
+    Parse a getVeiculos payload as fetch_set_of_locations did before the
+    columnar parser, one vehicle at a time.
+
+    Args:
+        r_json (dict): The decoded getVeiculos payload, keyed by vehicle.
+        request_datetime (dt.datetime): The timezone-aware request
+            datetime.
+
+    Returns:
+        pd.DataFrame: The set of locations.
+    '''
+
+    def resolve_update_datetime(update_time):
+        update_datetime = dt.datetime.combine(request_datetime.date(), update_time)
+        update_datetime = pytz.timezone('America/Sao_Paulo').localize(update_datetime)
+
+        if update_datetime > request_datetime:
+            update_datetime -= dt.timedelta(days=1)
+
+        return update_datetime
+
+    set_of_locations = pd.DataFrame()
+
+    for vehicle in r_json:
+        row = pd.json_normalize(r_json[vehicle])
+
+        set_of_locations = pd.concat(
+            objs=[set_of_locations, row],
+            axis=0,
+            ignore_index=True
+        )
+
+    set_of_locations.rename(mapper=columns, axis=1, inplace=True)
+
+    set_of_locations['update_datetime'] = set_of_locations['update_time'].apply(
+        lambda x: resolve_update_datetime(update_time=dt.datetime.strptime(x, '%H:%M').time())
+    )
+
+    for column in ['latitude', 'longitude']:
+        set_of_locations[column] = pd.to_numeric(set_of_locations[column], errors='coerce').astype(dtype=np.float32)
+
+    for column in ['wheelchair_accessibility', 'timetable', 'cycle_count']:
+        set_of_locations[column] = pd.to_numeric(set_of_locations[column], errors='coerce').astype(dtype=pd.UInt8Dtype())
+
+    for column, translation in translations.items():
+        set_of_locations[column] = set_of_locations[column].replace(to_replace=translation)
+
+    return set_of_locations[
+        [
+            'fleet_number',
+            'update_datetime',
+            'latitude',
+            'longitude',
+            'line_number',
+            'wheelchair_accessibility',
+            'bus_type',
+            'timetable',
+            'status_time',
+            'status_route',
+            'direction',
+            'cycle_count',
+            'destination',
+        ]
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the getVeiculos parser.')
+    parser.add_argument('--vehicles', type=int, nargs='+', default=[50, 300, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    request_datetime = parse_request_datetime(date='Wed, 12 Jun 2024 15:30:00 GMT')
+
+    for n_vehicles in args.vehicles:
+        payload = generate_payload(
+            n_vehicles=n_vehicles,
+            request_datetime=request_datetime
+        )
+
+        legacy = measure(
+            lambda: legacy_parse_set_of_locations(r_json=payload, request_datetime=request_datetime),
+            repeat=args.repeat
+        )
+        columnar = measure(
+            lambda: parse_set_of_locations(r_json=payload, request_datetime=request_datetime),
+            repeat=args.repeat
+        )
+
+        pd.testing.assert_frame_equal(legacy['value'], columnar['value'])
+
+        print('{0} vehicles:'.format(n_vehicles))
+        report('  legacy (json_normalize + concat)', legacy, items=n_vehicles, unit='vehicles')
+        report('  columnar', columnar, items=n_vehicles, unit='vehicles')
@@ -0,0 +1,335 @@
+'''
+Benchmark the single-pass stop, route and stretch parsers of the reference
+functions against the original ones, which concatenated one single-row
+frame per point, on synthetic payloads with 10k-point shapes.
+
+Usage:
+    python benchmarks/parse_reference.py --points 10000 --stops 2000 --stretches 3000
+'''
+
+import argparse
+import importlib.util
+import random
+from pathlib import Path
+import pandas as pd
+from timing import measure, report
+
+cloud_path = Path(__file__).resolve().parents[1] / 'cloud'
+
+stretch_columns = {
+    'COD_LINHA': 'line_number',
+    'NOME_LINHA': 'line_name_original',
+    'COD_CATEGORIA': 'service_category_code',
+    'NOME_CATEGORIA': 'service_category',
+    'COD_EMPRESA': 'company_code',
+    'NOME_EMPRESA': 'company',
+    'COD_PTO_PARADA_TH': 'stop_code_timetable',
+    'NOME_PTO_PARADA_TH': 'stop_name_timetable',
+    'SEQ_PTO_ITI_TH': 'order_itinerary',
+    'COD_ITINERARIO': 'itinerary_code',
+    'NOME_ITINERARIO': 'itinerary',
+    'PTO_ESPECIAL': 'special_stop',
+    'COD_PTO_TRECHO_A': 'point_code_stretch_start',
+    'SEQ_PONTO_TRECHO_A': 'point_order_start',
+    'COD_PTO_TRECHO_B': 'point_code_strech_end',
+    'SEQ_PONTO_TRECHO_B': 'point_order_end',
+    'EXTENSAO_TRECHO_A_ATE_B': 'distance_start_to_end',
+    'TIPO_TRECHO': 'stretch_type',
+    'STOP_CODE': 'stop_code',
+    'STOP_NAME': 'stop_name',
+    'CODIGO_URBS': 'urbs_code'
+}
+
+# Function: load_parse_module
+
+
+def load_parse_module(function: str):
+    '''
+    Load the parse module of a Cloud Function under a name of its own, since
+    the modules of all functions are named parse.
+
+    Args:
+        function (str): The name of the function, e.g. 'update_stops'.
+
+    Returns:
+        The module.
+    '''
+
+    spec = importlib.util.spec_from_file_location(
+        name='{0}_parse'.format(function),
+        location=cloud_path / function / 'parse.py'
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+# Function: generate_payloads
+
+
+def generate_payloads(
+        n_points: int,
+        n_stops: int,
+        n_stretches: int,
+        seed: int = 0
+    ) -> dict:
+    '''
+    Generate getShapeLinha, getPontosLinha and getTrechosItinerarios
+    payloads with the fields and value formats of the real API.
+
+    Args:
+        n_points (int): The number of points of the shape.
+        n_stops (int): The number of stops.
+        n_stretches (int): The number of stretches.
+        seed (int): The random seed. Defaults to 0.
+
+    Returns:
+        dict: The decoded payloads, keyed by endpoint.
+    '''
+
+    rng = random.Random(seed)
+
+    def coordinate(center: float) -> str:
+        return '{0:.7f}'.format(center + rng.uniform(-0.05, 0.05)).replace('.', ',')
+
+    shape = [
+        {
+            'SHP': str(1000 + point // (n_points // 2 + 1)),
+            'LAT': coordinate(-25.43),
+            'LON': coordinate(-49.27),
+            'COD': '216'
+        }
+        for point in range(n_points)
+    ]
+
+    stops = [
+        {
+            'NOME': 'Rua {0}'.format(stop),
+            'NUM': str(100000 + stop),
+            'LAT': coordinate(-25.43),
+            'LON': coordinate(-49.27),
+            'SEQ': str(stop % (n_stops // 2 + 1) + 1),
+            'GRUPO': '',
+            'SENTIDO': 'Terminal Boqueirão' if stop < n_stops // 2 else 'Centro',
+            'TIPO': 'Novo mobiliário',
+            'ITINERARY_ID': str(5000 + stop // (n_stops // 2 + 1))
+        }
+        for stop in range(n_stops)
+    ]
+
+    stretches = [
+        {
+            key: str(rng.randint(1, 99999)) for key in stretch_columns
+        } | {
+            'COD_LINHA': '216',
+            'EXTENSAO_TRECHO_A_ATE_B': '{0:.2f}'.format(rng.uniform(50, 900)).replace('.', ',')
+        }
+        for _ in range(n_stretches)
+    ]
+
+    return {
+        'getShapeLinha': shape,
+        'getPontosLinha': stops,
+        'getTrechosItinerarios': stretches
+    }
+
+# Function: legacy_parse_line_stops
+
+
+def legacy_parse_line_stops(
+        r_json: list,
+        line_number: str
+    ) -> pd.DataFrame:
+    '''
+    Parse a getPontosLinha payload as fetch_line_stops originally did,
+    concatenating one single-row frame per stop.
+    '''
+
+    stops = pd.DataFrame()
+
+    for index, point in enumerate(r_json):
+        stops = pd.concat(objs=[stops, pd.DataFrame(data=point, index=[index])])
+
+    stops.reset_index(drop=True, inplace=True)
+
+    stops.rename(
+        mapper={
+            'NOME': 'name',
+            'NUM': 'number',
+            'LAT': 'latitude',
+            'LON': 'longitude',
+            'SEQ': 'order',
+            'GRUPO': 'group',
+            'SENTIDO': 'direction',
+            'TIPO': 'type',
+            'ITINERARY_ID': 'itinerary_id'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    stops['line_number'] = line_number
+
+    for column in ['latitude', 'longitude']:
+        stops[column] = stops[column].str.replace(',', '.')
+
+    stops = stops.astype(
+        dtype={
+            'name': str,
+            'number': str,
+            'latitude': str,
+            'longitude': str,
+            'order': int,
+            'group': str,
+            'direction': str,
+            'type': str,
+            'itinerary_id': str,
+            'line_number': str
+        }
+    )
+
+    return stops[
+        [
+            'line_number',
+            'itinerary_id',
+            'group',
+            'number',
+            'name',
+            'type',
+            'order',
+            'direction',
+            'latitude',
+            'longitude'
+        ]
+    ]
+
+# Function: legacy_parse_route
+
+
+def legacy_parse_route(r_json: list) -> pd.DataFrame:
+    '''
+    Parse a getShapeLinha payload as fetch_route originally did,
+    concatenating one single-row frame per point.
+    '''
+
+    route = pd.DataFrame()
+
+    for order, point in enumerate(r_json):
+        route = pd.concat(objs=[route, pd.DataFrame(data=point, index=[order])])
+
+    route.reset_index(drop=False, inplace=True)
+
+    route.rename(
+        mapper={
+            'index': 'order',
+            'SHP': 'route_id',
+            'LAT': 'latitude',
+            'LON': 'longitude',
+            'COD': 'line_number'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    for column in ['latitude', 'longitude']:
+        route[column] = route[column].str.replace(',', '.')
+
+    route = route.astype(
+        dtype={
+            'route_id': int,
+            'latitude': float,
+            'longitude': float,
+            'line_number': str,
+            'order': int
+        }
+    )
+
+    return route[
+        [
+            'line_number',
+            'route_id',
+            'order',
+            'latitude',
+            'longitude'
+        ]
+    ]
+
+# Function: legacy_parse_stretch
+
+
+def legacy_parse_stretch(r_json: list) -> pd.DataFrame:
+    '''
+    Parse a getTrechosItinerarios payload as fetch_stretch originally did,
+    concatenating one json_normalize frame per stretch.
+    '''
+
+    stretch = pd.DataFrame()
+
+    for point in r_json:
+        stretch = pd.concat(objs=[stretch, pd.json_normalize(point)])
+
+    stretch.reset_index(drop=False, inplace=True)
+
+    stretch.rename(mapper=stretch_columns, axis=1, inplace=True)
+
+    stretch['distance_start_to_end'] = stretch['distance_start_to_end'].str.replace(',', '.')
+
+    stretch = stretch.astype(
+        dtype={
+            column: float if column == 'distance_start_to_end' else str
+            for column in stretch_columns.values()
+        }
+    )
+
+    return stretch[list(stretch_columns.values())].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the reference-data parsers.')
+    parser.add_argument('--points', type=int, default=10000)
+    parser.add_argument('--stops', type=int, default=2000)
+    parser.add_argument('--stretches', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--repeat-legacy', type=int, default=1)
+    args = parser.parse_args()
+
+    payloads = generate_payloads(
+        n_points=args.points,
+        n_stops=args.stops,
+        n_stretches=args.stretches
+    )
+
+    parse_stops = load_parse_module(function='update_stops')
+    parse_routes = load_parse_module(function='update_routes')
+    parse_stretches = load_parse_module(function='update_stretches')
+
+    cases = [
+        (
+            'getPontosLinha ({0:,} stops)'.format(args.stops),
+            args.stops,
+            lambda: legacy_parse_line_stops(r_json=payloads['getPontosLinha'], line_number='216'),
+            lambda: parse_stops.parse_line_stops(r_json=payloads['getPontosLinha'], line_number='216')
+        ),
+        (
+            'getShapeLinha ({0:,} points)'.format(args.points),
+            args.points,
+            lambda: legacy_parse_route(r_json=payloads['getShapeLinha']),
+            lambda: parse_routes.parse_route(r_json=payloads['getShapeLinha'])
+        ),
+        (
+            'getTrechosItinerarios ({0:,} stretches)'.format(args.stretches),
+            args.stretches,
+            lambda: legacy_parse_stretch(r_json=payloads['getTrechosItinerarios']),
+            lambda: parse_stretches.parse_stretch(r_json=payloads['getTrechosItinerarios'])
+        )
+    ]
+
+    for name, items, legacy_function, function in cases:
+        legacy = measure(legacy_function, repeat=args.repeat_legacy)
+        single_pass = measure(function, repeat=args.repeat)
+
+        pd.testing.assert_frame_equal(legacy['value'], single_pass['value'])
+
+        print(name + ':')
+        report('  legacy (row-by-row concat)', legacy, items=items, unit='rows')
+        report('  single pass', single_pass, items=items, unit='rows')
@@ -0,0 +1,72 @@
+'''
+Benchmark the uniform-grid segment index of update_routes_unified over a
+whole synthetic network: building it once, querying the candidate segments
+within a radius, and snapping points to their closest segment, against an
+exhaustive search over every segment.
+
+Usage:
+    python benchmarks/segment_index.py --lines 300 --points 2000
+'''
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+from network import generate_network
+from timing import measure, report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cloud' / 'update_routes_unified'))
+
+from calculate import calculate_closest_segments  # noqa: E402
+from geometry import get_origin, project  # noqa: E402
+from index import SegmentIndex  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the segment index over a whole network.')
+    parser.add_argument('--lines', type=int, default=300)
+    parser.add_argument('--points', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--exhaustive-queries', type=int, default=20)
+    parser.add_argument('--radius', type=float, default=100)
+    parser.add_argument('--cell-size', type=float, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # One route per line, projected onto a single plane.
+    routes, stops, _ = generate_network(n_lines=args.lines, n_points=args.points, n_stops=2)
+    routes = routes.loc[routes['route_id'] % 2 == 0]
+
+    coordinates = routes[['latitude', 'longitude']].to_numpy(dtype=float)
+    origin = get_origin(coordinates=coordinates)
+    V = project(coordinates=coordinates, origin=origin)
+
+    # Segments join consecutive points of the same route.
+    same_route = routes['route_id'].to_numpy()[1:] == routes['route_id'].to_numpy()[:-1]
+
+    A = V[:-1][same_route]
+    B = V[1:][same_route]
+
+    # Query points lie within 30 m of a random point of the network.
+    rng = np.random.default_rng(1)
+    P = V[rng.integers(0, V.shape[0], args.queries)] + rng.uniform(-30, 30, (args.queries, 2))
+
+    build = measure(lambda: SegmentIndex(A=A, B=B, cell_size=args.cell_size), repeat=args.repeat)
+    index = build['value']
+
+    query = measure(lambda: [index.query(point=point, radius=args.radius) for point in P[:1000]], repeat=args.repeat)
+    snap = measure(lambda: index.snap(P=P, radius=args.radius), repeat=args.repeat)
+
+    sample = P[:args.exhaustive_queries]
+    exhaustive = measure(lambda: calculate_closest_segments(A=A, B=B, P=sample), repeat=1)
+
+    indices, distances, _ = snap['value']
+    np.testing.assert_array_equal(indices[:args.exhaustive_queries], exhaustive['value'][0])
+    np.testing.assert_allclose(distances[:args.exhaustive_queries], exhaustive['value'][1])
+
+    print('{0:,} lines x {1:,} points ({2:,} segments), {3:g} m radius:'.format(args.lines, args.points, A.shape[0], args.radius))
+    report('  build', build)
+    report('  query, one point at a time', query, items=1000, unit='queries')
+    report('  snap, batched', snap, items=args.queries, unit='points')
+    report('  exhaustive search', exhaustive, items=args.exhaustive_queries, unit='points')
+    print('  candidates per query: {0:.1f}'.format(np.mean([len(segment_ids) for segment_ids in query['value']])))
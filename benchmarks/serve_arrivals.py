@@ -0,0 +1,217 @@
+'''
+Benchmark the in-memory arrival service of curitiba_bus_eta.service on a
+synthetic network sized like the full one: ingesting a fleet-wide batch of
+locations, answering single-stop and bulk queries in process, and serving
+single-stop queries over HTTP, sequentially and concurrently, with the
+client and the server sharing one event loop.
+
+Usage:
+    python benchmarks/serve_arrivals.py --lines 300 --stops 3000 --vehicles 3000
+'''
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from network import generate_routes_unified, meters_per_degree
+from timing import measure, report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+from curitiba_bus_eta.service import ArrivalService, create_app  # noqa: E402
+
+# Function: generate_fleet
+
+
+def generate_fleet(
+        routes_unified: pd.DataFrame,
+        n_vehicles: int,
+        update_time: float,
+        advance: int = 0,
+        seed: int = 1
+    ) -> pd.DataFrame:
+    '''
+    Place vehicles at random route points, a few meters off them.
+
+    Args:
+        routes_unified (pd.DataFrame): The unified routes.
+        n_vehicles (int): The number of vehicles.
+        update_time (float): The time of the locations, in seconds since
+            the epoch.
+        advance (int): The number of points each vehicle has moved along
+            its route since the first batch. Defaults to 0.
+        seed (int): The random seed, the same for successive batches of
+            a fleet. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: The locations, with the columns ArrivalService.ingest
+            reads.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    line_numbers = routes_unified['line_number'].to_numpy()
+    n_points = np.unique(line_numbers, return_counts=True)[1][0]
+
+    starts = rng.integers(0, len(line_numbers) // n_points, n_vehicles) * n_points
+    positions = starts + np.minimum(rng.integers(0, n_points, n_vehicles) + advance, n_points - 1)
+
+    coordinates = routes_unified[['latitude', 'longitude']].to_numpy(dtype=float)[positions]
+    coordinates += np.random.default_rng(seed + 1).normal(0, 5, coordinates.shape) / meters_per_degree
+
+    return pd.DataFrame(
+        data={
+            'fleet_number': ['BC{0:04d}'.format(vehicle) for vehicle in range(n_vehicles)],
+            'update_datetime': pd.to_datetime(update_time, unit='s', utc=True),
+            'line_number': line_numbers[positions],
+            'latitude': coordinates[:, 0],
+            'longitude': coordinates[:, 1]
+        }
+    )
+
+# Function: request_arrivals
+
+
+async def request_arrivals(
+        session: aiohttp.ClientSession,
+        url: str,
+        stop_numbers: list
+    ) -> list:
+    '''
+    Request the arrivals at stops one at a time over HTTP.
+
+    Returns:
+        list: The latency, in seconds, of each request.
+    '''
+
+    latencies = []
+
+    for stop_number in stop_numbers:
+        start = time.perf_counter()
+
+        async with session.get('{0}/stops/{1}/arrivals'.format(url, stop_number)) as response:
+            await response.json()
+
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+# Function: benchmark_http
+
+
+async def benchmark_http(
+        service: ArrivalService,
+        stop_numbers: np.ndarray,
+        concurrencies: list
+    ):
+    '''
+    Serve a service on a local port and print the latencies and throughput
+    of single-stop queries at each concurrency.
+    '''
+
+    runner = web.AppRunner(create_app(service=service))
+    await runner.setup()
+
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+
+    url = 'http://127.0.0.1:{0}'.format(runner.addresses[0][1])
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            await request_arrivals(session, url, stop_numbers[:100])
+
+            for concurrency in concurrencies:
+                start = time.perf_counter()
+
+                latencies = await asyncio.gather(
+                    *[
+                        request_arrivals(session, url, stop_numbers[worker::concurrency].tolist())
+                        for worker in range(concurrency)
+                    ]
+                )
+
+                elapsed = time.perf_counter() - start
+                latencies = np.concatenate(latencies)
+
+                print(
+                    '  HTTP, {0:>3} concurrent: p50 {1:.2f} ms, p99 {2:.2f} ms, {3:,.0f} requests/s'.format(
+                        concurrency,
+                        np.percentile(latencies, 50) * 1e3,
+                        np.percentile(latencies, 99) * 1e3,
+                        len(latencies) / elapsed
+                    )
+                )
+
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the arrival service.')
+    parser.add_argument('--lines', type=int, default=300)
+    parser.add_argument('--points', type=int, default=1000)
+    parser.add_argument('--stops', type=int, default=3000)
+    parser.add_argument('--stops-per-line', type=int, default=40)
+    parser.add_argument('--vehicles', type=int, default=3000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--bulk', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    routes_unified = generate_routes_unified(
+        n_lines=args.lines,
+        n_points=args.points,
+        n_stops=args.stops,
+        stops_per_line=args.stops_per_line
+    )
+
+    build = measure(lambda: ArrivalService(routes_unified=routes_unified), repeat=1)
+    service = build['value']
+
+    # Two batches 30 s apart, so that the second one measures speeds.
+    now = time.time()
+    first = generate_fleet(routes_unified=routes_unified, n_vehicles=args.vehicles, update_time=now - 30)
+    second = generate_fleet(routes_unified=routes_unified, n_vehicles=args.vehicles, update_time=now, advance=10)
+
+    service.ingest(locations=first, now=now)
+    ingest = measure(lambda: service.ingest(locations=second, now=now), repeat=1)
+
+    rng = np.random.default_rng(2)
+    stop_numbers = rng.choice(service.routes.stop_numbers, args.queries)
+
+    single = measure(
+        lambda: [service.get_arrivals(stop_numbers=[stop_number]) for stop_number in stop_numbers],
+        repeat=args.repeat
+    )
+    bulk = measure(
+        lambda: [
+            service.get_arrivals(stop_numbers=stop_numbers[start:start + args.bulk])
+            for start in range(0, args.queries, args.bulk)
+        ],
+        repeat=args.repeat
+    )
+
+    arrivals = sum(len(results[0]['arrivals']) for results in single['value'])
+
+    print(
+        '{0:,} lines, {1:,} stops, {2:,} vehicles ({3:,} positions held):'.format(
+            args.lines,
+            len(service.routes.stop_numbers),
+            args.vehicles,
+            len(service.snapshot.fleet_numbers)
+        )
+    )
+    report('  build', build)
+    report('  ingest, second batch', ingest, items=args.vehicles, unit='locations')
+    report('  single-stop queries', single, items=args.queries, unit='queries')
+    report('  {0}-stop queries'.format(args.bulk), bulk, items=args.queries // args.bulk, unit='queries')
+    print('  arrivals per single-stop query: {0:.1f}'.format(arrivals / args.queries))
+
+    asyncio.run(benchmark_http(service=service, stop_numbers=stop_numbers, concurrencies=args.concurrency))
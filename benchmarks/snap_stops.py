@@ -0,0 +1,168 @@
+'''
+Benchmark the snapping of stops to route segments in update_routes_unified
+against the original loop, which computed the distance from every stop to
+every segment with iterrows and built a one-row DataFrame per pair, on
+synthetic routes sized like those of lines 216 and 464.
+
+Only times are compared with the original loop: its helper measured the
+distance to the nearer end of a segment in degrees rather than meters, so
+it picks other segments than the metric kernel. The kernel, with and
+without the segment index, is checked to pick the same segments.
+
+Usage:
+    python benchmarks/snap_stops.py --sizes 300:25 900:60
+'''
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from network import generate_network
+from timing import measure, report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cloud' / 'update_routes_unified'))
+
+from calculate import calculate_closest_segments, snap_points_to_line_segments  # noqa: E402
+from geometry import calculate_haversine_distances, get_origin, project  # noqa: E402
+
+# Function: legacy_calculate_distance_between_line_segment_and_point
+
+
+def legacy_calculate_distance_between_line_segment_and_point(
+        A: tuple,
+        B: tuple,
+        S: tuple
+    ) -> float:
+    '''
+    Calculate the distance between a segment and a point as the original
+    per-pair helper did: the haversine distance, in meters, to the foot of
+    the perpendicular if it lies within the segment, and otherwise the
+    Euclidean norm, in degrees, to the nearer endpoint.
+    '''
+
+    A = np.array(object=A)
+    B = np.array(object=B)
+    S = np.array(object=S)
+
+    slope = (B[1] - A[1]) / (B[0] - A[0])
+    intercept = B[1] - slope * B[0]
+
+    slope_prime = -1 / slope
+    intercept_prime = S[1] - slope_prime * S[0]
+
+    T = np.array(
+        object=(
+            (intercept - intercept_prime) / (slope_prime - slope),
+            slope * (intercept - intercept_prime) / (slope_prime - slope) + intercept
+        )
+    )
+
+    v1 = (T - A) / np.linalg.norm(T - A)
+    v2 = (T - B) / np.linalg.norm(T - B)
+
+    if np.allclose(v1 + v2, np.zeros(shape=(2,)), rtol=1e-6, atol=1e-6):
+        return float(calculate_haversine_distances(P=S, Q=T))
+
+    return float(np.min([np.linalg.norm(S - A), np.linalg.norm(S - B)]))
+
+# Function: legacy_snap_stops
+
+
+def legacy_snap_stops(
+        line_route: pd.DataFrame,
+        line_stops: pd.DataFrame
+    ) -> np.ndarray:
+    '''
+    Snap stops to route segments as generate_route_unified_route_id
+    originally did.
+
+    Returns:
+        np.ndarray: The index of the first closest segment of each stop.
+    '''
+
+    segment_indices = []
+
+    for index, row in line_stops.iterrows():
+        routes_and_distances = pd.DataFrame()
+
+        for jndex, sow in line_route.iterrows():
+            if jndex > 0:
+                distance = legacy_calculate_distance_between_line_segment_and_point(
+                    A=(line_route.loc[jndex - 1, 'latitude'], line_route.loc[jndex - 1, 'longitude']),
+                    B=(line_route.loc[jndex, 'latitude'], line_route.loc[jndex, 'longitude']),
+                    S=(row['latitude'], row['longitude'])
+                )
+                distance_row = pd.DataFrame(
+                    data={
+                        'order': [line_route.loc[jndex - 1, 'order']],
+                        'stop_number': [row['number']],
+                        'distance': [distance]
+                    }
+                )
+                routes_and_distances = pd.concat(objs=[routes_and_distances, distance_row])
+
+        routes_and_distances = routes_and_distances.loc[
+            routes_and_distances['distance'] == routes_and_distances['distance'].min()
+        ]
+
+        segment_indices.append(routes_and_distances['order'].iloc[0])
+
+    return np.asarray(segment_indices)
+
+# Function: exhaustive_snap_stops
+
+
+def exhaustive_snap_stops(
+        vertices: np.ndarray,
+        points: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Snap stops to route segments with the chunked broadcast kernel alone,
+    without the segment index.
+
+    Returns:
+        np.ndarray: The index of the closest segment of each stop.
+    '''
+
+    origin = get_origin(coordinates=vertices)
+
+    V = project(coordinates=vertices, origin=origin)
+    P = project(coordinates=points, origin=origin)
+
+    indices, _, _ = calculate_closest_segments(A=V[:-1], B=V[1:], P=P)
+
+    return indices
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the snapping of stops to route segments.')
+    parser.add_argument('--sizes', nargs='+', default=['300:25', '900:60'], help='Route sizes, as points:stops.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        n_points, n_stops = [int(value) for value in size.split(':')]
+
+        routes, stops, _ = generate_network(n_lines=1, n_points=n_points, n_stops=n_stops)
+
+        line_route = routes.loc[routes['route_id'] == 0].reset_index(drop=True)
+        line_stops = stops.loc[stops['itinerary_id'] == '10000'].reset_index(drop=True)
+
+        vertices = line_route[['latitude', 'longitude']].to_numpy(dtype=float)
+        points = line_stops[['latitude', 'longitude']].to_numpy(dtype=float)
+
+        exhaustive = measure(lambda: exhaustive_snap_stops(vertices=vertices, points=points), repeat=args.repeat)
+        indexed = measure(lambda: snap_points_to_line_segments(vertices=vertices, points=points), repeat=args.repeat)
+
+        np.testing.assert_array_equal(exhaustive['value'], indexed['value'][0])
+
+        print('{0:,} points, {1:,} stops:'.format(n_points, n_stops))
+
+        if not args.skip_legacy:
+            legacy = measure(lambda: legacy_snap_stops(line_route=line_route, line_stops=line_stops), repeat=1)
+            report('  legacy (iterrows x iterrows)', legacy, items=n_stops, unit='stops')
+
+        report('  chunked kernel', exhaustive, items=n_stops, unit='stops')
+        report('  chunked kernel + segment index', indexed, items=n_stops, unit='stops')
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+# Function: measure
+
+
+def measure(function, repeat: int = 5) -> dict:
+    '''
+    Time repeated calls of a function without arguments.
+
+    Args:
+        function: The function to be timed.
+        repeat (int): The number of calls. Defaults to 5.
+
+    Returns:
+        dict: The best and median wall-clock times, in seconds, and the
+            value returned by the last call.
+    '''
+
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        times.append(time.perf_counter() - start)
+
+    return {
+        'best': min(times),
+        'median': statistics.median(times),
+        'value': value
+    }
+
+# Function: report
+
+
+def report(name: str, timing: dict, items: int = None, unit: str = 'items'):
+    '''
+    Print the times measured for a benchmark case.
+
+    Args:
+        name (str): The name of the case.
+        timing (dict): The output of measure.
+        items (int): The number of items processed per call, to report a
+            throughput. Defaults to None.
+        unit (str): The name of the items. Defaults to 'items'.
+    '''
+
+    line = '{0:<40} best {1:10.2f} ms   median {2:10.2f} ms'.format(
+        name,
+        timing['best'] * 1e3,
+        timing['median'] * 1e3
+    )
+
+    if items is not None:
+        line += '   {0:,.0f} {1}/s'.format(items / timing['best'], unit)
+
+    print(line)
@@ -0,0 +1,63 @@
+import functools
+import threading
+from google.cloud import bigquery
+
+# Function: lazy
+
+
+def lazy(function):
+    '''
+    Wrap a function without arguments so that it runs only once, on its
+    first call, even when first called from several threads at a time.
+    Later calls return the same value.
+
+    Args:
+        function: The function constructing the value.
+
+    Returns:
+        The wrapped function.
+    '''
+
+    lock = threading.Lock()
+    values = []
+
+    @functools.wraps(function)
+    def wrapper():
+        if len(values) == 0:
+            with lock:
+                if len(values) == 0:
+                    values.append(function())
+
+        return values[0]
+
+    return wrapper
+
+# Function: get_bigquery_client
+
+
+@lazy
+def get_bigquery_client() -> bigquery.Client:
+    '''
+    Return the process-wide BigQuery client, constructed on first use.
+
+    Returns:
+        bigquery.Client: The BigQuery client.
+    '''
+
+    return bigquery.Client()
+
+# Function: get_table_id
+
+
+def get_table_id(table: str) -> str:
+    '''
+    Return the fully qualified ID of a table in the current project.
+
+    Args:
+        table (str): The dataset and table, e.g. 'routes.stops'.
+
+    Returns:
+        str: The table ID.
+    '''
+
+    return f'{get_bigquery_client().project}.{table}'
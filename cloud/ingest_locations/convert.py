@@ -1,26 +1,65 @@
 import datetime as dt
+import pandas as pd
 import pytz
 
-# Function: resolve_update_datetime
+# Preamble.
 
+timezone = 'America/Sao_Paulo'
 
-def resolve_update_datetime(request_datetime, update_time):
+# Function: parse_request_datetime
+
+
+def parse_request_datetime(date: str) -> dt.datetime:
+    '''
+    Return the request datetime in America/Sao_Paulo given the value of
+    the Date header of a response.
+
+    Arguments:
+        date -- The Date header, which HTTP always expresses in GMT
+    '''
+
+    request_datetime = dt.datetime.strptime(date, '%a, %d %b %Y %H:%M:%S GMT')
+
+    request_datetime = pytz.utc.localize(request_datetime).astimezone(pytz.timezone(timezone))
+
+    return request_datetime
+
+# Function: resolve_update_datetimes
+
+
+def resolve_update_datetimes(request_datetime, update_times):
     '''
-    Return the resolved update datetime, correcting for
-    inconsistencies more likely to occur around midnight.
+    Return the resolved update datetimes for a whole array of update
+    times, correcting for inconsistencies more likely to occur around
+    midnight.
+
+    Each 'HH:MM' update time is combined with the request date, rolled
+    back one day where it falls later than the request time and then
+    localized to America/Sao_Paulo. Update times that cannot be parsed
+    resolve to NaT.
 
     Arguments:
         request_datetime -- The timezone-aware request datetime
-        update_time -- The timezone-aware update time
+        update_times -- A pandas Series of 'HH:MM' update times
     '''
 
-    update_datetime = dt.datetime.combine(request_datetime.date(), update_time)
+    request_datetime = request_datetime.astimezone(pytz.timezone(timezone)).replace(tzinfo=None)
+
+    update_datetimes = pd.to_datetime(
+        request_datetime.strftime('%Y-%m-%d ') + update_times,
+        format='%Y-%m-%d %H:%M',
+        errors='coerce'
+    )
 
-    update_datetime = pytz.timezone('America/Sao_Paulo').localize(update_datetime)
+    update_datetimes = update_datetimes.where(
+        update_datetimes <= request_datetime,
+        update_datetimes - pd.Timedelta(days=1)
+    )
 
-    if update_datetime > request_datetime:
-        update_datetime -= dt.timedelta(days=1)
-    else:
-        pass
+    update_datetimes = update_datetimes.dt.tz_localize(
+        timezone,
+        ambiguous='NaT',
+        nonexistent='shift_forward'
+    )
 
-    return update_datetime
+    return update_datetimes
@@ -1,30 +1,53 @@
-import requests
-import datetime as dt
-import pytz
-import pandas as pd
-import numpy as np
-from convert import resolve_update_datetime
-from keys import api_key_bus_data
-from google.cloud import bigquery
 import datetime as dt
 import pytz
 import pandas as pd
+import urbs
+from convert import parse_request_datetime
+from parse import parse_set_of_locations
+from clients import get_bigquery_client
 
-# Preamble.
+# Function: fetch_locations_response
 
-client = bigquery.Client()
+
+def fetch_locations_response(
+        line_number: str,
+        timeout: float = 15,
+    ) -> urbs.Result:
+    """
+    Request the latest set of bus locations for a line from the API.
+
+    Args:
+        line_number (str): The line number.
+        timeout (float): The request timeout, in seconds. Defaults to 15.
+
+    Returns:
+        urbs.Result: The structured result of the request.
+    """
+
+    result = urbs.get(
+        endpoint='getVeiculos',
+        line_number=line_number,
+        timeout=timeout
+    )
+
+    if not result.ok:
+        print(f'Locations request for line number {line_number} has failed ({result.error}).')
+
+    return result
 
 # Function: fetch_locations_batch.
 
 
 def fetch_set_of_locations(
         line_number: str,
+        timeout: float = 15,
     ) -> pd.DataFrame:
     """
     Return a pandas Dataframe containing the latest set of bus locations.
 
     Args:
         line_number (str): The line number.
+        timeout (float): The request timeout, in seconds. Defaults to 15.
 
     Returns:
         pd.DataFrame: Latest bus locations and other data.
@@ -32,164 +55,128 @@ def fetch_set_of_locations(
 
     # 1. Perform request.
 
-    positions_url = 'https://transporteservico.urbs.curitiba.pr.gov.br/getVeiculos.php?linha={0}&c={1}'
-
-    url = positions_url.format(line_number, api_key_bus_data)
-
-    try:
-        r = requests.get(url, timeout=15)
-
-        if r.status_code == 200:
-            r_json = r.json()
-
-            if len(r_json) > 0:
-                # 2. Create locations_batch.
-
-                set_of_locations = pd.DataFrame()
-
-                request_datetime = r.headers['Date']
-                request_datetime = dt.datetime.strptime(request_datetime, '%a, %d %b %Y %H:%M:%S GMT')
-                request_datetime = pytz.timezone('America/Sao_Paulo').localize(request_datetime)
-
-                vehicles = list(r_json.keys())
-
-                for vehicle in vehicles:
-                    row = pd.json_normalize(r_json[vehicle])
-
-                    set_of_locations = pd.concat(
-                        objs=[set_of_locations, row],
-                        axis=0,
-                        ignore_index=True
-                    )
-
-                set_of_locations.rename(
-                    mapper={
-                        'COD': 'fleet_number',
-                        'REFRESH': 'update_time',
-                        'LAT': 'latitude',
-                        'LON': 'longitude',
-                        'CODIGOLINHA': 'line_number',
-                        'ADAPT': 'wheelchair_accessibility',
-                        'TIPO_VEIC': 'bus_type',
-                        'TABELA': 'timetable',
-                        'SITUACAO': 'status_time',
-                        'SITUACAO2': 'status_route',
-                        'SENT': 'direction',
-                        'TCOUNT': 'cycle_count',
-                        'SENTIDO': 'destination'
-                    },
-                    axis=1,
-                    inplace=True
-                )
-
-                # 3. Resolve update_datetime.
-
-                set_of_locations['update_datetime'] = set_of_locations['update_time'].apply(lambda x: dt.datetime.strptime(x, '%H:%M').replace(year=request_datetime.year, month=request_datetime.month, day=request_datetime.day))
-
-                set_of_locations['update_datetime'] = set_of_locations['update_datetime'].apply(lambda x: x.replace(tzinfo=pytz.timezone('America/Sao_Paulo')))
-
-                set_of_locations['update_datetime'] = set_of_locations['update_datetime'].apply(lambda x: resolve_update_datetime(request_datetime=request_datetime, update_time=x.to_pydatetime().time()))
-
-                # 4. Set dtypes.
-
-                for column in ['latitude', 'longitude']:
-                    set_of_locations[column] = pd.to_numeric(set_of_locations[column], errors='coerce').astype(dtype=np.float32)
-
-                set_of_locations['wheelchair_accessibility'] = pd.to_numeric(set_of_locations['wheelchair_accessibility'], errors='coerce').astype(dtype=pd.UInt8Dtype())
-
-                set_of_locations['timetable'] = pd.to_numeric(set_of_locations['timetable'], errors='coerce').astype(pd.UInt8Dtype())
-
-                set_of_locations['cycle_count'] = pd.to_numeric(set_of_locations['cycle_count'], errors='coerce').astype(pd.UInt8Dtype())
-
-                # 5. Translate values into English.
-
-                set_of_locations['bus_type'] = set_of_locations['bus_type'].replace(
-                    to_replace={
-                        '1': 'Standard', # 'COMUM',
-                        '2': 'Semi-padron', # 'SEMI PADRON',
-                        '3': 'Padron', # 'PADRON',
-                        '4': 'Articulated', # 'ARTICULADO',
-                        '5': 'Bi-articulated', # 'BIARTICULADO',
-                        '6': 'Microbus', # 'MICRO',
-                        '7': 'Special microbus', # 'MICRO ESPECIAL',
-                        '8': 'Biofuel bi-articulated', # 'BIARTIC. BIO',
-                        '9': 'Biofuel articulated', # 'ARTIC. BIO',
-                        '10': 'Hybrid', # 'HIBRIDO',
-                        '11': 'Biofuel hybrid', # 'HIBRIDO BIO',
-                        '12': 'Electric', # 'ELÉTRICO'
-                    }
-                )
-
-                set_of_locations['status_time'] = set_of_locations['status_time'].replace(
-                    to_replace={
-                        'ADIANTADO': 'Early',
-                        'ATRASADO': 'Delayed',
-                        'NO HORÁRIO': 'On time',
-                        'NÃO CONFORMIDADE': 'Nonconformance'
-                    }
-                )
-
-                set_of_locations['status_route'] = set_of_locations['status_route'].replace(
-                    to_replace={
-                        'REALIZANDO ROTA': 'On route',
-                        'TIPO INCOMPATIVEL': 'Incompatible type',
-                        'FALHA DE GPS': 'GPS failure',
-                        'COM MENSAGEM NÃO LIDA': 'Has unread message'
-                    }
-                )
-
-                set_of_locations['direction'] = set_of_locations['direction'].replace(
-                    to_replace={
-                        'IDA': 'Outbound',
-                        'VOLTA': 'Inbound',
-                        'CIRCULAR': 'Circular'
-                    }
-                )
-
-                set_of_locations['destination'] = set_of_locations['destination'].replace(to_replace={'sem tabela': 'No timetable'})
-
-                # 6. Re-order columns and return locations_batch.
-
-                set_of_locations = set_of_locations[
-                    [
-                        'fleet_number',
-                        'update_datetime',
-                        'latitude',
-                        'longitude',
-                        'line_number',
-                        'wheelchair_accessibility',
-                        'bus_type',
-                        'timetable',
-                        'status_time',
-                        'status_route',
-                        'direction',
-                        'cycle_count',
-                        'destination',
-                    ]
-                ]
-
-                return set_of_locations
-
-            else:
-                print('Request for locations has resulted in an empty list.')
-                return None
-
-        else:
-            print('Request status code != 200')
-            return None
+    result = fetch_locations_response(
+        line_number=line_number,
+        timeout=timeout
+    )
 
-    except requests.Timeout:
-        print('Request has timed out.')
+    if not result.ok:
         return None
 
-    except requests.JSONDecodeError:
-        print('JSON decode error.')
-        return None
+    # 2. Parse set of locations.
+
+    return parse_locations_response(result=result)
+
+# Function: parse_locations_response
+
+
+def parse_locations_response(result: urbs.Result) -> pd.DataFrame:
+    """
+    Parse a successful getVeiculos result into a set of locations.
+
+    Args:
+        result (urbs.Result): A successful getVeiculos result.
+
+    Returns:
+        pd.DataFrame: The set of locations.
+    """
+
+    request_datetime = parse_request_datetime(date=result.date)
+
+    set_of_locations = parse_set_of_locations(
+        r_json=result.data,
+        request_datetime=request_datetime
+    )
+
+    return set_of_locations
+
+# Function: fetch_line_numbers
+
+
+def fetch_line_numbers() -> list:
+    '''
+    Fetch the numbers of all lines in lines.lines.
+
+    Returns:
+        list: The line numbers.
+    '''
+
+    query = '''
+    SELECT line_number
+    FROM lines.lines
+    ORDER BY line_number
+    '''
+
+    lines = get_bigquery_client().query_and_wait(query=query).to_dataframe()
+
+    return lines['line_number'].to_list()
 
-    except requests.ConnectionError:
-        print('Connection error.')
+# Function: fetch_sets_of_locations
+
+
+def fetch_sets_of_locations(
+        line_numbers: list,
+        max_workers: int = 16,
+        timeout: float = 15,
+    ) -> pd.DataFrame:
+    '''
+    Fetch the latest sets of locations for several lines concurrently and
+    merge them into a single batch.
+
+    Args:
+        line_numbers (list): The line numbers whose locations are fetched.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
+        timeout (float): The timeout, in seconds, of each request.
+            Defaults to 15.
+
+    Returns:
+        pd.DataFrame: The merged sets of locations, or None if no line
+            returned any location.
+    '''
+
+    errors = {}
+
+    def fetch_line(line_number: str) -> pd.DataFrame:
+        result = fetch_locations_response(
+            line_number=line_number,
+            timeout=timeout
+        )
+
+        if not result.ok:
+            errors[line_number] = result.error
+            return None
+
+        return parse_locations_response(result=result)
+
+    sets_of_locations, failures = urbs.map_lines(
+        function=fetch_line,
+        line_numbers=line_numbers,
+        max_workers=max_workers
+    )
+
+    # Report the error of each failed request rather than 'no data'.
+    failures.update(errors)
+
+    print(
+        'Fetched locations for {0} out of {1} lines.'.format(
+            len(sets_of_locations),
+            len(line_numbers)
+        )
+    )
+
+    if len(failures) > 0:
+        print(f'Locations requests have failed for {len(failures)} out of {len(line_numbers)} lines: {failures}')
+
+    if len(sets_of_locations) == 0:
         return None
 
+    return pd.concat(
+        objs=sets_of_locations,
+        axis=0,
+        ignore_index=True
+    )
+
 # Function: convert_to_timezone
 
 
@@ -253,46 +240,42 @@ def fetch_recent_locations(hours: int) -> pd.DataFrame:
     ORDER BY update_datetime DESC
     '''.format(then_local)
 
-    recent_locations = client.query_and_wait(query=query).to_dataframe()
+    recent_locations = get_bigquery_client().query_and_wait(query=query).to_dataframe()
 
-    recent_locations['update_datetime'] = recent_locations['update_datetime'].apply(convert_to_timezone)
+    recent_locations['update_datetime'] = recent_locations['update_datetime'].dt.tz_convert('America/Sao_Paulo')
 
     return recent_locations
 
 
-# Function: drop_potential_location_duplicates
+# Function: fingerprint_locations
 
 
-def drop_potential_location_duplicates(
-        recent_locations: pd.DataFrame,
-        set_of_locations: pd.DataFrame
-    ) -> pd.DataFrame:
+def fingerprint_locations(locations: pd.DataFrame) -> pd.Series:
     '''
-    Eliminate from a set of locations the observations in locations.locations.
+    Hash the composite key (fleet_number, update_datetime, latitude,
+    longitude) of each location into a 64-bit fingerprint.
+
+    The key columns are normalized first (update_datetime to UTC
+    nanoseconds, coordinates to float64), so that locations fetched from
+    the API and read back from locations.locations hash alike.
 
     Args:
-        recent_locations (pd.DataFrame): The most recent locations in
-            locations.locations.
-        set_of_locations (pd.DataFrame): The set of locations fetch from
-            the API.
+        locations (pd.DataFrame): A set of locations.
 
     Returns:
-        pd.DataFrame: The set of locations, the observations already in
-            locations.locations dropped.
+        pd.Series: The uint64 fingerprint of each location.
     '''
-    if recent_locations.shape[0] == 0:
-        return set_of_locations
 
-    elif set_of_locations is not None:
-        fleet_number_condition = set_of_locations['fleet_number'].isin(recent_locations['fleet_number'])
-        update_datetime_condition = set_of_locations['update_datetime'].isin(recent_locations['update_datetime'])
-        latitude_condition = set_of_locations['latitude'].isin(recent_locations['latitude'])
-        longitude_condition = set_of_locations['longitude'].isin(recent_locations['longitude'])
-        condition = fleet_number_condition * update_datetime_condition * latitude_condition * longitude_condition
+    update_datetime = pd.to_datetime(locations['update_datetime'], utc=True)
 
-        set_of_locations = set_of_locations.loc[~condition]
+    keys = pd.DataFrame(
+        data={
+            'fleet_number': locations['fleet_number'].astype(str),
+            'update_datetime': update_datetime.dt.tz_localize(None).astype('datetime64[ns]').astype('int64'),
+            'latitude': locations['latitude'].astype('float64'),
+            'longitude': locations['longitude'].astype('float64')
+        },
+        index=locations.index
+    )
 
-        return set_of_locations
-
-    else:
-        return None
+    return pd.util.hash_pandas_object(keys, index=False)
@@ -1,134 +1,165 @@
 from google.cloud import bigquery
 import pandas as pd
-from fetch import fetch_set_of_locations, fetch_recent_locations, drop_potential_location_duplicates
+from fetch import fetch_line_numbers, fetch_sets_of_locations, fetch_recent_locations
+from state import fetch_last_seen, summarize_last_seen, drop_seen_locations, update_last_seen
+from write import BigQuerySink, LocationsWriter
+from clients import get_table_id
 
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.locations.locations'
+schema = [
+    bigquery.SchemaField(
+        name='fleet_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The vehicle\'s fleet number.'
+    ),
+    bigquery.SchemaField(
+        name='update_datetime',
+        field_type='TIMESTAMP',
+        mode='REQUIRED',
+        description='The date and time at which the location was reported.'
+    ),
+    bigquery.SchemaField(
+        name='latitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The reported latitutde.'
+    ),
+    bigquery.SchemaField(
+        name='longitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The reported longitude.'
+    ),
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='wheelchair_accessibility',
+        field_type='INTEGER',
+        mode='NULLABLE',
+        description='Whether the vehicle has wheelchair accessibility (1 = yes).'
+    ),
+    bigquery.SchemaField(
+        name='bus_type',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The bus type.'
+    ),
+    bigquery.SchemaField(
+        name='timetable',
+        field_type='INTEGER',
+        mode='NULLABLE',
+        description='The timetable followed by the vehicle.'
+    ),
+    bigquery.SchemaField(
+        name='status_time',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The location status regarding time.'
+    ),
+    bigquery.SchemaField(
+        name='status_route',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The location status regarding the route.'
+    ),
+    bigquery.SchemaField(
+        name='direction',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The vehicle\'s direction.'
+    ),
+    bigquery.SchemaField(
+        name='cycle_count',
+        field_type='INTEGER',
+        mode='REQUIRED',
+        description='Count of cycles with no location update (1 = updated).'
+    ),
+    bigquery.SchemaField(
+        name='destination',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The vehicle\'s destination.'
+    )
+]
 
 # Function: ingest_locations
 
-def ingest_locations(line_number: str):
+def ingest_locations(
+        line_numbers: list = None,
+        max_workers: int = 16,
+        timeout: float = 15,
+        streaming: bool = True,
+        sink=None
+    ):
     '''
-    Fetch set of locations and ingest it.
+    Fetch the sets of locations of several lines concurrently and ingest
+    them in a single write.
 
     Args:
-        line_number (str): The line number whose locations are ingested.
+        line_numbers (list): The line numbers whose locations are ingested.
+            Defaults to None, in which case all lines in lines.lines are
+            ingested.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
+        timeout (float): The timeout, in seconds, of each request.
+            Defaults to 15.
+        streaming (bool): If True, locations are streamed into
+            locations.locations with their row IDs, so that a retried
+            invocation does not duplicate them and no load job is run
+            every minute. Otherwise, they are loaded with a load job,
+            which ignores row IDs. Defaults to True.
+        sink: The sink to which locations are written. Defaults to None,
+            in which case locations.locations is used.
     '''
     # Fetch and deduplicate set of locations.
 
-    recent_locations = fetch_recent_locations(hours=3)
-    set_of_locations = fetch_set_of_locations(line_number=line_number)
-    set_of_locations = drop_potential_location_duplicates(
-        recent_locations=recent_locations,
+    if line_numbers is None:
+        line_numbers = fetch_line_numbers()
+
+    # The last-seen index is bootstrapped from locations.locations only
+    # when it does not exist yet.
+    last_seen = fetch_last_seen()
+
+    if last_seen.shape[0] == 0:
+        last_seen = summarize_last_seen(locations=fetch_recent_locations(hours=3))
+
+    set_of_locations = fetch_sets_of_locations(
+        line_numbers=line_numbers,
+        max_workers=max_workers,
+        timeout=timeout
+    )
+    set_of_locations = drop_seen_locations(
+        last_seen=last_seen,
         set_of_locations=set_of_locations
     )
 
-    if set_of_locations is not None:
-        # Set configuration options for load job.
-
-        job_config = bigquery.LoadJobConfig(
-            schema = [
-                bigquery.SchemaField(
-                    name='fleet_number',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The vehicle\'s fleet number.'
-                ),
-                bigquery.SchemaField(
-                    name='update_datetime',
-                    field_type='TIMESTAMP',
-                    mode='REQUIRED',
-                    description='The date and time at which the location was reported.'
-                ),
-                bigquery.SchemaField(
-                    name='latitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='The reported latitutde.'
-                ),
-                bigquery.SchemaField(
-                    name='longitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='The reported longitude.'
-                ),
-                bigquery.SchemaField(
-                    name='line_number',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The line number.'
-                ),
-                bigquery.SchemaField(
-                    name='wheelchair_accessibility',
-                    field_type='INTEGER',
-                    mode='NULLABLE',
-                    description='Whether the vehicle has wheelchair accessibility (1 = yes).'
-                ),
-                bigquery.SchemaField(
-                    name='bus_type',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The bus type.'
-                ),
-                bigquery.SchemaField(
-                    name='timetable',
-                    field_type='INTEGER',
-                    mode='NULLABLE',
-                    description='The timetable followed by the vehicle.'
-                ),
-                bigquery.SchemaField(
-                    name='status_time',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The location status regarding time.'
-                ),
-                bigquery.SchemaField(
-                    name='status_route',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The location status regarding the route.'
-                ),
-                bigquery.SchemaField(
-                    name='direction',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The vehicle\'s direction.'
-                ),
-                bigquery.SchemaField(
-                    name='cycle_count',
-                    field_type='INTEGER',
-                    mode='REQUIRED',
-                    description='Count of cycles with no location update (1 = updated).'
-                ),
-                bigquery.SchemaField(
-                    name='destination',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The vehicle\'s destination.'
-                )
-            ],
-            write_disposition='WRITE_APPEND',
+    if sink is None:
+        sink = BigQuerySink(
+            table_id=get_table_id(table='locations.locations'),
+            schema=schema,
+            streaming=streaming
         )
 
-        # Load data.
+    # Write data.
 
-        job = client.load_table_from_dataframe(
-            dataframe=set_of_locations,
-            destination=table_id,
-            job_config=job_config
-        )
-        job.result()
+    writer = LocationsWriter(sink=sink)
+
+    batches = [
+        writer.write(set_of_locations=set_of_locations),
+        writer.flush()
+    ]
+    batches = [batch for batch in batches if batch is not None]
+
+    if len(batches) > 0:
+        # Update last-seen index.
 
-        table = client.get_table(table_id)
-        print(
-            'Loaded {0} rows to {1}, which now has {2} rows.'.format(
-                set_of_locations.shape[0],
-                table_id,
-                table.num_rows
-            )
+        update_last_seen(
+            last_seen=last_seen,
+            set_of_locations=pd.concat(objs=batches, ignore_index=True)
         )
 
     else:
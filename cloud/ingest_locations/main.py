@@ -1,6 +1,10 @@
 from ingest import ingest_locations
+from archive import flush_archive
 import functions_framework
 
 @functions_framework.cloud_event
 def ingest_locations_entry_point(cloud_event):
-    ingest_locations(line_number='216')
+    try:
+        ingest_locations()
+    finally:
+        flush_archive()
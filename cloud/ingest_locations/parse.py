@@ -0,0 +1,136 @@
+import datetime as dt
+import pandas as pd
+import numpy as np
+from convert import resolve_update_datetimes
+
+# Preamble.
+
+columns = {
+    'COD': 'fleet_number',
+    'REFRESH': 'update_time',
+    'LAT': 'latitude',
+    'LON': 'longitude',
+    'CODIGOLINHA': 'line_number',
+    'ADAPT': 'wheelchair_accessibility',
+    'TIPO_VEIC': 'bus_type',
+    'TABELA': 'timetable',
+    'SITUACAO': 'status_time',
+    'SITUACAO2': 'status_route',
+    'SENT': 'direction',
+    'TCOUNT': 'cycle_count',
+    'SENTIDO': 'destination'
+}
+
+translations = {
+    'bus_type': {
+        '1': 'Standard', # 'COMUM',
+        '2': 'Semi-padron', # 'SEMI PADRON',
+        '3': 'Padron', # 'PADRON',
+        '4': 'Articulated', # 'ARTICULADO',
+        '5': 'Bi-articulated', # 'BIARTICULADO',
+        '6': 'Microbus', # 'MICRO',
+        '7': 'Special microbus', # 'MICRO ESPECIAL',
+        '8': 'Biofuel bi-articulated', # 'BIARTIC. BIO',
+        '9': 'Biofuel articulated', # 'ARTIC. BIO',
+        '10': 'Hybrid', # 'HIBRIDO',
+        '11': 'Biofuel hybrid', # 'HIBRIDO BIO',
+        '12': 'Electric', # 'ELÉTRICO'
+    },
+    'status_time': {
+        'ADIANTADO': 'Early',
+        'ATRASADO': 'Delayed',
+        'NO HORÁRIO': 'On time',
+        'NÃO CONFORMIDADE': 'Nonconformance'
+    },
+    'status_route': {
+        'REALIZANDO ROTA': 'On route',
+        'TIPO INCOMPATIVEL': 'Incompatible type',
+        'FALHA DE GPS': 'GPS failure',
+        'COM MENSAGEM NÃO LIDA': 'Has unread message'
+    },
+    'direction': {
+        'IDA': 'Outbound',
+        'VOLTA': 'Inbound',
+        'CIRCULAR': 'Circular'
+    },
+    'destination': {
+        'sem tabela': 'No timetable'
+    }
+}
+
+# Function: parse_set_of_locations
+
+
+def parse_set_of_locations(
+        r_json: dict,
+        request_datetime: dt.datetime
+    ) -> pd.DataFrame:
+    '''
+    Parse a getVeiculos payload into a set of locations in a single pass.
+
+    The vehicles are read into column arrays by a single from_records
+    call, and the rename, dtype coercion and translation maps are then
+    applied to whole columns.
+
+    Args:
+        r_json (dict): The decoded getVeiculos payload, keyed by vehicle.
+        request_datetime (dt.datetime): The timezone-aware request
+            datetime.
+
+    Returns:
+        pd.DataFrame: The set of locations.
+    '''
+
+    # 1. Create set_of_locations.
+
+    set_of_locations = pd.DataFrame.from_records(data=list(r_json.values()))
+
+    set_of_locations.rename(
+        mapper=columns,
+        axis=1,
+        inplace=True
+    )
+
+    # 2. Resolve update_datetime.
+
+    set_of_locations['update_datetime'] = resolve_update_datetimes(
+        request_datetime=request_datetime,
+        update_times=set_of_locations['update_time']
+    )
+
+    set_of_locations = set_of_locations.loc[set_of_locations['update_datetime'].notna()].reset_index(drop=True)
+
+    # 3. Set dtypes.
+
+    for column in ['latitude', 'longitude']:
+        set_of_locations[column] = pd.to_numeric(set_of_locations[column], errors='coerce').astype(dtype=np.float32)
+
+    for column in ['wheelchair_accessibility', 'timetable', 'cycle_count']:
+        set_of_locations[column] = pd.to_numeric(set_of_locations[column], errors='coerce').astype(dtype=pd.UInt8Dtype())
+
+    # 4. Translate values into English.
+
+    for column, translation in translations.items():
+        set_of_locations[column] = set_of_locations[column].replace(to_replace=translation)
+
+    # 5. Re-order columns and return set_of_locations.
+
+    set_of_locations = set_of_locations[
+        [
+            'fleet_number',
+            'update_datetime',
+            'latitude',
+            'longitude',
+            'line_number',
+            'wheelchair_accessibility',
+            'bus_type',
+            'timetable',
+            'status_time',
+            'status_route',
+            'direction',
+            'cycle_count',
+            'destination',
+        ]
+    ]
+
+    return set_of_locations
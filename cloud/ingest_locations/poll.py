@@ -0,0 +1,305 @@
+import argparse
+import datetime as dt
+import hashlib
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from fetch import fetch_line_numbers, fetch_locations_response, parse_locations_response, fetch_recent_locations
+from state import fetch_last_seen, summarize_last_seen, drop_seen_locations, fold_last_seen, store_last_seen
+from write import BigQuerySink, LocationsWriter
+from ingest import schema
+from clients import get_table_id
+from archive import flush_archive
+
+# Function: new_line_schedule
+
+
+def new_line_schedule(interval: float) -> dict:
+    '''
+    Return the initial poll schedule of a line.
+
+    Args:
+        interval (float): The initial poll interval, in seconds.
+
+    Returns:
+        dict: The poll schedule, holding the current interval, the hash of
+            the last payload and the latest update_datetime seen.
+    '''
+
+    return {
+        'interval': interval,
+        'payload_hash': None,
+        'update_datetime': None
+    }
+
+# Function: poll_line
+
+
+def poll_line(
+        line_number: str,
+        line_schedule: dict,
+        timeout: float,
+        min_interval: float,
+        max_interval: float
+    ) -> pd.DataFrame:
+    '''
+    Poll a line once and adapt its poll schedule.
+
+    The payload is hashed before parsing: if it matches the previous poll,
+    nothing is parsed and the interval backs off. If the latest update
+    time of the line has changed, the interval is halved; otherwise, it is
+    doubled.
+
+    Args:
+        line_number (str): The line number.
+        line_schedule (dict): The poll schedule of the line, updated in
+            place.
+        timeout (float): The request timeout, in seconds.
+        min_interval (float): The shortest poll interval, in seconds.
+        max_interval (float): The longest poll interval, in seconds.
+
+    Returns:
+        pd.DataFrame: The set of locations, or None if the payload has not
+            changed or the request has failed.
+    '''
+
+    back_off = min(line_schedule['interval'] * 2, max_interval)
+    speed_up = max(line_schedule['interval'] / 2, min_interval)
+
+    result = fetch_locations_response(
+        line_number=line_number,
+        timeout=timeout
+    )
+
+    if not result.ok:
+        line_schedule['interval'] = back_off
+        return None
+
+    payload_hash = hashlib.blake2b(result.content, digest_size=16).digest()
+
+    if payload_hash == line_schedule['payload_hash']:
+        line_schedule['interval'] = back_off
+        return None
+
+    line_schedule['payload_hash'] = payload_hash
+
+    set_of_locations = parse_locations_response(result=result)
+
+    if set_of_locations.shape[0] == 0:
+        line_schedule['interval'] = back_off
+        return None
+
+    update_datetime = set_of_locations['update_datetime'].max()
+
+    if update_datetime != line_schedule['update_datetime']:
+        line_schedule['update_datetime'] = update_datetime
+        line_schedule['interval'] = speed_up
+
+    else:
+        line_schedule['interval'] = back_off
+
+    return set_of_locations
+
+# Function: fail_line
+
+
+def fail_line(
+        line_schedule: dict,
+        max_interval: float
+    ):
+    '''
+    Back off a line whose poll has failed, and forget its payload hash so
+    that its next payload is parsed even if it has not changed.
+
+    Args:
+        line_schedule (dict): The poll schedule of the line, updated in
+            place.
+        max_interval (float): The longest poll interval, in seconds.
+    '''
+
+    line_schedule['interval'] = min(line_schedule['interval'] * 2, max_interval)
+    line_schedule['payload_hash'] = None
+
+# Function: poll_locations
+
+
+def poll_locations(
+        line_numbers: list = None,
+        min_interval: float = 15,
+        max_interval: float = 600,
+        max_workers: int = 16,
+        timeout: float = 15,
+        max_rows: int = 5000,
+        max_seconds: float = 60,
+        streaming: bool = True,
+        sink=None
+    ):
+    '''
+    Poll the locations of several lines indefinitely, each line on its
+    own adaptive schedule, and write them in micro-batches.
+
+    Busy lines converge to min_interval, while quiet lines, and every line
+    overnight, back off towards max_interval. Only lines that are due are
+    requested at each tick, and unchanged payloads are neither parsed nor
+    written.
+
+    Errors do not stop the poller. A line whose poll fails, e.g. on a
+    malformed payload, is backed off like a quiet line. A failed write
+    keeps the buffer, and a failed update of the stored last-seen index
+    keeps the updated index in memory; both are retried at the next tick.
+
+    Archived responses are written once per hour, in one segment per
+    partition.
+
+    Args:
+        line_numbers (list): The line numbers whose locations are polled.
+            Defaults to None, in which case all lines in lines.lines are
+            polled.
+        min_interval (float): The shortest poll interval, in seconds.
+            Defaults to 15.
+        max_interval (float): The longest poll interval, in seconds.
+            Defaults to 600.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
+        timeout (float): The timeout, in seconds, of each request.
+            Defaults to 15.
+        max_rows (int): The number of buffered rows that triggers a write.
+            Defaults to 5000.
+        max_seconds (float): The age of the buffer, in seconds, that
+            triggers a write. Defaults to 60.
+        streaming (bool): If True, locations are streamed into
+            locations.locations. Defaults to True.
+        sink: The sink to which locations are written. Defaults to None,
+            in which case locations.locations is used.
+    '''
+
+    # 1. Prepare schedules, deduplication state and writer.
+
+    if line_numbers is None:
+        line_numbers = fetch_line_numbers()
+
+    line_schedules = {
+        line_number: new_line_schedule(interval=min_interval)
+        for line_number in line_numbers
+    }
+
+    queue = [(time.monotonic(), line_number) for line_number in line_numbers]
+    heapq.heapify(queue)
+
+    last_seen = fetch_last_seen()
+
+    if last_seen.shape[0] == 0:
+        last_seen = summarize_last_seen(locations=fetch_recent_locations(hours=3))
+
+    if sink is None:
+        sink = BigQuerySink(
+            table_id=get_table_id(table='locations.locations'),
+            schema=schema,
+            streaming=streaming
+        )
+
+    writer = LocationsWriter(
+        sink=sink,
+        max_rows=max_rows,
+        max_seconds=max_seconds
+    )
+
+    # 2. Poll due lines, write and reschedule them.
+
+    last_seen_stored = True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            now = time.monotonic()
+
+            due_line_numbers = []
+
+            while len(queue) > 0 and queue[0][0] <= now:
+                due_line_numbers.append(heapq.heappop(queue)[1])
+
+            try:
+                futures = {
+                    line_number: executor.submit(
+                        poll_line,
+                        line_number=line_number,
+                        line_schedule=line_schedules[line_number],
+                        timeout=timeout,
+                        min_interval=min_interval,
+                        max_interval=max_interval
+                    )
+                    for line_number in due_line_numbers
+                }
+
+                for line_number, future in futures.items():
+                    try:
+                        set_of_locations = drop_seen_locations(
+                            last_seen=last_seen,
+                            set_of_locations=future.result()
+                        )
+
+                    except Exception as e:
+                        print(f'Polling line number {line_number} has failed ({e!r}).')
+                        fail_line(
+                            line_schedule=line_schedules[line_number],
+                            max_interval=max_interval
+                        )
+                        continue
+
+                    writer.append(set_of_locations=set_of_locations)
+
+                try:
+                    batch = writer.flush_if_due()
+
+                except Exception as e:
+                    print(f'Writing {writer.buffered_rows} buffered locations has failed ({e!r}).')
+                    batch = None
+
+                if batch is not None:
+                    last_seen = fold_last_seen(
+                        last_seen=last_seen,
+                        set_of_locations=batch
+                    )
+                    last_seen_stored = False
+
+                if not last_seen_stored:
+                    try:
+                        store_last_seen(last_seen=last_seen)
+                        last_seen_stored = True
+
+                    except Exception as e:
+                        print(f'Updating the last-seen index has failed ({e!r}).')
+
+                try:
+                    flush_archive(before=dt.datetime.now(dt.timezone.utc).replace(tzinfo=None))
+
+                except Exception as e:
+                    print(f'Writing the archive has failed ({e!r}).')
+
+            finally:
+                for line_number in due_line_numbers:
+                    heapq.heappush(
+                        queue,
+                        (now + line_schedules[line_number]['interval'], line_number)
+                    )
+
+            time.sleep(max(min(queue[0][0], now + 1) - time.monotonic(), 0))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Poll bus locations continuously.')
+    parser.add_argument('--min-interval', type=float, default=15)
+    parser.add_argument('--max-interval', type=float, default=600)
+    parser.add_argument('--max-workers', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=15)
+    args = parser.parse_args()
+
+    try:
+        poll_locations(
+            min_interval=args.min_interval,
+            max_interval=args.max_interval,
+            max_workers=args.max_workers,
+            timeout=args.timeout
+        )
+
+    finally:
+        flush_archive()
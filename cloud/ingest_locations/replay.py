@@ -0,0 +1,104 @@
+import argparse
+import datetime as dt
+import json
+from archive import replay_archive
+from convert import parse_request_datetime
+from parse import parse_set_of_locations
+from write import LocationsWriter, ParquetSink
+
+# Function: parse_archived_locations
+
+
+def parse_archived_locations(record: dict):
+    '''
+    Parse an archived getVeiculos record into a set of locations.
+
+    Args:
+        record (dict): An archived record.
+
+    Returns:
+        pd.DataFrame: The set of locations, or None if the payload is empty.
+    '''
+
+    r_json = json.loads(record['body'])
+
+    if len(r_json) == 0:
+        return None
+
+    return parse_set_of_locations(
+        r_json=r_json,
+        request_datetime=parse_request_datetime(date=record['date'])
+    )
+
+# Function: replay_locations
+
+
+def replay_locations(
+        start: dt.datetime,
+        end: dt.datetime,
+        sink,
+        line_number: str = None,
+        max_workers: int = None
+    ) -> int:
+    '''
+    Re-parse the archived getVeiculos responses within a time range and
+    write the resulting locations to a sink.
+
+    Args:
+        start (dt.datetime): The start of the range, naive in UTC.
+        end (dt.datetime): The end of the range, naive in UTC, exclusive.
+        sink: The sink to which locations are written.
+        line_number (str): If given, only this line is replayed. Defaults
+            to None.
+        max_workers (int): The number of worker processes. Defaults to
+            None, i.e. the number of CPUs.
+
+    Returns:
+        int: The number of locations written.
+    '''
+
+    writer = LocationsWriter(sink=sink)
+
+    count = 0
+
+    batches = replay_archive(
+        endpoint='getVeiculos',
+        parse=parse_archived_locations,
+        start=start,
+        end=end,
+        line_number=line_number,
+        max_workers=max_workers
+    )
+
+    for batch in batches:
+        flushed = writer.write(set_of_locations=batch)
+
+        if flushed is not None:
+            count += flushed.shape[0]
+
+    flushed = writer.flush()
+
+    if flushed is not None:
+        count += flushed.shape[0]
+
+    print('Replayed {0} locations.'.format(count))
+
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay archived getVeiculos responses.')
+    parser.add_argument('--start', type=dt.datetime.fromisoformat, required=True, help='Start of the range, in UTC.')
+    parser.add_argument('--end', type=dt.datetime.fromisoformat, required=True, help='End of the range, in UTC, exclusive.')
+    parser.add_argument('--output', required=True, help='Directory where Parquet files are written.')
+    parser.add_argument('--line-number', default=None)
+    parser.add_argument('--max-workers', type=int, default=None)
+    args = parser.parse_args()
+
+    replay_locations(
+        start=args.start,
+        end=args.end,
+        sink=ParquetSink(path=args.output),
+        line_number=args.line_number,
+        max_workers=args.max_workers
+    )
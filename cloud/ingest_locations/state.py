@@ -0,0 +1,273 @@
+from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
+import pandas as pd
+from fetch import fingerprint_locations
+from clients import get_bigquery_client, get_table_id
+
+columns = [
+    'fleet_number',
+    'update_datetime',
+    'latitude',
+    'longitude'
+]
+
+schema = [
+    bigquery.SchemaField(
+        name='fleet_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The vehicle\'s fleet number.'
+    ),
+    bigquery.SchemaField(
+        name='update_datetime',
+        field_type='TIMESTAMP',
+        mode='REQUIRED',
+        description='The date and time of the latest location ingested for the vehicle.'
+    ),
+    bigquery.SchemaField(
+        name='latitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The latitude of the latest location ingested for the vehicle.'
+    ),
+    bigquery.SchemaField(
+        name='longitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The longitude of the latest location ingested for the vehicle.'
+    )
+]
+
+# Function: fetch_last_seen
+
+
+def fetch_last_seen() -> pd.DataFrame:
+    '''
+    Fetch the last-seen index, which holds the latest location ingested
+    for each fleet number.
+
+    Returns:
+        pd.DataFrame: The last-seen index, empty if it does not exist yet.
+    '''
+
+    query = '''
+    SELECT *
+    FROM locations.last_seen
+    '''
+
+    try:
+        last_seen = get_bigquery_client().query_and_wait(query=query).to_dataframe()
+
+    except NotFound:
+        print('Table locations.last_seen not found.')
+        return pd.DataFrame(columns=columns + ['fingerprint'])
+
+    last_seen['update_datetime'] = last_seen['update_datetime'].dt.tz_convert('America/Sao_Paulo')
+
+    return fingerprint_last_seen(last_seen=last_seen)
+
+# Function: fingerprint_last_seen
+
+
+def fingerprint_last_seen(last_seen: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Attach to the last-seen index the fingerprint of each location, unless
+    it already holds them. The fingerprints are only kept in memory, so
+    that each location is hashed once rather than at every poll.
+
+    Args:
+        last_seen (pd.DataFrame): The last-seen index, or any set of
+            locations.
+
+    Returns:
+        pd.DataFrame: The locations, with a fingerprint column.
+    '''
+
+    if 'fingerprint' in last_seen:
+        return last_seen[columns + ['fingerprint']]
+
+    return last_seen[columns].assign(fingerprint=fingerprint_locations(locations=last_seen))
+
+# Function: summarize_last_seen
+
+
+def summarize_last_seen(locations: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Reduce a set of locations to the latest location of each fleet number.
+
+    Args:
+        locations (pd.DataFrame): Any set of locations, e.g. the output of
+            fetch_recent_locations.
+
+    Returns:
+        pd.DataFrame: The latest location of each fleet number, with its
+            fingerprint.
+    '''
+
+    last_seen = locations[locations.columns.intersection(columns + ['fingerprint'], sort=False)]
+
+    last_seen = last_seen.sort_values(
+        by='update_datetime',
+        kind='stable'
+    )
+
+    last_seen = last_seen.drop_duplicates(
+        subset='fleet_number',
+        keep='last',
+        ignore_index=True
+    )
+
+    return fingerprint_last_seen(last_seen=last_seen)
+
+# Function: drop_seen_locations
+
+
+def drop_seen_locations(
+        last_seen: pd.DataFrame,
+        set_of_locations: pd.DataFrame
+    ) -> pd.DataFrame:
+    '''
+    Eliminate from a set of locations the observations that are not newer
+    than the last-seen location of their fleet number.
+
+    A location is kept if its update_datetime is later than the last-seen
+    one, or if it is equal but the position differs, since update times
+    only have a resolution of one minute. Locations are compared on the
+    fingerprint of their composite key (fleet_number, update_datetime,
+    latitude, longitude), so that a location is only dropped as a
+    duplicate of a location of the same vehicle. Only the new locations are
+    hashed: those of the last-seen index are hashed when they are folded
+    into it.
+
+    Args:
+        last_seen (pd.DataFrame): The last-seen index.
+        set_of_locations (pd.DataFrame): The set of locations fetched from
+            the API.
+
+    Returns:
+        pd.DataFrame: The set of locations, the observations already
+            ingested dropped.
+    '''
+    if set_of_locations is None:
+        return None
+
+    fingerprints = fingerprint_locations(locations=set_of_locations)
+
+    set_of_locations = set_of_locations.loc[~fingerprints.duplicated()].reset_index(drop=True)
+    fingerprints = fingerprints.loc[~fingerprints.duplicated()].reset_index(drop=True)
+
+    if last_seen.shape[0] == 0:
+        return set_of_locations
+
+    last_seen = fingerprint_last_seen(last_seen=last_seen)
+
+    positions = pd.Index(last_seen['fleet_number']).get_indexer(set_of_locations['fleet_number'])
+
+    last_update_datetime = set_of_locations['fleet_number'].map(
+        last_seen.set_index('fleet_number')['update_datetime']
+    )
+
+    # Each location is compared with the fingerprint of the last-seen
+    # location of its own vehicle. Positions of unseen vehicles are -1, but
+    # their update times never compare equal.
+    last_fingerprints = last_seen['fingerprint'].to_numpy()[positions]
+
+    unseen_condition = last_update_datetime.isna()
+    newer_condition = set_of_locations['update_datetime'] > last_update_datetime
+    moved_condition = (set_of_locations['update_datetime'] == last_update_datetime) & (
+        fingerprints.to_numpy() != last_fingerprints
+    )
+    condition = unseen_condition | newer_condition | moved_condition
+
+    set_of_locations = set_of_locations.loc[condition].reset_index(drop=True)
+
+    return set_of_locations
+
+# Function: fold_last_seen
+
+
+def fold_last_seen(
+        last_seen: pd.DataFrame,
+        set_of_locations: pd.DataFrame
+    ) -> pd.DataFrame:
+    '''
+    Fold a set of locations into the last-seen index, in memory.
+
+    Args:
+        last_seen (pd.DataFrame): The last-seen index.
+        set_of_locations (pd.DataFrame): The set of locations to be folded.
+
+    Returns:
+        pd.DataFrame: The updated last-seen index.
+    '''
+
+    objs = [
+        fingerprint_last_seen(last_seen=locations)
+        for locations in [last_seen, set_of_locations]
+        if locations.shape[0] > 0
+    ]
+
+    if len(objs) == 0:
+        return fingerprint_last_seen(last_seen=last_seen)
+
+    return summarize_last_seen(
+        locations=pd.concat(
+            objs=objs,
+            ignore_index=True
+        )
+    )
+
+# Function: store_last_seen
+
+
+def store_last_seen(last_seen: pd.DataFrame):
+    '''
+    Replace the stored last-seen index with a single WRITE_TRUNCATE load
+    job, which is atomic.
+
+    Args:
+        last_seen (pd.DataFrame): The last-seen index.
+    '''
+
+    job_config = bigquery.LoadJobConfig(
+        schema=schema,
+        write_disposition='WRITE_TRUNCATE',
+    )
+
+    job = get_bigquery_client().load_table_from_dataframe(
+        dataframe=last_seen[columns],
+        destination=get_table_id(table='locations.last_seen'),
+        job_config=job_config
+    )
+    job.result()
+
+    print('Updated last-seen index for {0} vehicles.'.format(last_seen.shape[0]))
+
+# Function: update_last_seen
+
+
+def update_last_seen(
+        last_seen: pd.DataFrame,
+        set_of_locations: pd.DataFrame
+    ) -> pd.DataFrame:
+    '''
+    Fold a freshly loaded set of locations into the last-seen index and
+    store the updated index. It must only be called after the set of
+    locations has been loaded successfully.
+
+    Args:
+        last_seen (pd.DataFrame): The last-seen index before the load.
+        set_of_locations (pd.DataFrame): The set of locations just loaded.
+
+    Returns:
+        pd.DataFrame: The updated last-seen index.
+    '''
+
+    last_seen = fold_last_seen(
+        last_seen=last_seen,
+        set_of_locations=set_of_locations
+    )
+
+    store_last_seen(last_seen=last_seen)
+
+    return last_seen
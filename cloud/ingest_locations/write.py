@@ -0,0 +1,249 @@
+import os
+import time
+from pathlib import Path
+from google.cloud import bigquery
+import pandas as pd
+from fetch import fingerprint_locations
+from clients import get_bigquery_client
+
+# Class: BigQuerySink
+
+
+class BigQuerySink:
+    '''
+    Write batches of locations to a BigQuery table, either with a load job
+    or through the streaming API.
+
+    Only the streaming API deduplicates retried writes, on their row IDs
+    and on a best-effort basis. Load jobs have no notion of row IDs: each
+    attempt appends its whole batch, so a batch retried after a load job
+    that actually succeeded, e.g. one whose result timed out, is written
+    twice.
+
+    Args:
+        table_id (str): The ID of the destination table.
+        schema (list): The schema of the destination table.
+        streaming (bool): If True, rows are streamed with insertAll and the
+            row IDs are used for best-effort deduplication of retries.
+            Otherwise, each batch is appended with a load job and the row
+            IDs are ignored. Defaults to False.
+        chunk_size (int): The number of rows per insertAll request.
+            Defaults to 500.
+    '''
+
+    def __init__(
+            self,
+            table_id: str,
+            schema: list,
+            streaming: bool = False,
+            chunk_size: int = 500
+        ):
+        self.client = get_bigquery_client()
+        self.table_id = table_id
+        self.schema = schema
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+
+    def write(
+            self,
+            batch: pd.DataFrame,
+            row_ids: list
+        ):
+        '''
+        Write a batch of locations. Raises if any row is rejected.
+
+        Args:
+            batch (pd.DataFrame): The locations to be written.
+            row_ids (list): A deterministic ID for each row, only used in
+                streaming mode.
+        '''
+
+        if self.streaming:
+            rows = batch.astype(object).where(batch.notna(), None).to_dict(orient='records')
+
+            for start in range(0, len(rows), self.chunk_size):
+                errors = self.client.insert_rows(
+                    table=self.table_id,
+                    rows=rows[start:start + self.chunk_size],
+                    selected_fields=self.schema,
+                    row_ids=row_ids[start:start + self.chunk_size]
+                )
+
+                if len(errors) > 0:
+                    raise RuntimeError('Streaming insert has failed: {0}'.format(errors))
+
+        else:
+            job_config = bigquery.LoadJobConfig(
+                schema=self.schema,
+                write_disposition='WRITE_APPEND',
+            )
+
+            job = self.client.load_table_from_dataframe(
+                dataframe=batch,
+                destination=self.table_id,
+                job_config=job_config
+            )
+            job.result()
+
+        print('Wrote {0} rows to {1}.'.format(batch.shape[0], self.table_id))
+
+# Class: ParquetSink
+
+
+class ParquetSink:
+    '''
+    Write batches of locations as Parquet files in a local directory, a
+    stand-in for BigQuery in tests and benchmarks.
+
+    Each batch is written to a file named after its row IDs, through a
+    temporary file and an atomic rename, so that retrying a batch
+    overwrites the same file rather than duplicating its rows.
+
+    Args:
+        path (str): The directory where Parquet files are written.
+    '''
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def write(
+            self,
+            batch: pd.DataFrame,
+            row_ids: list
+        ):
+        '''
+        Write a batch of locations.
+
+        Args:
+            batch (pd.DataFrame): The locations to be written.
+            row_ids (list): A deterministic ID for each row.
+        '''
+
+        batch_id = pd.util.hash_array(pd.Series(row_ids).to_numpy()).sum()
+
+        file_path = self.path / 'part-{0:016x}.parquet'.format(batch_id)
+        temporary_file_path = file_path.with_suffix('.tmp')
+
+        batch.to_parquet(path=temporary_file_path, index=False)
+        os.replace(temporary_file_path, file_path)
+
+        print('Wrote {0} rows to {1}.'.format(batch.shape[0], file_path))
+
+# Class: LocationsWriter
+
+
+class LocationsWriter:
+    '''
+    Buffer sets of locations and write them to a sink in micro-batches.
+
+    The buffer is flushed when it holds at least max_rows rows or when its
+    oldest set of locations is at least max_seconds old. Rows are removed
+    from the buffer only after the sink has accepted them, so delivery is
+    at-least-once. Each row carries an ID derived from its composite key,
+    so that retried writes are idempotent with sinks that honour row IDs:
+    ParquetSink and BigQuerySink in streaming mode. BigQuerySink in load
+    job mode may duplicate the rows of a retried batch.
+
+    Args:
+        sink: Any object with a write(batch, row_ids) method, such as
+            BigQuerySink or ParquetSink.
+        max_rows (int): The number of buffered rows that triggers a flush.
+            Defaults to 10000.
+        max_seconds (float): The age of the buffer, in seconds, that
+            triggers a flush. Defaults to 60.
+    '''
+
+    def __init__(
+            self,
+            sink,
+            max_rows: int = 10000,
+            max_seconds: float = 60
+        ):
+        self.sink = sink
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.buffer = []
+        self.buffered_rows = 0
+        self.buffered_since = None
+
+    def write(self, set_of_locations: pd.DataFrame) -> pd.DataFrame:
+        '''
+        Buffer a set of locations and flush the buffer if it is due.
+
+        Args:
+            set_of_locations (pd.DataFrame): The locations to be written.
+
+        Returns:
+            pd.DataFrame: The flushed batch, or None if nothing was flushed.
+        '''
+
+        self.append(set_of_locations=set_of_locations)
+
+        return self.flush_if_due()
+
+    def append(self, set_of_locations: pd.DataFrame):
+        '''
+        Buffer a set of locations without flushing.
+
+        Args:
+            set_of_locations (pd.DataFrame): The locations to be written.
+        '''
+
+        if set_of_locations is not None and set_of_locations.shape[0] > 0:
+            if self.buffered_since is None:
+                self.buffered_since = time.monotonic()
+
+            self.buffer.append(set_of_locations)
+            self.buffered_rows += set_of_locations.shape[0]
+
+    def flush_if_due(self) -> pd.DataFrame:
+        '''
+        Flush the buffer if it has reached the size or age threshold.
+
+        Returns:
+            pd.DataFrame: The flushed batch, or None if nothing was flushed.
+        '''
+
+        if self.buffered_rows == 0:
+            return None
+
+        size_condition = self.buffered_rows >= self.max_rows
+        age_condition = time.monotonic() - self.buffered_since >= self.max_seconds
+
+        if size_condition or age_condition:
+            return self.flush()
+
+        return None
+
+    def flush(self) -> pd.DataFrame:
+        '''
+        Write all buffered locations to the sink.
+
+        Returns:
+            pd.DataFrame: The flushed batch, or None if the buffer was
+                empty.
+        '''
+
+        if self.buffered_rows == 0:
+            return None
+
+        batch = pd.concat(
+            objs=self.buffer,
+            ignore_index=True
+        )
+
+        row_ids = fingerprint_locations(locations=batch)
+        batch = batch.loc[~row_ids.duplicated()].reset_index(drop=True)
+        row_ids = row_ids.loc[~row_ids.duplicated()].map('{0:016x}'.format).to_list()
+
+        self.sink.write(
+            batch=batch,
+            row_ids=row_ids
+        )
+
+        self.buffer = []
+        self.buffered_rows = 0
+        self.buffered_since = None
+
+        return batch
@@ -92,6 +92,13 @@ table = bigquery.Table(
     schema=schema
 )
 
+# Partition the table by day of update_datetime, so that queries on a time
+# window only scan the days it spans.
+table.time_partitioning = bigquery.TimePartitioning(
+    type_=bigquery.TimePartitioningType.DAY,
+    field='update_datetime'
+)
+
 # Specify the table description.
 table.description = 'Bus locations retrieved every two minutes from API.'
 
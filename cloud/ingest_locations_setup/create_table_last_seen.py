@@ -0,0 +1,47 @@
+from google.cloud import bigquery
+
+# Construct a BigQuery client object.
+client = bigquery.Client()
+
+# Set table_id to the ID of the table to create.
+table_id = f'{client.project}.locations.last_seen'
+
+schema = [
+    bigquery.SchemaField(
+        name='fleet_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The vehicle\'s fleet number.'
+    ),
+    bigquery.SchemaField(
+        name='update_datetime',
+        field_type='TIMESTAMP',
+        mode='REQUIRED',
+        description='The date and time of the latest location ingested for the vehicle.'
+    ),
+    bigquery.SchemaField(
+        name='latitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The latitude of the latest location ingested for the vehicle.'
+    ),
+    bigquery.SchemaField(
+        name='longitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The longitude of the latest location ingested for the vehicle.'
+    )
+]
+
+table = bigquery.Table(
+    table_ref=table_id,
+    schema=schema
+)
+
+# Specify the table description.
+table.description = 'Latest location ingested for each vehicle, used for deduplication.'
+
+table = client.create_table(table)  # Make an API request.
+print(
+    'Created table {}.{}.{}'.format(table.project, table.dataset_id, table.table_id)
+)
@@ -1,3 +1,5 @@
+URBS_ARCHIVE_BUCKET=$(gcloud config get-value project)-urbs-archive
+gcloud storage buckets create gs://${URBS_ARCHIVE_BUCKET} --location=southamerica-east1
 gcloud pubsub topics create ingest_locations
 gcloud functions deploy ingest_locations \
     --region=southamerica-east1 \
@@ -5,7 +7,13 @@ gcloud functions deploy ingest_locations \
     --gen2 \
     --runtime=python312 \
     --memory=512M \
-    --trigger-topic=ingest_locations
+    --trigger-topic=ingest_locations \
+    --set-env-vars=URBS_ARCHIVE_PATH=/mnt/urbs_archive
+gcloud run services update ingest-locations \
+    --region=southamerica-east1 \
+    --execution-environment=gen2 \
+    --add-volume=name=urbs-archive,type=cloud-storage,bucket=${URBS_ARCHIVE_BUCKET} \
+    --add-volume-mount=volume=urbs-archive,mount-path=/mnt/urbs_archive
 gcloud scheduler jobs create pubsub ingest_locations \
     --location=southamerica-east1 \
     --schedule="* 0,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23 * * *" \
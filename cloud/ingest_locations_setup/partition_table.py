@@ -0,0 +1,58 @@
+from google.cloud import bigquery
+
+# Construct a BigQuery client object.
+client = bigquery.Client()
+
+# Set table_id to the ID of the unpartitioned table to migrate, and
+# partitioned_table_id to that of the partitioned table it is rebuilt into.
+# Pause the ingest_locations scheduler job first, so that no location lands
+# in the old table once it has been copied:
+#     gcloud scheduler jobs pause ingest_locations --location=southamerica-east1
+table_id = f'{client.project}.locations.locations'
+partitioned_table_id = f'{client.project}.locations.locations_partitioned'
+
+table = client.get_table(table_id)  # Make an API request.
+
+if table.time_partitioning is not None:
+    raise SystemExit('Table {} is already partitioned.'.format(table_id))
+
+# Create the partitioned table with the same schema and description,
+# partitioned by day of update_datetime as in create_table.py.
+partitioned_table = bigquery.Table(
+    table_ref=partitioned_table_id,
+    schema=table.schema
+)
+partitioned_table.time_partitioning = bigquery.TimePartitioning(
+    type_=bigquery.TimePartitioningType.DAY,
+    field='update_datetime'
+)
+partitioned_table.description = table.description
+
+client.create_table(partitioned_table)  # Make an API request.
+
+# Copy the rows over.
+query = '''
+INSERT INTO `{0}`
+SELECT * FROM `{1}`
+'''.format(partitioned_table_id, table_id)
+
+client.query_and_wait(query)  # Make an API request.
+
+copied_rows = client.get_table(partitioned_table_id).num_rows
+
+if copied_rows != table.num_rows:
+    raise SystemExit(
+        'Copied {} rows out of {}; {} is left as it is.'.format(copied_rows, table.num_rows, table_id)
+    )
+
+# Replace the old table with the partitioned one. A copy job into a missing
+# table keeps the partitioning of its source.
+client.delete_table(table_id)  # Make an API request.
+client.copy_table(partitioned_table_id, table_id).result()  # Make an API request.
+client.delete_table(partitioned_table_id)  # Make an API request.
+
+print(
+    'Partitioned table {} by day of update_datetime ({} rows).'.format(table_id, copied_rows)
+)
+print('Resume the ingest_locations scheduler job:')
+print('    gcloud scheduler jobs resume ingest_locations --location=southamerica-east1')
@@ -1,6 +1,10 @@
 from update import update_lines
+from archive import flush_archive
 import functions_framework
 
 @functions_framework.cloud_event
 def update_lines_entry_point(cloud_event):
-    update_lines()
+    try:
+        update_lines(incremental=True)
+    finally:
+        flush_archive()
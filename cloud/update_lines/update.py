@@ -1,71 +1,84 @@
 from google.cloud import bigquery
 import pandas as pd
 from fetch import fetch_lines
+from clients import get_bigquery_client, get_table_id
+from incremental import update_incrementally
 
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.lines.lines'
+schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='line_name_original',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The original line name as per the API.'
+    ),
+    bigquery.SchemaField(
+        name='line_name_short',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='A short line name.'
+    ),
+    bigquery.SchemaField(
+        name='line_name_long',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='A long line name.'
+    ),
+    bigquery.SchemaField(
+        name='fare_card_only',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='Whether the line accepts fare cards only.'
+    ),
+    bigquery.SchemaField(
+        name='service_category',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The service category.'
+    ),
+    bigquery.SchemaField(
+        name='color',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line color.'
+    )
+]
 
 # Function: update_lines
 
-def update_lines():
+def update_lines(incremental: bool = False) -> list:
     """
     Update table containing bus lines.
+
+    If incremental is True, only the rows of lines whose content has
+    changed are rewritten, and the changed line numbers are returned.
     """
+    client = get_bigquery_client()
+    table_id = get_table_id(table='lines.lines')
+
     # Fetch lines.
 
     lines = fetch_lines()
 
+    if lines is not None and incremental:
+        # Replace the rows of changed lines only.
+
+        return update_incrementally(
+            data=lines,
+            line_numbers=lines['line_number'].to_list(),
+            table_id=table_id
+        )
+
     if lines is not None:
         # Set configuration options for load job.
 
         job_config = bigquery.LoadJobConfig(
-            schema = [
-                bigquery.SchemaField(
-                    name='line_number',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The line number.'
-                ),
-                bigquery.SchemaField(
-                    name='line_name_original',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The original line name as per the API.'
-                ),
-                bigquery.SchemaField(
-                    name='line_name_short',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='A short line name.'
-                ),
-                bigquery.SchemaField(
-                    name='line_name_long',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='A long line name.'
-                ),
-                bigquery.SchemaField(
-                    name='fare_card_only',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='Whether the line accepts fare cards only.'
-                ),
-                bigquery.SchemaField(
-                    name='service_category',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The service category.'
-                ),
-                bigquery.SchemaField(
-                    name='color',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The line color.'
-                )
-            ],
+            schema=schema,
             write_disposition='WRITE_TRUNCATE',
         )
 
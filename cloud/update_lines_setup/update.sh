@@ -1,7 +1,14 @@
+URBS_ARCHIVE_BUCKET=$(gcloud config get-value project)-urbs-archive
 gcloud functions deploy update_lines \
     --region=southamerica-east1 \
     --entry-point=update_lines_entry_point \
     --gen2 \
     --runtime=python312 \
     --memory=512M \
-    --trigger-topic=update_lines
+    --trigger-topic=update_lines \
+    --set-env-vars=URBS_ARCHIVE_PATH=/mnt/urbs_archive
+gcloud run services update update-lines \
+    --region=southamerica-east1 \
+    --execution-environment=gen2 \
+    --add-volume=name=urbs-archive,type=cloud-storage,bucket=${URBS_ARCHIVE_BUCKET} \
+    --add-volume-mount=volume=urbs-archive,mount-path=/mnt/urbs_archive
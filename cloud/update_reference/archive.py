@@ -0,0 +1,281 @@
+import datetime as dt
+import gzip
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+
+# Preamble.
+
+# Archiving is enabled by pointing URBS_ARCHIVE_PATH at a directory, e.g.
+# the Cloud Storage bucket that the deploy scripts mount.
+archive_path = os.environ.get('URBS_ARCHIVE_PATH')
+
+date_format = '%a, %d %b %Y %H:%M:%S GMT'
+
+# Records waiting to be written, as gzip members keyed by (endpoint, line,
+# hour). Responses are archived from several threads at once.
+buffer = {}
+buffer_lock = threading.Lock()
+
+# Function: archive_response
+
+
+def archive_response(
+        endpoint: str,
+        line_number: str,
+        r
+    ):
+    '''
+    Add a raw URBS response to the archive buffer, if archiving is enabled.
+
+    Responses are stored as gzip-compressed JSON lines in segment files
+    partitioned by endpoint, line and hour (in UTC, from the response Date
+    header). Each record is compressed as a separate gzip member. Records
+    are only written by flush_archive. The API key is never stored.
+
+    Args:
+        endpoint (str): The endpoint, e.g. 'getVeiculos'.
+        line_number (str): The line number, or None for endpoints that are
+            not requested per line.
+        r (requests.Response): The response.
+    '''
+
+    if archive_path is None:
+        return
+
+    date = r.headers.get('Date')
+
+    try:
+        request_datetime = dt.datetime.strptime(date, date_format)
+    except (TypeError, ValueError):
+        request_datetime = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+        date = request_datetime.strftime(date_format)
+
+    record = {
+        'endpoint': endpoint,
+        'line_number': line_number,
+        'date': date,
+        'status_code': r.status_code,
+        'body': r.text
+    }
+
+    partition = (
+        endpoint,
+        line_number or 'all',
+        request_datetime.replace(minute=0, second=0, microsecond=0)
+    )
+
+    member = gzip.compress((json.dumps(record) + '\n').encode('utf-8'))
+
+    with buffer_lock:
+        buffer.setdefault(partition, []).append(member)
+
+# Function: flush_archive
+
+
+def flush_archive(before: dt.datetime = None) -> int:
+    '''
+    Write the buffered records of each partition to a new segment file,
+    e.g. at the end of an invocation.
+
+    Segment files are written once under a unique name and never appended
+    to, since appending to an object of a mounted bucket rewrites it whole
+    and concurrent appends are not supported. If a segment cannot be
+    written, its records stay buffered for the next flush.
+
+    Args:
+        before (dt.datetime): If given, only the partitions of hours that
+            start before it, naive in UTC, are written, so that a
+            long-running process writes one segment per hour. Defaults to
+            None, in which case every partition is written.
+
+    Returns:
+        int: The number of segment files written.
+    '''
+
+    with buffer_lock:
+        partitions = [
+            partition
+            for partition in buffer
+            if before is None or partition[2] + dt.timedelta(hours=1) <= before
+        ]
+        members = {partition: buffer.pop(partition) for partition in partitions}
+
+    created_datetime = dt.datetime.now(dt.timezone.utc)
+
+    for n_segments, ((endpoint, line, hour), partition_members) in enumerate(members.items()):
+        directory = Path(archive_path) / 'endpoint={0}'.format(endpoint) / 'line={0}'.format(line) / hour.strftime('date=%Y-%m-%d/hour=%H')
+        file_name = 'segment-{0:%Y%m%dT%H%M%S}-{1}.jsonl.gz'.format(created_datetime, uuid.uuid4().hex)
+
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+
+            with open(directory / file_name, 'xb') as f:
+                f.write(b''.join(partition_members))
+
+        except OSError:
+            with buffer_lock:
+                for partition in list(members)[n_segments:]:
+                    buffer[partition] = members[partition] + buffer.get(partition, [])
+
+            raise
+
+    return len(members)
+
+# Function: list_segments
+
+
+def list_segments(
+        endpoint: str,
+        start: dt.datetime,
+        end: dt.datetime,
+        line_number: str = None
+    ) -> list:
+    '''
+    List the archived segment files of an endpoint within a time range.
+
+    Args:
+        endpoint (str): The endpoint, e.g. 'getVeiculos'.
+        start (dt.datetime): The start of the range, naive in UTC.
+        end (dt.datetime): The end of the range, naive in UTC, exclusive.
+        line_number (str): If given, only segments of this line are
+            listed. Defaults to None.
+
+    Returns:
+        list: The segment file paths, sorted by hour and line.
+    '''
+
+    line = line_number or '*'
+
+    segments = []
+
+    hour = start.replace(minute=0, second=0, microsecond=0)
+
+    while hour < end:
+        pattern = 'endpoint={0}/line={1}/{2}/segment*.jsonl.gz'.format(
+            endpoint,
+            line,
+            hour.strftime('date=%Y-%m-%d/hour=%H')
+        )
+        segments.extend(sorted(Path(archive_path).glob(pattern)))
+        hour += dt.timedelta(hours=1)
+
+    return segments
+
+# Function: read_segment
+
+
+def read_segment(path: str):
+    '''
+    Yield the records of a segment file.
+
+    Args:
+        path (str): The segment file path.
+    '''
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+# Function: replay_segment
+
+
+def replay_segment(
+        path: str,
+        parse,
+        start: dt.datetime,
+        end: dt.datetime
+    ) -> pd.DataFrame:
+    '''
+    Re-run a parser over the successful records of a segment file that
+    fall within a time range.
+
+    Args:
+        path (str): The segment file path.
+        parse: A module-level function that takes an archived record and
+            returns a DataFrame or None.
+        start (dt.datetime): The start of the range, naive in UTC.
+        end (dt.datetime): The end of the range, naive in UTC, exclusive.
+
+    Returns:
+        pd.DataFrame: The concatenated output of the parser, or None.
+    '''
+
+    batches = []
+
+    for record in read_segment(path=path):
+        request_datetime = dt.datetime.strptime(record['date'], date_format)
+
+        if record['status_code'] != 200 or not start <= request_datetime < end:
+            continue
+
+        try:
+            batch = parse(record)
+        except (ValueError, KeyError) as e:
+            print('Record from {0} could not be parsed: {1}'.format(record['date'], e))
+            continue
+
+        if batch is not None and batch.shape[0] > 0:
+            batches.append(batch)
+
+    if len(batches) == 0:
+        return None
+
+    return pd.concat(
+        objs=batches,
+        ignore_index=True
+    )
+
+# Function: replay_archive
+
+
+def replay_archive(
+        endpoint: str,
+        parse,
+        start: dt.datetime,
+        end: dt.datetime,
+        line_number: str = None,
+        max_workers: int = None
+    ):
+    '''
+    Re-run a parser over the archive of an endpoint within a time range,
+    one segment per worker process, and yield the resulting batches in
+    segment order.
+
+    Args:
+        endpoint (str): The endpoint, e.g. 'getVeiculos'.
+        parse: A module-level function that takes an archived record and
+            returns a DataFrame or None.
+        start (dt.datetime): The start of the range, naive in UTC.
+        end (dt.datetime): The end of the range, naive in UTC, exclusive.
+        line_number (str): If given, only this line is replayed. Defaults
+            to None.
+        max_workers (int): The number of worker processes. Defaults to
+            None, i.e. the number of CPUs.
+    '''
+
+    segments = list_segments(
+        endpoint=endpoint,
+        start=start,
+        end=end,
+        line_number=line_number
+    )
+
+    print('Replaying {0} segments of {1}.'.format(len(segments), endpoint))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        batches = executor.map(
+            replay_segment,
+            segments,
+            [parse] * len(segments),
+            [start] * len(segments),
+            [end] * len(segments)
+        )
+
+        for batch in batches:
+            if batch is not None:
+                yield batch
@@ -0,0 +1,130 @@
+import urbs
+from parse import parse_line_stops, parse_route, parse_stretch
+import pandas as pd
+from clients import get_bigquery_client
+
+# Function: fetch_line_stops
+
+
+def fetch_line_stops(line_number: str) -> pd.DataFrame:
+    '''
+    Fetch the stops for a given line number.
+
+    Args:
+        line_number (str): The line number.
+
+    Returns:
+        pd.DataFrame: The stops of the route.
+    '''
+
+    # 1. Perform request.
+
+    result = urbs.get(
+        endpoint='getPontosLinha',
+        line_number=line_number
+    )
+
+    # 2. Handle errors.
+
+    if not result.ok:
+        print(f'Stops request for line number {line_number} has failed ({result.error}).')
+        return None
+
+    # 3. Format and return data.
+
+    stops = parse_line_stops(
+        r_json=result.data,
+        line_number=line_number
+    )
+
+    return stops
+
+# Function: fetch_route
+
+
+def fetch_route(line_number: str) -> pd.DataFrame:
+    '''
+    Fetch the route for a given line number.
+
+    Args:
+        line_number (str): The line number.
+
+    Returns:
+        pd.DataFrame: The points defining the route.
+    '''
+
+    # 1. Perform request.
+
+    result = urbs.get(
+        endpoint='getShapeLinha',
+        line_number=line_number
+    )
+
+    # 2. Handle errors.
+
+    if not result.ok:
+        print(f'Route request for line number {line_number} has failed ({result.error}).')
+        return None
+
+    # 3. Format and return data.
+
+    route = parse_route(r_json=result.data)
+
+    return route
+
+# Function: fetch_stretch
+
+
+def fetch_stretch(line_number: str) -> pd.DataFrame:
+    '''
+    Fetch the stretch for a given line number.
+
+    Args:
+        line_number (str): The line number.
+
+    Returns:
+        pd.DataFrame: The the stretch the route.
+    '''
+
+    # 1. Perform request.
+
+    result = urbs.get(
+        endpoint='getTrechosItinerarios',
+        line_number=line_number
+    )
+
+    # 2. Handle errors.
+
+    if not result.ok:
+        print(f'Stretch request for line number {line_number} has failed ({result.error}).')
+        return None
+
+    # 3. Format and return data.
+
+    stretch = parse_stretch(r_json=result.data)
+
+    return stretch
+
+# Function: fetch_lines
+
+
+def fetch_lines() -> pd.DataFrame:
+    '''
+    Fetch data on bus lines.
+
+    Returns:
+        pd.DataFrame: Data on bus lines.
+    '''
+
+    client = get_bigquery_client()
+
+    QUERY = f'''
+    SELECT *
+    FROM `{client.project}.lines.lines`
+    '''
+
+    query_job = client.query(QUERY)
+    rows = query_job.result()
+    lines = rows.to_dataframe()
+
+    return lines
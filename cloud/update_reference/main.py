@@ -0,0 +1,10 @@
+from update import update_reference
+from archive import flush_archive
+import functions_framework
+
+@functions_framework.cloud_event
+def update_reference_entry_point(cloud_event):
+    try:
+        update_reference()
+    finally:
+        flush_archive()
@@ -0,0 +1,249 @@
+import pandas as pd
+
+# Function: parse_line_stops
+
+
+def parse_line_stops(
+        r_json: list,
+        line_number: str
+    ) -> pd.DataFrame:
+    '''
+    Parse a getPontosLinha payload into the stops of a line.
+
+    Args:
+        r_json (list): The decoded getPontosLinha payload.
+        line_number (str): The line number.
+
+    Returns:
+        pd.DataFrame: The stops of the route.
+    '''
+
+    # 1. Format data.
+
+    # Points are collected into a single frame in one pass; a point that
+    # lacks a field gets NaN in that column, as with a row-by-row concat.
+    stops = pd.DataFrame.from_records(data=r_json)
+
+    stops.rename(
+        mapper={
+            'NOME': 'name',
+            'NUM': 'number',
+            'LAT': 'latitude',
+            'LON': 'longitude',
+            'SEQ': 'order',
+            'GRUPO': 'group',
+            'SENTIDO': 'direction',
+            'TIPO': 'type',
+            'ITINERARY_ID': 'itinerary_id'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    stops['line_number'] = line_number
+
+    for column in ['latitude', 'longitude']:
+        stops[column] = stops[column].str.replace(',', '.')
+
+    stops = stops.astype(
+        dtype={
+            'name': str,
+            'number': str,
+            'latitude': str,
+            'longitude': str,
+            'order': int,
+            'group': str,
+            'direction': str,
+            'type': str,
+            'itinerary_id': str,
+            'line_number': str
+        }
+    )
+
+    stops = stops[
+        [
+            'line_number',
+            'itinerary_id',
+            'group',
+            'number',
+            'name',
+            'type',
+            'order',
+            'direction',
+            'latitude',
+            'longitude'
+        ]
+    ]
+
+    # 2. Return data.
+
+    return stops
+
+# Function: parse_route
+
+
+def parse_route(r_json: list) -> pd.DataFrame:
+    '''
+    Parse a getShapeLinha payload into the points defining a route.
+
+    Args:
+        r_json (list): The decoded getShapeLinha payload.
+
+    Returns:
+        pd.DataFrame: The points defining the route.
+    '''
+
+    # 1. Format data.
+
+    # Points are collected into a single frame in one pass, and the order
+    # of each point is its position in the payload.
+    route = pd.DataFrame.from_records(data=r_json)
+
+    route.reset_index(
+        drop=False,
+        inplace=True
+    )
+
+    route.rename(
+        mapper={
+            'index': 'order',
+            'SHP': 'route_id',
+            'LAT': 'latitude',
+            'LON': 'longitude',
+            'COD': 'line_number'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    for column in ['latitude', 'longitude']:
+        route[column] = route[column].str.replace(',', '.')
+
+    route = route.astype(
+        dtype={
+            'route_id': int,
+            'latitude': float,
+            'longitude': float,
+            'line_number': str,
+            'order': int
+        }
+    )
+
+    route = route[
+        [
+            'line_number',
+            'route_id',
+            'order',
+            'latitude',
+            'longitude'
+        ]
+    ]
+
+    # 2. Return data.
+
+    return route
+
+# Function: parse_stretch
+
+
+def parse_stretch(r_json: list) -> pd.DataFrame:
+    '''
+    Parse a getTrechosItinerarios payload into the stretch of a route.
+
+    Args:
+        r_json (list): The decoded getTrechosItinerarios payload.
+
+    Returns:
+        pd.DataFrame: The stretch of the route.
+    '''
+
+    # 1. Format data.
+
+    # Points are flattened into a single frame in one pass.
+    stretch = pd.json_normalize(data=r_json)
+
+    stretch.rename(
+        mapper={
+            'COD_LINHA': 'line_number',
+            'NOME_LINHA': 'line_name_original',
+            'COD_CATEGORIA': 'service_category_code',
+            'NOME_CATEGORIA': 'service_category',
+            'COD_EMPRESA': 'company_code',
+            'NOME_EMPRESA': 'company',
+            'COD_PTO_PARADA_TH': 'stop_code_timetable',
+            'NOME_PTO_PARADA_TH': 'stop_name_timetable',
+            'SEQ_PTO_ITI_TH': 'order_itinerary',
+            'COD_ITINERARIO': 'itinerary_code',
+            'NOME_ITINERARIO': 'itinerary',
+            'PTO_ESPECIAL': 'special_stop',
+            'COD_PTO_TRECHO_A': 'point_code_stretch_start',
+            'SEQ_PONTO_TRECHO_A': 'point_order_start',
+            'COD_PTO_TRECHO_B': 'point_code_strech_end',
+            'SEQ_PONTO_TRECHO_B': 'point_order_end',
+            'EXTENSAO_TRECHO_A_ATE_B': 'distance_start_to_end',
+            'TIPO_TRECHO': 'stretch_type',
+            'STOP_CODE': 'stop_code',
+            'STOP_NAME': 'stop_name',
+            'CODIGO_URBS': 'urbs_code'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    stretch['distance_start_to_end'] = stretch['distance_start_to_end'].str.replace(',', '.')
+
+    stretch = stretch.astype(
+        dtype={
+            'line_number': str,
+            'line_name_original': str,
+            'service_category_code': str,
+            'service_category': str,
+            'company_code': str,
+            'company': str,
+            'stop_code_timetable': str,
+            'stop_name_timetable': str,
+            'order_itinerary': str,
+            'itinerary_code': str,
+            'itinerary': str,
+            'special_stop': str,
+            'point_code_stretch_start': str,
+            'point_order_start': str,
+            'point_code_strech_end': str,
+            'point_order_end': str,
+            'distance_start_to_end': float,
+            'stretch_type': str,
+            'stop_code': str,
+            'stop_name': str,
+            'urbs_code': str
+        }
+    )
+
+    stretch = stretch[
+        [
+            'line_number',
+            'line_name_original',
+            'service_category_code',
+            'service_category',
+            'company_code',
+            'company',
+            'stop_code_timetable',
+            'stop_name_timetable',
+            'order_itinerary',
+            'itinerary_code',
+            'itinerary',
+            'special_stop',
+            'point_code_stretch_start',
+            'point_order_start',
+            'point_code_strech_end',
+            'point_order_end',
+            'distance_start_to_end',
+            'stretch_type',
+            'stop_code',
+            'stop_name',
+            'urbs_code'
+        ]
+    ]
+
+    # 2. Return data.
+
+    return stretch
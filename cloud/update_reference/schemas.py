@@ -0,0 +1,226 @@
+from google.cloud import bigquery
+
+# Schema: routes.stops
+
+stops_schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='itinerary_id',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The itinerary ID.'
+    ),
+    bigquery.SchemaField(
+        name='group',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The group of points.'
+    ),
+    bigquery.SchemaField(
+        name='number',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The stop number.'
+    ),
+    bigquery.SchemaField(
+        name='name',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop name.'
+    ),
+    bigquery.SchemaField(
+        name='type',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The stop type.'
+    ),
+    bigquery.SchemaField(
+        name='order',
+        field_type='INT64',
+        mode='REQUIRED',
+        description='The order of the stop within the pair (line_number, itinerary_id).'
+    ),
+    bigquery.SchemaField(
+        name='direction',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop direction.'
+    ),
+    bigquery.SchemaField(
+        name='latitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The stop latitude.'
+    ),
+    bigquery.SchemaField(
+        name='longitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The stop longitude.'
+    )
+]
+
+# Schema: routes.routes
+
+routes_schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='route_id',
+        field_type='INT64',
+        mode='REQUIRED',
+        description='The route ID.'
+    ),
+    bigquery.SchemaField(
+        name='latitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='A latitude in the set of points comprising the route.'
+    ),
+    bigquery.SchemaField(
+        name='longitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='A longitude in the set of points comprising the route.'
+    )
+]
+
+# Schema: routes.stretches
+
+stretches_schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='line_name_original',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The original line name.'
+    ),
+    bigquery.SchemaField(
+        name='service_category_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The service category code.'
+    ),
+    bigquery.SchemaField(
+        name='service_category',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The service category name.'
+    ),
+    bigquery.SchemaField(
+        name='company_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The code of the company operating the line.'
+    ),
+    bigquery.SchemaField(
+        name='company',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The code of the company operating the line.'
+    ),
+    bigquery.SchemaField(
+        name='stop_code_timetable',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop code in the timetable.'
+    ),
+    bigquery.SchemaField(
+        name='stop_name_timetable',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop name in the timetable.'
+    ),
+    bigquery.SchemaField(
+        name='order_itinerary',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The order of the stop in the itinerary.'
+    ),
+    bigquery.SchemaField(
+        name='itinerary_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The itinerary code.'
+    ),
+    bigquery.SchemaField(
+        name='itinerary',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The itinerary name.'
+    ),
+    bigquery.SchemaField(
+        name='special_stop',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='S = yes; N = no.'
+    ),
+    bigquery.SchemaField(
+        name='point_code_stretch_start',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop code at the start of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='point_order_start',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop order at the start of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='point_code_strech_end',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop code at the end of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='point_order_end',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop order at the end of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='distance_start_to_end',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The distance from the start to the end of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='stretch_type',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stretch type.'
+    ),
+    bigquery.SchemaField(
+        name='stop_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The unique stop code.'
+    ),
+    bigquery.SchemaField(
+        name='stop_name',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The unique stop name.'
+    ),
+    bigquery.SchemaField(
+        name='urbs_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The internal stop code.'
+    )
+]
@@ -0,0 +1,248 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from google.cloud import bigquery
+import pandas as pd
+from fetch import fetch_lines, fetch_line_stops, fetch_route, fetch_stretch
+from clients import get_bigquery_client, get_table_id
+from incremental import update_incrementally
+from schemas import stops_schema, routes_schema, stretches_schema
+
+# Preamble.
+
+# Each dataset is fetched per line by its fetcher and written to its table
+# with its schema.
+datasets = {
+    'stops': {
+        'fetch': fetch_line_stops,
+        'table': 'routes.stops',
+        'schema': stops_schema
+    },
+    'routes': {
+        'fetch': fetch_route,
+        'table': 'routes.routes',
+        'schema': routes_schema
+    },
+    'stretches': {
+        'fetch': fetch_stretch,
+        'table': 'routes.stretches',
+        'schema': stretches_schema
+    }
+}
+
+# Function: timed_fetch
+
+
+def timed_fetch(
+        dataset: str,
+        line_number: str
+    ) -> tuple:
+    '''
+    Fetch a dataset for a line and measure how long it takes.
+
+    Args:
+        dataset (str): The dataset, i.e. a key of datasets.
+        line_number (str): The line number.
+
+    Returns:
+        tuple: The fetched data, or None on failure, and the elapsed time
+            in seconds.
+    '''
+
+    start = time.perf_counter()
+
+    try:
+        data = datasets[dataset]['fetch'](line_number)
+
+    except Exception as e:
+        print(f'Fetching {dataset} for line number {line_number} has failed ({e!r}).')
+        data = None
+
+    return data, time.perf_counter() - start
+
+# Function: fetch_reference
+
+
+def fetch_reference(
+        lines: pd.DataFrame,
+        max_workers: int = 16
+    ) -> tuple:
+    '''
+    Fetch the stops, routes and stretches of all lines over a single
+    thread pool, so that requests to the three endpoints interleave
+    rather than run one dataset after the other.
+
+    Args:
+        lines (pd.DataFrame): The lines whose data is fetched.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
+
+    Returns:
+        tuple: A dict mapping each dataset to its data, or None if no line
+            was fetched, and a dict mapping each dataset to the total time,
+            in seconds, spent on its requests.
+    '''
+
+    line_numbers = lines['line_number'].to_list()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            dataset: [
+                executor.submit(timed_fetch, dataset, line_number)
+                for line_number in line_numbers
+            ]
+            for dataset in datasets
+        }
+
+    reference = {}
+    timings = {}
+
+    for dataset, dataset_futures in futures.items():
+        results = [future.result() for future in dataset_futures]
+
+        frames = [data for data, _ in results if data is not None]
+        failures = [
+            line_number
+            for line_number, (data, _) in zip(line_numbers, results)
+            if data is None
+        ]
+
+        if len(failures) > 0:
+            print(f'Fetching {dataset} has failed for {len(failures)} out of {len(line_numbers)} lines: {failures}')
+
+        reference[dataset] = pd.concat(objs=frames) if len(frames) > 0 else None
+        timings[f'fetch_{dataset}'] = sum(elapsed for _, elapsed in results)
+
+    return reference, timings
+
+# Function: write_dataset
+
+
+def write_dataset(
+        dataset: str,
+        data: pd.DataFrame,
+        line_numbers: list,
+        incremental: bool
+    ) -> list:
+    '''
+    Write a dataset to its table, either incrementally or by replacing the
+    whole table.
+
+    Args:
+        dataset (str): The dataset, i.e. a key of datasets.
+        data (pd.DataFrame): The data of all fetched lines.
+        line_numbers (list): All current line numbers.
+        incremental (bool): If True, only the rows of changed lines are
+            rewritten.
+
+    Returns:
+        list: The line numbers whose rows have been rewritten.
+    '''
+
+    client = get_bigquery_client()
+    table_id = get_table_id(table=datasets[dataset]['table'])
+
+    if incremental:
+        return update_incrementally(
+            data=data,
+            line_numbers=line_numbers,
+            table_id=table_id,
+            job_config_options={
+                'autodetect': False,
+                'source_format': bigquery.SourceFormat.CSV
+            }
+        )
+
+    job_config = bigquery.LoadJobConfig(
+        schema=datasets[dataset]['schema'],
+        autodetect=False,
+        source_format=bigquery.SourceFormat.CSV,
+        write_disposition='WRITE_TRUNCATE',
+    )
+
+    job = client.load_table_from_dataframe(
+        dataframe=data,
+        destination=table_id,
+        job_config=job_config
+    )
+    job.result()
+
+    print(f'Loaded {data.shape[0]} rows to {table_id}.')
+
+    return sorted(data['line_number'].unique())
+
+# Function: update_reference
+
+
+def update_reference(
+        incremental: bool = True,
+        max_workers: int = 16
+    ) -> dict:
+    '''
+    Refresh stops, routes and stretches in a single pass.
+
+    Lines are read from lines.lines once. The three datasets are then
+    fetched concurrently for every line and written to their tables. The
+    time spent on each stage is printed.
+
+    Args:
+        incremental (bool): If True, only the rows of lines whose content
+            has changed are rewritten. Defaults to True.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
+
+    Returns:
+        dict: The line numbers rewritten in each dataset.
+    '''
+
+    timings = {}
+
+    # 1. Fetch lines.
+
+    start = time.perf_counter()
+
+    lines = fetch_lines()
+    line_numbers = lines['line_number'].to_list()
+
+    timings['fetch_lines'] = time.perf_counter() - start
+
+    # 2. Fetch stops, routes and stretches.
+
+    start = time.perf_counter()
+
+    reference, fetch_timings = fetch_reference(
+        lines=lines,
+        max_workers=max_workers
+    )
+
+    timings.update(fetch_timings)
+    timings['fetch_wall'] = time.perf_counter() - start
+
+    # 3. Write datasets.
+
+    changed_line_numbers = {}
+
+    for dataset, data in reference.items():
+        if data is None:
+            print(f'No rows have been loaded for {dataset}.')
+            continue
+
+        start = time.perf_counter()
+
+        changed_line_numbers[dataset] = write_dataset(
+            dataset=dataset,
+            data=data,
+            line_numbers=line_numbers,
+            incremental=incremental
+        )
+
+        timings[f'write_{dataset}'] = time.perf_counter() - start
+
+    # 4. Report timings.
+
+    print(
+        'Stage timings (s): {0}'.format(
+            ', '.join(f'{stage}={seconds:.2f}' for stage, seconds in timings.items())
+        )
+    )
+
+    return changed_line_numbers
@@ -0,0 +1,23 @@
+URBS_ARCHIVE_BUCKET=$(gcloud config get-value project)-urbs-archive
+gcloud storage buckets create gs://${URBS_ARCHIVE_BUCKET} --location=southamerica-east1
+gcloud pubsub topics create update_reference
+gcloud functions deploy update_reference \
+    --region=southamerica-east1 \
+    --entry-point=update_reference_entry_point \
+    --gen2 \
+    --runtime=python312 \
+    --timeout=540s \
+    --memory=1G \
+    --trigger-topic=update_reference \
+    --set-env-vars=URBS_ARCHIVE_PATH=/mnt/urbs_archive
+gcloud run services update update-reference \
+    --region=southamerica-east1 \
+    --execution-environment=gen2 \
+    --add-volume=name=urbs-archive,type=cloud-storage,bucket=${URBS_ARCHIVE_BUCKET} \
+    --add-volume-mount=volume=urbs-archive,mount-path=/mnt/urbs_archive
+gcloud scheduler jobs create pubsub update_reference \
+    --location=southamerica-east1 \
+    --schedule="16 3 * * *" \
+    --topic=update_reference \
+    --message-body="Publishing message to update_reference" \
+    --time-zone="America/Sao_Paulo"
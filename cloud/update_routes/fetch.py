@@ -1,13 +1,7 @@
-import requests
-from keys import api_key_bus_data
+import urbs
+from parse import parse_route
 import pandas as pd
-from google.cloud import bigquery
-
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.lines.lines'
+from clients import get_bigquery_client
 
 # Function: fetch_route
 
@@ -25,100 +19,23 @@ def fetch_route(line_number: str) -> pd.DataFrame:
 
     # 1. Perform request.
 
-    url = f'https://transporteservico.urbs.curitiba.pr.gov.br/getShapeLinha.php?linha={line_number}&c={api_key_bus_data}'
-
-    try:
-        r = requests.request(
-            method='GET',
-            url=url,
-            timeout=15
-        )
-
-        if r.status_code == 200:
-            r_json = r.json()
-
-            if len(r_json) > 0:
-                # 2. Format data.
-
-                route = pd.DataFrame()
-
-                order = 0
-
-                for point in r_json:
-                    route = pd.concat(
-                        objs=[
-                            route,
-                            pd.DataFrame(
-                                data=point,
-                                index=[order]
-                            )
-                        ]
-                    )
-
-                    order += 1
-
-                route.reset_index(
-                    drop=False,
-                    inplace=True
-                )
-
-                route.rename(
-                    mapper={
-                        'index': 'order',
-                        'SHP': 'route_id',
-                        'LAT': 'latitude',
-                        'LON': 'longitude',
-                        'COD': 'line_number'
-                    },
-                    axis=1,
-                    inplace=True
-                )
-
-                for column in ['latitude', 'longitude']:
-                    route[column] = route[column].str.replace(',', '.')
-
-                route = route.astype(
-                    dtype={
-                        'route_id': int,
-                        'latitude': float,
-                        'longitude': float,
-                        'line_number': str,
-                        'order': int
-                    }
-                )
-
-                route = route[
-                    [
-                        'line_number',
-                        'route_id',
-                        'order',
-                        'latitude',
-                        'longitude'
-                    ]
-                ]
-
-                # 3. Return data.
-
-                return route
-
-            else:
-                print(f'Route request for line number {line_number} has resulted in an empty list.')
-                return None
-
-    # 4. Handle errors.
-
-    except requests.Timeout:
-        print('Route request has timed out.')
-        return None
+    result = urbs.get(
+        endpoint='getShapeLinha',
+        line_number=line_number
+    )
 
-    except requests.JSONDecodeError:
-        print('JSON decode error.')
-        return None
+    # 2. Handle errors.
 
-    except requests.ConnectionError:
-        print('Connection error.')
+    if not result.ok:
+        print(f'Route request for line number {line_number} has failed ({result.error}).')
         return None
 
+    # 3. Format and return data.
+
+    route = parse_route(r_json=result.data)
+
+    return route
+
 # Function: fetch_lines
 
 
@@ -130,6 +47,8 @@ def fetch_lines() -> pd.DataFrame:
         pd.DataFrame: Data on bus lines.
     '''
 
+    client = get_bigquery_client()
+
     QUERY = f'''
     SELECT *
     FROM `{client.project}.lines.lines`
@@ -144,24 +63,39 @@ def fetch_lines() -> pd.DataFrame:
 # Function: fetch_routes
 
 
-def fetch_routes() -> pd.DataFrame:
+def fetch_routes(
+        lines: pd.DataFrame = None,
+        max_workers: int = 16
+    ) -> pd.DataFrame:
     '''
-    Fetch all routes.
+    Fetch all routes, requesting several lines
+    concurrently.
+
+    Args:
+        lines (pd.DataFrame): The lines whose data is fetched. Defaults to
+            None, in which case all lines in lines.lines are fetched.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
 
     Returns:
         pd.DataFrame: All bus routes.
     '''
 
-    lines = fetch_lines()
+    if lines is None:
+        lines = fetch_lines()
 
-    routes = pd.DataFrame()
+    routes, failures = urbs.map_lines(
+        function=fetch_route,
+        line_numbers=lines['line_number'].to_list(),
+        max_workers=max_workers
+    )
+
+    if len(failures) > 0:
+        print(f'Route requests have failed for {len(failures)} out of {lines.shape[0]} lines: {failures}')
+
+    if len(routes) == 0:
+        return None
 
-    for index, row in lines.iterrows():
-        routes = pd.concat(
-            objs=[
-                routes,
-                fetch_route(line_number=row['line_number'])
-            ]
-        )
+    routes = pd.concat(objs=routes)
 
     return routes
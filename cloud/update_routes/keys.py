@@ -1,10 +1,25 @@
 from google.cloud import secretmanager
+from clients import lazy
 
-# Create the Secret Manager client.
+# Function: get_api_key_bus_data
 
-client = secretmanager.SecretManagerServiceClient()
 
-# Get the API key for bus data.
+@lazy
+def get_api_key_bus_data() -> str:
+    '''
+    Return the API key for bus data, fetched from Secret Manager on first
+    use.
 
-response_api_key_bus_data = client.get_secret(request={"name": "projects/441247924338/secrets/api_keys"})
-api_key_bus_data = response_api_key_bus_data.labels['api_curitiba_156']
+    Returns:
+        str: The API key.
+    '''
+
+    # Create the Secret Manager client.
+
+    client = secretmanager.SecretManagerServiceClient()
+
+    # Get the API key for bus data.
+
+    response_api_key_bus_data = client.get_secret(request={"name": "projects/441247924338/secrets/api_keys"})
+
+    return response_api_key_bus_data.labels['api_curitiba_156']
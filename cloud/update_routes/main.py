@@ -1,6 +1,10 @@
 from update import update_routes
+from archive import flush_archive
 import functions_framework
 
 @functions_framework.cloud_event
 def update_routes_entry_point(cloud_event):
-    update_routes()
+    try:
+        update_routes(incremental=True)
+    finally:
+        flush_archive()
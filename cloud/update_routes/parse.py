@@ -0,0 +1,65 @@
+import pandas as pd
+
+# Function: parse_route
+
+
+def parse_route(r_json: list) -> pd.DataFrame:
+    '''
+    Parse a getShapeLinha payload into the points defining a route.
+
+    Args:
+        r_json (list): The decoded getShapeLinha payload.
+
+    Returns:
+        pd.DataFrame: The points defining the route.
+    '''
+
+    # 1. Format data.
+
+    # Points are collected into a single frame in one pass, and the order
+    # of each point is its position in the payload.
+    route = pd.DataFrame.from_records(data=r_json)
+
+    route.reset_index(
+        drop=False,
+        inplace=True
+    )
+
+    route.rename(
+        mapper={
+            'index': 'order',
+            'SHP': 'route_id',
+            'LAT': 'latitude',
+            'LON': 'longitude',
+            'COD': 'line_number'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    for column in ['latitude', 'longitude']:
+        route[column] = route[column].str.replace(',', '.')
+
+    route = route.astype(
+        dtype={
+            'route_id': int,
+            'latitude': float,
+            'longitude': float,
+            'line_number': str,
+            'order': int
+        }
+    )
+
+    route = route[
+        [
+            'line_number',
+            'route_id',
+            'order',
+            'latitude',
+            'longitude'
+        ]
+    ]
+
+    # 2. Return data.
+
+    return route
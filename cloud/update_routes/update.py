@@ -1,53 +1,71 @@
 from google.cloud import bigquery
 import pandas as pd
-from fetch import fetch_routes
+from fetch import fetch_lines, fetch_routes
+from clients import get_bigquery_client, get_table_id
+from incremental import update_incrementally
 
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.routes.routes'
+schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='route_id',
+        field_type='INT64',
+        mode='REQUIRED',
+        description='The route ID.'
+    ),
+    bigquery.SchemaField(
+        name='latitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='A latitude in the set of points comprising the route.'
+    ),
+    bigquery.SchemaField(
+        name='longitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='A longitude in the set of points comprising the route.'
+    )
+]
 
 # Function: update_routes
 
-def update_routes():
+def update_routes(incremental: bool = False) -> list:
     """
     Update table containing bus routes.
+
+    If incremental is True, only the rows of lines whose content has
+    changed are rewritten, and the changed line numbers are returned.
     """
+    client = get_bigquery_client()
+    table_id = get_table_id(table='routes.routes')
+
     # Fetch routes.
 
-    routes = fetch_routes()
+    lines = fetch_lines()
+    routes = fetch_routes(lines=lines)
+
+    if routes is not None and incremental:
+        # Replace the rows of changed lines only.
+
+        return update_incrementally(
+            data=routes,
+            line_numbers=lines['line_number'].to_list(),
+            table_id=table_id,
+            job_config_options={
+                'autodetect': False,
+                'source_format': bigquery.SourceFormat.CSV
+            }
+        )
 
     if routes is not None:
         # Set configuration options for load job.
 
         job_config = bigquery.LoadJobConfig(
-            schema = [
-                bigquery.SchemaField(
-                    name='line_number',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The line number.'
-                ),
-                bigquery.SchemaField(
-                    name='route_id',
-                    field_type='INT64',
-                    mode='REQUIRED',
-                    description='The route ID.'
-                ),
-                bigquery.SchemaField(
-                    name='latitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='A latitude in the set of points comprising the route.'
-                ),
-                bigquery.SchemaField(
-                    name='longitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='A longitude in the set of points comprising the route.'
-                )
-            ],
+            schema=schema,
             autodetect=False,
             source_format=bigquery.SourceFormat.CSV,
             write_disposition='WRITE_TRUNCATE',
@@ -0,0 +1,248 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import requests
+from requests.adapters import HTTPAdapter
+from archive import archive_response
+from keys import get_api_key_bus_data
+
+# Preamble.
+
+base_url = 'https://transporteservico.urbs.curitiba.pr.gov.br'
+
+retry_status_codes = {429, 500, 502, 503, 504}
+
+# Class: TokenBucket
+
+
+class TokenBucket:
+    '''
+    A thread-safe token bucket limiting the rate of requests.
+
+    Args:
+        rate (float): The number of tokens added per second.
+        capacity (float): The maximum number of tokens, i.e. the largest
+            burst of requests.
+    '''
+
+    def __init__(
+            self,
+            rate: float,
+            capacity: float
+        ):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Take one token, blocking until one is available.
+        '''
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+# Class: Result
+
+
+@dataclass
+class Result:
+    '''
+    The structured result of a request to the URBS API.
+
+    error is None on success, and otherwise one of 'timeout',
+    'connection', 'status', 'json' or 'empty'.
+    '''
+
+    endpoint: str
+    line_number: str = None
+    status_code: int = None
+    date: str = None
+    content: bytes = None
+    data: object = None
+    error: str = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+# Preamble: shared session and rate limit.
+
+session = requests.Session()
+session.mount(
+    prefix=base_url,
+    adapter=HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=int(os.environ.get('URBS_POOL_SIZE', 32))
+    )
+)
+
+bucket = TokenBucket(
+    rate=float(os.environ.get('URBS_RATE_LIMIT', 20)),
+    capacity=float(os.environ.get('URBS_BURST', 20))
+)
+
+# Function: get
+
+
+def get(
+        endpoint: str,
+        line_number: str = None,
+        timeout: float = 15,
+        retries: int = 3,
+        backoff: float = 0.5
+    ) -> Result:
+    '''
+    Request an URBS endpoint over the shared keep-alive session.
+
+    Requests are rate limited by a process-wide token bucket. Timeouts,
+    connection errors and retryable status codes are retried up to
+    retries times with exponential backoff and full jitter. Every response
+    received is archived.
+
+    Args:
+        endpoint (str): The endpoint, e.g. 'getVeiculos'.
+        line_number (str): The line number, passed as the linha parameter.
+            Defaults to None.
+        timeout (float): The timeout, in seconds, of each attempt.
+            Defaults to 15.
+        retries (int): The number of retries. Defaults to 3.
+        backoff (float): The base backoff, in seconds. Defaults to 0.5.
+
+    Returns:
+        Result: The structured result of the request.
+    '''
+
+    url = '{0}/{1}.php'.format(base_url, endpoint)
+
+    params = {}
+
+    if line_number is not None:
+        params['linha'] = line_number
+
+    params['c'] = get_api_key_bus_data()
+
+    result = Result(
+        endpoint=endpoint,
+        line_number=line_number
+    )
+
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+        bucket.acquire()
+
+        result.attempts = attempt + 1
+
+        try:
+            r = session.get(url, params=params, timeout=timeout)
+
+        except requests.Timeout:
+            result.error = 'timeout'
+            continue
+
+        except requests.ConnectionError:
+            result.error = 'connection'
+            continue
+
+        archive_response(
+            endpoint=endpoint,
+            line_number=line_number,
+            r=r
+        )
+
+        result.status_code = r.status_code
+        result.date = r.headers.get('Date')
+        result.content = r.content
+
+        if r.status_code != 200:
+            result.error = 'status'
+
+            if r.status_code in retry_status_codes:
+                continue
+
+            return result
+
+        try:
+            result.data = r.json()
+
+        except requests.JSONDecodeError:
+            result.error = 'json'
+            return result
+
+        if len(result.data) == 0:
+            result.error = 'empty'
+        else:
+            result.error = None
+
+        return result
+
+    return result
+
+# Function: map_lines
+
+
+def map_lines(
+        function,
+        line_numbers: list,
+        max_workers: int = 16
+    ) -> tuple:
+    '''
+    Apply a per-line fetch function to several lines over a bounded
+    thread pool. Requests still go through the shared session and token
+    bucket, so the rate towards the API stays bounded.
+
+    Args:
+        function: A function taking a line number and returning a
+            DataFrame, or None on failure.
+        line_numbers (list): The line numbers.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
+
+    Returns:
+        tuple: The results of the successful lines, in the order of
+            line_numbers, and a dict mapping each failed line number to
+            the reason of its failure.
+    '''
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(function, line_number)
+            for line_number in line_numbers
+        ]
+
+    results = []
+    failures = {}
+
+    for line_number, future in zip(line_numbers, futures):
+        try:
+            result = future.result()
+
+        except Exception as e:
+            failures[line_number] = repr(e)
+            continue
+
+        if result is None:
+            failures[line_number] = 'no data'
+        else:
+            results.append(result)
+
+    return results, failures
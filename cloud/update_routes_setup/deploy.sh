@@ -1,3 +1,5 @@
+URBS_ARCHIVE_BUCKET=$(gcloud config get-value project)-urbs-archive
+gcloud storage buckets create gs://${URBS_ARCHIVE_BUCKET} --location=southamerica-east1
 gcloud pubsub topics create update_routes
 gcloud functions deploy update_routes \
     --region=southamerica-east1 \
@@ -6,7 +8,13 @@ gcloud functions deploy update_routes \
     --runtime=python312 \
     --timeout=540s \
     --memory=512M \
-    --trigger-topic=update_routes
+    --trigger-topic=update_routes \
+    --set-env-vars=URBS_ARCHIVE_PATH=/mnt/urbs_archive
+gcloud run services update update-routes \
+    --region=southamerica-east1 \
+    --execution-environment=gen2 \
+    --add-volume=name=urbs-archive,type=cloud-storage,bucket=${URBS_ARCHIVE_BUCKET} \
+    --add-volume-mount=volume=urbs-archive,mount-path=/mnt/urbs_archive
 gcloud scheduler jobs create pubsub update_routes \
     --location=southamerica-east1 \
     --schedule="6 3 * * *" \
@@ -1,3 +1,4 @@
+URBS_ARCHIVE_BUCKET=$(gcloud config get-value project)-urbs-archive
 gcloud functions deploy update_routes \
     --region=southamerica-east1 \
     --entry-point=update_routes_entry_point \
@@ -5,4 +6,10 @@ gcloud functions deploy update_routes \
     --runtime=python312 \
     --timeout=540s \
     --memory=512M \
-    --trigger-topic=update_routes
+    --trigger-topic=update_routes \
+    --set-env-vars=URBS_ARCHIVE_PATH=/mnt/urbs_archive
+gcloud run services update update-routes \
+    --region=southamerica-east1 \
+    --execution-environment=gen2 \
+    --add-volume=name=urbs-archive,type=cloud-storage,bucket=${URBS_ARCHIVE_BUCKET} \
+    --add-volume-mount=volume=urbs-archive,mount-path=/mnt/urbs_archive
@@ -1,73 +1,183 @@
-from haversine import haversine, Unit
 import numpy as np
+from geometry import get_origin, project, calculate_bearings, calculate_distances_to_segments, calculate_offsets_along_segments
+from index import SegmentIndex
 
-# Function: calculate_distance_between_line_segment_and_point
+# Function: calculate_closest_segments
 
 
-def calculate_distance_between_line_segment_and_point(
-        A: tuple,
-        B: tuple,
-        S: tuple
-    ) -> float:
+def calculate_closest_segments(
+        A: np.ndarray,
+        B: np.ndarray,
+        P: np.ndarray,
+        chunk_size: int = 1000000
+    ) -> tuple:
     '''
-    Given a line segment l between points A and B, and a point S,
-    calculate the distance, in meters, between l and S.
+    Find the closest segment to each point by computing the distances
+    between all points and all segments, as a matrix over chunks of
+    points, so that no chunk holds more than about chunk_size distances.
+    Ties are resolved in favour of the first segment.
 
     Parameters
     ----------
-    A : tuple
-        (latitude, longitude) for point A.
-    B : tuple
-        (latitude, longitude) for point B.
-    S : tuple
-        (latitude, longitude) for point S.
+    A : np.ndarray
+        Array of shape (n, 2) holding the projected segment starts.
+    B : np.ndarray
+        Array of shape (n, 2) holding the projected segment ends.
+    P : np.ndarray
+        Array of shape (m, 2) holding the projected points.
+    chunk_size : int, optional
+        The maximum number of distances computed at a time, by default
+        1000000.
 
     Returns
     -------
-    float
-        The distance, in meters, between line l and point S.
+    tuple
+        The index of the closest segment to each point, the distance, in
+        meters, to it, and the clamped segment parameter of the closest
+        point.
     '''
 
-    # Convert points to vectors represented by numpy.ndarray
-    A = np.array(object=A)
-    B = np.array(object=B)
-    S = np.array(object=S)
+    step = max(chunk_size // max(A.shape[0], 1), 1)
 
-    # Calculate slope and intercept of line l passing through A and B
-    slope = (B[1] - A[1]) / (B[0] - A[0])
-    intercept = B[1] - slope * B[0]
+    indices = np.empty(shape=P.shape[0], dtype=int)
+    distances = np.empty(shape=P.shape[0], dtype=float)
+    t = np.empty(shape=P.shape[0], dtype=float)
 
-    # Calculate slope and intercept of line l' passing through S and
-    # perpendicular to l
-    slope_prime = -1 / slope
-    intercept_prime = S[1] - slope_prime * S[0]
+    for start in range(0, P.shape[0], step):
+        chunk = slice(start, start + step)
 
-    # Find intersection of l and l'
-    intersection = (
-        (intercept - intercept_prime) / (slope_prime - slope),
-        slope * (intercept - intercept_prime) / (slope_prime - slope) + intercept
+        chunk_distances, chunk_t = calculate_distances_to_segments(
+            A=A[np.newaxis, :, :],
+            B=B[np.newaxis, :, :],
+            P=P[chunk, np.newaxis, :]
+        )
+
+        rows = np.arange(chunk_distances.shape[0])
+        columns = np.argmin(chunk_distances, axis=1)
+
+        indices[chunk] = columns
+        distances[chunk] = chunk_distances[rows, columns]
+        t[chunk] = chunk_t[rows, columns]
+
+    return indices, distances, t
+
+# Function: snap_points_to_line_segments
+
+
+def snap_points_to_line_segments(
+        vertices: np.ndarray,
+        points: np.ndarray,
+        radius: float = 250,
+        cell_size: float = 100,
+        chunk_size: int = 1000000
+    ) -> tuple:
+    '''
+    Find the closest line segment of a polyline to each point.
+
+    Coordinates are projected onto a local metric plane, and segments are
+    indexed on a uniform grid, so that each point is only compared with
+    the segments within radius of it. Points farther than radius from
+    every segment are compared with all segments. Either way, the result
+    is the exact closest segment, with ties resolved in favour of the
+    first segment.
+
+    Parameters
+    ----------
+    vertices : np.ndarray
+        Array of shape (m, 2) holding the (latitude, longitude) pairs of
+        the polyline, which has m - 1 segments.
+    points : np.ndarray
+        Array of shape (n, 2) holding (latitude, longitude) pairs.
+    radius : float, optional
+        The search radius, in meters, by default 250.
+    cell_size : float, optional
+        The side, in meters, of each grid cell, by default 100.
+    chunk_size : int, optional
+        The maximum number of distances computed at a time for points
+        with no segment within radius, by default 1000000.
+
+    Returns
+    -------
+    tuple
+        The index of the closest segment to each point, where segment i
+        goes from vertex i to vertex i + 1, the distance, in meters, to
+        it, and the offset, in meters, of the closest point along it.
+    '''
+
+    vertices = np.asarray(vertices, dtype=float)
+    points = np.asarray(points, dtype=float)
+
+    # Project vertices and points onto the same plane
+    origin = get_origin(coordinates=vertices)
+
+    V = project(coordinates=vertices, origin=origin)
+    P = project(coordinates=points, origin=origin)
+
+    A = V[:-1]
+    B = V[1:]
+
+    # Snap points through the index
+    index = SegmentIndex(
+        A=A,
+        B=B,
+        cell_size=cell_size
     )
-    T = np.array(object=intersection)
-
-    # Determine if point S is enclosed by two lines perpendicular to the
-    # line segment l
-    v1 = (T - A) / np.linalg.norm(T - A)
-    v2 = (T - B)  / np.linalg.norm(T - B)
-
-    enclosed = np.allclose(v1 + v2, np.zeros(shape=(2,)), rtol=1e-6, atol=1e-6)
-    non_enclosed = np.allclose(v1, v2, rtol=1e-6, atol=1e-6)
-
-    # Calculate distance between S and l
-    if enclosed:
-        distance = haversine(S, intersection, Unit.METERS)
-    elif non_enclosed:
-        distance = np.min(
-            [
-                np.linalg.norm(S - A),
-                np.linalg.norm(S - B)
-            ]
+
+    indices, distances, t = index.snap(
+        P=P,
+        radius=radius
+    )
+
+    # Snap remaining points exhaustively
+    missing = indices < 0
+
+    if missing.any():
+        indices[missing], distances[missing], t[missing] = calculate_closest_segments(
+            A=A,
+            B=B,
+            P=P[missing],
+            chunk_size=chunk_size
         )
-        distance = float(distance)
 
-    # Return distance
-    return distance
+    offsets = calculate_offsets_along_segments(
+        A=A[indices],
+        B=B[indices],
+        t=t
+    )
+
+    return indices, distances, offsets
+
+# Function: calculate_polyline_attributes
+
+
+def calculate_polyline_attributes(vertices: np.ndarray) -> tuple:
+    '''
+    Calculate the chainage of each vertex of a polyline, i.e. the
+    distance along it from its first vertex, and the length and bearing
+    of each of its segments.
+
+    Parameters
+    ----------
+    vertices : np.ndarray
+        Array of shape (m, 2) holding the (latitude, longitude) pairs of
+        the polyline, which has m - 1 segments.
+
+    Returns
+    -------
+    tuple
+        The chainages, in meters, of the m vertices, and the lengths, in
+        meters, and bearings, in degrees clockwise from north, of the
+        m - 1 segments, where segment i goes from vertex i to vertex
+        i + 1.
+    '''
+
+    vertices = np.asarray(vertices, dtype=float)
+
+    V = project(coordinates=vertices, origin=get_origin(coordinates=vertices))
+
+    lengths = np.linalg.norm(V[1:] - V[:-1], axis=1)
+    bearings = calculate_bearings(A=V[:-1], B=V[1:])
+
+    chainages = np.concatenate([[0.0], np.cumsum(lengths)])
+
+    return chainages, lengths, bearings
@@ -1,8 +1,7 @@
 from google.cloud import bigquery
+import numpy as np
 import pandas as pd
-
-# Preamble.
-client = bigquery.Client()
+from clients import get_bigquery_client
 
 # Function: fetch_lines_from_bq
 
@@ -22,149 +21,144 @@ def fetch_lines_from_bq() -> pd.DataFrame:
     FROM lines.lines
     '''
 
-    lines = client.query_and_wait(query=query).to_dataframe()
+    lines = get_bigquery_client().query_and_wait(query=query).to_dataframe()
 
     return lines
 
 # Function: fetch_routes_from_bq
 
 
-def fetch_line_routes_from_bq(
-        line_number: str,
-        sort=True
-    ) -> pd.DataFrame:
+def fetch_routes_from_bq(line_numbers: list) -> pd.DataFrame:
     '''
-    Fetch routes for a specified line number from Bigquery.
+    Fetch the routes of several line numbers from BigQuery in a single
+    query.
 
     Parameters
     ----------
-    line_number : str
-        The line number whose routes are to be fetched.
-    sort : bool, optional
-        If True, the results are sorted by route ID and then by order,
-        by default True.
+    line_numbers : list
+        The line numbers whose routes are to be fetched.
 
     Returns
     -------
     pd.DataFrame
-        The routes for a specified line number fetched from BigQuery.
+        The routes, sorted by line number, route ID and order.
     '''
 
-    query = f'''
+    query = '''
     SELECT *
     FROM routes.routes
-    WHERE line_number = \'{line_number}\'
+    WHERE line_number IN UNNEST(@line_numbers)
     '''
 
-    routes = client.query_and_wait(query=query).to_dataframe()
-
-    if sort:
-        routes.sort_values(
-            by=[
-                'route_id',
-                'order'
-            ],
-            inplace=True,
-            ignore_index=True
-        )
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter(
+                name='line_numbers',
+                array_type='STRING',
+                values=line_numbers
+            )
+        ]
+    )
+
+    routes = get_bigquery_client().query_and_wait(
+        query=query,
+        job_config=job_config
+    ).to_dataframe()
+
+    routes.sort_values(
+        by=[
+            'line_number',
+            'route_id',
+            'order'
+        ],
+        inplace=True,
+        ignore_index=True
+    )
 
     return routes
 
-# Function: fetch_line_stops_from_bq
+# Function: fetch_stops_from_bq
 
 
-def fetch_line_stops_from_bq(
-        line_number: str,
-        sort=True
-    ) -> pd.DataFrame:
+def fetch_stops_from_bq(line_numbers: list) -> pd.DataFrame:
     '''
-    Fetch stops for a specified line number from Bigquery.
+    Fetch the stops of several line numbers from BigQuery in a single
+    query.
 
     Parameters
     ----------
-    line_number : str
-        The line number whose stops are to be fetched.
-    sort : bool, optional
-        If True, the results are sorted by itinerary ID and then by
-        order, by default True.
+    line_numbers : list
+        The line numbers whose stops are to be fetched.
 
     Returns
     -------
     pd.DataFrame
-        The stops for a specified line number fetched from BigQuery.
+        The stops, sorted by line number, itinerary ID and order.
     '''
 
-    query = f'''
+    query = '''
     SELECT *
     FROM routes.stops
-    WHERE line_number = \'{line_number}\'
+    WHERE line_number IN UNNEST(@line_numbers)
     '''
 
-    stops = client.query_and_wait(query=query).to_dataframe()
-
-    if sort:
-        stops.sort_values(
-            by=[
-                'itinerary_id',
-                'order'
-            ],
-            inplace=True,
-            ignore_index=True
-        )
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter(
+                name='line_numbers',
+                array_type='STRING',
+                values=line_numbers
+            )
+        ]
+    )
+
+    stops = get_bigquery_client().query_and_wait(
+        query=query,
+        job_config=job_config
+    ).to_dataframe()
+
+    stops.sort_values(
+        by=[
+            'line_number',
+            'itinerary_id',
+            'order'
+        ],
+        inplace=True,
+        ignore_index=True
+    )
 
     return stops
 
-# Function: fetch_extremities
+# Function: split_by_line
 
 
-def fetch_extremities(
-        table: pd.DataFrame,
-        id: int) -> dict:
-    """
-    Get extremities relative to (line_number, route_id) or
-    (line_number, itinerary_id).
+def split_by_line(table: pd.DataFrame) -> dict:
+    '''
+    Split a table sorted by line number into one view per line number.
+
+    Each view is a positional slice of the table, so no rows are copied.
 
     Parameters
     ----------
     table : pd.DataFrame
-        The routes or stops associated with a specific line number.
-    id : int
-        The route or itinerary ID under consideration.
+        Routes or stops sorted by line number, e.g. the output of
+        fetch_routes_from_bq or fetch_stops_from_bq.
 
     Returns
     -------
     dict
-        The start and end relative to the pair (line_number, route_id)
-        or (line_number, itinerary_id).
-    """
-
-    # Keep only route ID under consideration
-    if 'route_id' in table.columns:
-        table = table.loc[table['route_id'] == id]
-    elif 'itinerary_id' in table.columns:
-        id = str(id)
-        table = table.loc[table['itinerary_id'] == id]
-
-    # Get start
-    start = table.loc[
-        table['order'] == table['order'].min(),
-        ['latitude', 'longitude']
-    ]
-    start = start.squeeze()
-    start = tuple(start)
-
-    # Get end
-    end = table.loc[
-        table['order'] == table['order'].max(),
-        ['latitude', 'longitude']
-    ]
-    end = end.squeeze()
-    end = tuple(end)
-
-    # Prepare and return results
-    extremities = {
-        'start': start,
-        'end': end
+        The mapping from each line number into its rows.
+    '''
+
+    line_numbers, starts = np.unique(
+        table['line_number'].to_numpy(),
+        return_index=True
+    )
+    ends = np.append(starts[1:], table.shape[0])
+
+    views = {
+        line_number: table.iloc[start:end]
+        for line_number, start, end in zip(line_numbers, starts, ends)
     }
 
-    return extremities
+    return views
@@ -1,5 +1,5 @@
-from map import map_route_id_to_itinerary_id
-from calculate import calculate_distance_between_line_segment_and_point
+from calculate import calculate_polyline_attributes, snap_points_to_line_segments
+from geometry import calculate_haversine_distances
 import pandas as pd
 import numpy as np
 
@@ -11,7 +11,7 @@ def generate_route_unified_route_id(
         route_id: int,
         line_routes: pd.DataFrame,
         line_stops: pd.DataFrame,
-        tolerance=200
+        itinerary_id: str
     ) -> pd.DataFrame:
     """
     Generate unified route in the context of a specified route ID.
@@ -23,17 +23,22 @@ def generate_route_unified_route_id(
     route_id : int
         The route ID providing the context of the unified route.
     line_routes : pd.DataFrame
-        The routes DataFrame output by fetch_line_routes_from_bq.
+        The routes of the line, e.g. its view of the output of
+        fetch_routes_from_bq split by split_by_line.
     line_stops : pd.DataFrame
-        The stops DataFrame output by fetch_line_stops_from_bq.
-    tolerance : float, optional
-        The tolerance, in meters, for defining two points as
-        sufficiently close to one another, by default 200.
+        The stops of the line, e.g. its view of the output of
+        fetch_stops_from_bq split by split_by_line.
+    itinerary_id : str
+        The itinerary ID matched with the route ID, e.g. by
+        match_routes_to_itineraries.
 
     Returns
     -------
     pd.DataFrame
-        A unified route in the context of a specified route ID.
+        A unified route in the context of a specified route ID, with the
+        chainage, in meters, of each point from the first stop and the
+        bearing, in degrees clockwise from north, of the route segment
+        the point lies on.
     """
 
     # Extract context for the route
@@ -41,13 +46,6 @@ def generate_route_unified_route_id(
     line_route.reset_index(drop=True, inplace=True)
 
     # Extract context for the stops
-    itinerary_id = map_route_id_to_itinerary_id(
-        line_routes=line_route,
-        line_stops=line_stops,
-        route_id=route_id,
-        tolerance=tolerance
-    )
-
     line_stops = line_stops.loc[line_stops['itinerary_id'] == itinerary_id]
 
     line_stops.reset_index(drop=True, inplace=True)
@@ -64,55 +62,40 @@ def generate_route_unified_route_id(
         ]
     ]
 
-    # Find closest route point to each stop
-    stops_and_minimum_distances = pd.DataFrame()
-
-    for index, row in line_stops.iterrows():
-        routes_and_distances = pd.DataFrame()
-        for jndex, sow in line_route.iterrows():
-            if jndex > 0:
-                distance = calculate_distance_between_line_segment_and_point(
-                    A=(line_route.loc[jndex - 1, 'latitude'], line_route.loc[jndex - 1, 'longitude']),
-                    B=(line_route.loc[jndex, 'latitude'], line_route.loc[jndex, 'longitude']),
-                    S=(row['latitude'], row['longitude'])
-                )
-                distance_row = pd.DataFrame(
-                    data={
-                        'line_number': [line_number],
-                        'route_id': [route_id],
-                        'order': [line_route.loc[jndex - 1, 'order']],
-                        'latitude': [row['latitude']],
-                        'longitude': [row['longitude']],
-                        'point_type': [row['type']],
-                        'stop_number': [row['number']],
-                        'stop_name': [row['name']],
-                        'direction': [row['direction']],
-                        'distance': [distance],
-                    }
-                )
-                routes_and_distances = pd.concat(
-                    objs=[
-                        routes_and_distances,
-                        distance_row
-                    ]
-                )
-
-        routes_and_distances = routes_and_distances.loc[
-            routes_and_distances['distance'] == routes_and_distances['distance'].min()
-        ]
+    vertices = line_route[['latitude', 'longitude']].to_numpy(dtype=float)
 
-        stops_and_minimum_distances = pd.concat(
-            objs=[
-                stops_and_minimum_distances,
-                routes_and_distances
-            ],
-            ignore_index=True
-        )
+    # Find closest route segment to each stop, and take the order of the
+    # point starting it
+    segment_indices, _, offsets = snap_points_to_line_segments(
+        vertices=vertices,
+        points=line_stops[['latitude', 'longitude']].to_numpy(dtype=float)
+    )
 
-    stops_and_minimum_distances.drop(
-        labels='distance',
-        axis=1,
-        inplace=True
+    # Measure the route, placing each stop at the chainage of its closest
+    # point on the route and giving it the bearing of its segment. The
+    # last route point takes the bearing of the last segment.
+    chainages, _, bearings = calculate_polyline_attributes(vertices=vertices)
+    bearings = np.append(bearings, bearings[-1:])
+
+    line_route = line_route.assign(
+        chainage=chainages,
+        bearing=bearings
+    )
+
+    stops_and_minimum_distances = pd.DataFrame(
+        data={
+            'line_number': line_number,
+            'route_id': route_id,
+            'order': line_route['order'].to_numpy()[segment_indices],
+            'latitude': line_stops['latitude'].to_numpy(),
+            'longitude': line_stops['longitude'].to_numpy(),
+            'point_type': line_stops['type'].to_numpy(),
+            'stop_number': line_stops['number'].to_numpy(),
+            'stop_name': line_stops['name'].to_numpy(),
+            'direction': line_stops['direction'].to_numpy(),
+            'chainage': chainages[segment_indices] + offsets,
+            'bearing': bearings[segment_indices]
+        }
     )
 
     # Combine route and stops
@@ -129,6 +112,7 @@ def generate_route_unified_route_id(
     unified_route_route_id.sort_values(
         by=[
             'order',
+            'chainage',
             'stop_number'
         ],
         inplace=True,
@@ -163,6 +147,9 @@ def generate_route_unified_route_id(
 
     unified_route_route_id['order'] = unified_route_route_id.index
 
+    # Measure chainage from the first stop
+    unified_route_route_id['chainage'] -= unified_route_route_id['chainage'].iloc[0]
+
     # Return results
     return unified_route_route_id
 
@@ -172,7 +159,8 @@ def generate_route_unified_route_id(
 def generate_route_unified(
         line_number: str,
         line_routes: pd.DataFrame,
-        line_stops: pd.DataFrame
+        line_stops: pd.DataFrame,
+        itinerary_ids: dict
     ) -> pd.DataFrame:
     """
     Generate unified route.
@@ -182,19 +170,32 @@ def generate_route_unified(
     line_number : str
         The line number whose unified route is to be generated.
     line_routes : pd.DataFrame
-        The routes DataFrame output by fetch_line_routes_from_bq.
+        The routes of the line, e.g. its view of the output of
+        fetch_routes_from_bq split by split_by_line.
     line_stops : pd.DataFrame
-        The stops DataFrame output by fetch_line_stops_from_bq.
+        The stops of the line, e.g. its view of the output of
+        fetch_stops_from_bq split by split_by_line.
+    itinerary_ids : dict
+        The mapping from route IDs into their matched itinerary IDs.
+        Route IDs that are not mapped are skipped.
 
     Returns
     -------
     pd.DataFrame
-        A unified route.
+        A unified route. Its chainage runs continuously over the routes
+        of all route IDs, in order, with consecutive routes joined by the
+        straight line from the end of one to the start of the next, and
+        segment_length holds the distance along the route from each point
+        to the next, NaN for the last point.
     """
 
-    # Loop over all route IDs and generate unified routes in the
+    # Loop over all matched route IDs and generate unified routes in the
     # context of each route ID
-    route_ids = line_routes['route_id'].drop_duplicates().to_list()
+    route_ids = [
+        route_id
+        for route_id in line_routes['route_id'].drop_duplicates()
+        if itinerary_ids.get(route_id) is not None
+    ]
 
     unified_route = pd.DataFrame()
 
@@ -203,9 +204,20 @@ def generate_route_unified(
             line_number=line_number,
             route_id=route_id,
             line_routes=line_routes,
-            line_stops=line_stops
+            line_stops=line_stops,
+            itinerary_id=itinerary_ids[route_id]
         )
 
+        # Continue chainage from the end of the previous route
+        if unified_route.shape[0] > 0:
+            last = unified_route.iloc[-1]
+            first = unified_route_route_id.iloc[0]
+
+            unified_route_route_id['chainage'] += last['chainage'] + calculate_haversine_distances(
+                P=last[['latitude', 'longitude']].to_numpy(dtype=float),
+                Q=first[['latitude', 'longitude']].to_numpy(dtype=float)
+            )
+
         unified_route = pd.concat(
             objs=[
                 unified_route,
@@ -214,6 +226,9 @@ def generate_route_unified(
             ignore_index=True
         )
 
+    if unified_route.shape[0] == 0:
+        return unified_route
+
     unified_route.drop(
         labels='route_id',
         axis=1,
@@ -223,5 +238,8 @@ def generate_route_unified(
     # Set order
     unified_route['order'] = unified_route.index
 
+    # Set segment lengths
+    unified_route['segment_length'] = unified_route['chainage'].shift(periods=-1) - unified_route['chainage']
+
     # Return results
     return unified_route
@@ -0,0 +1,236 @@
+import numpy as np
+
+# Preamble.
+
+# Mean Earth radius, in meters.
+earth_radius = 6371008.8
+
+# Function: get_origin
+
+
+def get_origin(coordinates: np.ndarray) -> np.ndarray:
+    '''
+    Get the origin of a local projection suited to a set of coordinates,
+    namely their mean latitude and longitude.
+
+    Parameters
+    ----------
+    coordinates : np.ndarray
+        Array of shape (..., 2) holding (latitude, longitude) pairs.
+
+    Returns
+    -------
+    np.ndarray
+        The (latitude, longitude) of the origin.
+    '''
+
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+
+    return coordinates.mean(axis=0)
+
+# Function: calculate_haversine_distances
+
+
+def calculate_haversine_distances(
+        P: np.ndarray,
+        Q: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Calculate the great-circle distances between points P and Q,
+    elementwise and with broadcasting.
+
+    Parameters
+    ----------
+    P : np.ndarray
+        Array of shape (..., 2) holding (latitude, longitude) pairs.
+    Q : np.ndarray
+        Array of shape (..., 2) holding (latitude, longitude) pairs.
+
+    Returns
+    -------
+    np.ndarray
+        The distances, in meters, between P and Q.
+    '''
+
+    P = np.radians(np.asarray(P, dtype=float))
+    Q = np.radians(np.asarray(Q, dtype=float))
+
+    d = (
+        np.sin((Q[..., 0] - P[..., 0]) / 2) ** 2
+        + np.cos(P[..., 0]) * np.cos(Q[..., 0]) * np.sin((Q[..., 1] - P[..., 1]) / 2) ** 2
+    )
+
+    return 2 * earth_radius * np.arcsin(np.sqrt(d))
+
+# Function: project
+
+
+def project(
+        coordinates: np.ndarray,
+        origin: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Project coordinates onto a local equirectangular plane centred at an
+    origin, where distances are in meters. Within the extent of a city,
+    the distortion is well below the accuracy of GPS fixes.
+
+    Parameters
+    ----------
+    coordinates : np.ndarray
+        Array of shape (..., 2) holding (latitude, longitude) pairs.
+    origin : np.ndarray
+        The (latitude, longitude) of the origin, e.g. the output of
+        get_origin.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (..., 2) holding (x, y) pairs, in meters, where x
+        points east and y points north.
+    '''
+
+    coordinates = np.asarray(coordinates, dtype=float)
+    origin = np.radians(np.asarray(origin, dtype=float))
+
+    latitudes = np.radians(coordinates[..., 0])
+    longitudes = np.radians(coordinates[..., 1])
+
+    x = earth_radius * (longitudes - origin[1]) * np.cos(origin[0])
+    y = earth_radius * (latitudes - origin[0])
+
+    return np.stack([x, y], axis=-1)
+
+# Function: calculate_segment_parameters
+
+
+def calculate_segment_parameters(
+        A: np.ndarray,
+        B: np.ndarray,
+        P: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Calculate the parameter t of the closest point to P on the segment
+    from A to B, i.e. A + t (B - A), with t clamped to [0, 1]. For
+    degenerate segments, where A and B coincide, t is 0.
+
+    Parameters
+    ----------
+    A : np.ndarray
+        Array of shape (..., 2) holding the projected segment starts.
+    B : np.ndarray
+        Array of shape (..., 2) holding the projected segment ends.
+    P : np.ndarray
+        Array of shape (..., 2) holding the projected points.
+
+    Returns
+    -------
+    np.ndarray
+        The clamped parameters, broadcast over A, B and P.
+    '''
+
+    AB = B - A
+    AP = P - A
+
+    squared_lengths = np.sum(AB * AB, axis=-1)
+
+    t = np.divide(
+        np.sum(AP * AB, axis=-1),
+        squared_lengths,
+        out=np.zeros(np.broadcast_shapes(AP.shape[:-1], squared_lengths.shape)),
+        where=squared_lengths > 0
+    )
+
+    return np.clip(t, 0, 1)
+
+# Function: calculate_distances_to_segments
+
+
+def calculate_distances_to_segments(
+        A: np.ndarray,
+        B: np.ndarray,
+        P: np.ndarray
+    ) -> tuple:
+    '''
+    Calculate the distance between points P and segments from A to B,
+    elementwise and with broadcasting.
+
+    Parameters
+    ----------
+    A : np.ndarray
+        Array of shape (..., 2) holding the projected segment starts.
+    B : np.ndarray
+        Array of shape (..., 2) holding the projected segment ends.
+    P : np.ndarray
+        Array of shape (..., 2) holding the projected points.
+
+    Returns
+    -------
+    tuple
+        The distances, in meters, and the clamped segment parameters.
+    '''
+
+    t = calculate_segment_parameters(A=A, B=B, P=P)
+
+    closest_points = A + t[..., np.newaxis] * (B - A)
+
+    distances = np.linalg.norm(P - closest_points, axis=-1)
+
+    return distances, t
+
+# Function: calculate_offsets_along_segments
+
+
+def calculate_offsets_along_segments(
+        A: np.ndarray,
+        B: np.ndarray,
+        t: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Calculate the distance from the start of segments from A to B to the
+    points at parameter t along them.
+
+    Parameters
+    ----------
+    A : np.ndarray
+        Array of shape (..., 2) holding the projected segment starts.
+    B : np.ndarray
+        Array of shape (..., 2) holding the projected segment ends.
+    t : np.ndarray
+        The segment parameters, e.g. output by
+        calculate_segment_parameters.
+
+    Returns
+    -------
+    np.ndarray
+        The offsets, in meters, along the segments.
+    '''
+
+    return t * np.linalg.norm(B - A, axis=-1)
+
+# Function: calculate_bearings
+
+
+def calculate_bearings(
+        A: np.ndarray,
+        B: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Calculate the bearings of segments from A to B.
+
+    Parameters
+    ----------
+    A : np.ndarray
+        Array of shape (..., 2) holding the projected segment starts.
+    B : np.ndarray
+        Array of shape (..., 2) holding the projected segment ends.
+
+    Returns
+    -------
+    np.ndarray
+        The bearings, in degrees clockwise from north, within [0, 360).
+        Degenerate segments get a bearing of 0.
+    '''
+
+    AB = B - A
+
+    return np.degrees(np.arctan2(AB[..., 0], AB[..., 1])) % 360
@@ -0,0 +1,241 @@
+import numpy as np
+from geometry import calculate_distances_to_segments
+
+# Class: SegmentIndex
+
+
+class SegmentIndex:
+    '''
+    A uniform grid over line segments in a projected plane, for finding
+    the segments near a point without scanning all of them.
+
+    Each segment is registered in every cell its bounding box overlaps.
+    The grid is stored in compressed sparse row form: the sorted keys of
+    the non-empty cells, the offset of each cell into an array of segment
+    indices, and that array. Building the index takes O(n log n) time for
+    n segments; a query within a radius r looks up O((r / cell_size) ** 2)
+    cells by binary search, independently of n for a fixed radius.
+
+    Parameters
+    ----------
+    A : np.ndarray
+        Array of shape (n, 2) holding the projected segment starts, e.g.
+        output by geometry.project.
+    B : np.ndarray
+        Array of shape (n, 2) holding the projected segment ends.
+    cell_size : float, optional
+        The side, in meters, of each cell, by default 100.
+    '''
+
+    def __init__(
+            self,
+            A: np.ndarray,
+            B: np.ndarray,
+            cell_size: float = 100
+        ):
+        self.A = np.asarray(A, dtype=float)
+        self.B = np.asarray(B, dtype=float)
+        self.cell_size = cell_size
+
+        # Cell ranges covered by the bounding box of each segment
+        lower = np.floor(np.minimum(self.A, self.B) / cell_size).astype(np.int64)
+        upper = np.floor(np.maximum(self.A, self.B) / cell_size).astype(np.int64)
+
+        self.lower = lower.min(axis=0) if lower.shape[0] > 0 else np.zeros(2, dtype=np.int64)
+        self.n_rows = (upper[:, 1].max() - self.lower[1] + 1) if upper.shape[0] > 0 else 1
+
+        spans = upper - lower + 1
+        counts = spans[:, 0] * spans[:, 1]
+
+        # Enumerate the (segment, cell) pairs
+        segment_ids = np.repeat(np.arange(self.A.shape[0]), counts)
+        ranks = np.arange(segment_ids.shape[0]) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        cells_x = lower[segment_ids, 0] + ranks // spans[segment_ids, 1]
+        cells_y = lower[segment_ids, 1] + ranks % spans[segment_ids, 1]
+
+        keys = self.get_keys(cells_x=cells_x, cells_y=cells_y)
+
+        # Group pairs by cell
+        order = np.lexsort((segment_ids, keys))
+
+        self.cell_keys, cell_starts = np.unique(keys[order], return_index=True)
+        self.cell_starts = np.append(cell_starts, order.shape[0])
+        self.segment_ids = segment_ids[order]
+
+    def get_keys(
+            self,
+            cells_x: np.ndarray,
+            cells_y: np.ndarray
+        ) -> np.ndarray:
+        '''
+        Get the keys of cells from their column and row.
+
+        Parameters
+        ----------
+        cells_x : np.ndarray
+            The cell columns.
+        cells_y : np.ndarray
+            The cell rows.
+
+        Returns
+        -------
+        np.ndarray
+            The cell keys. Rows outside the grid get the key -1, which
+            never matches a cell.
+        '''
+
+        rows = cells_y - self.lower[1]
+
+        keys = (cells_x - self.lower[0]) * self.n_rows + rows
+
+        return np.where((rows >= 0) & (rows < self.n_rows), keys, -1)
+
+    def query_pairs(
+            self,
+            P: np.ndarray,
+            radius: float
+        ) -> tuple:
+        '''
+        Find the candidate segments within a radius of each point.
+
+        Every segment within radius of a point is a candidate, but some
+        candidates may be farther away, and a candidate may be repeated.
+
+        Parameters
+        ----------
+        P : np.ndarray
+            Array of shape (m, 2) holding the projected points.
+        radius : float
+            The radius, in meters.
+
+        Returns
+        -------
+        tuple
+            The point and segment indices of each (point, candidate) pair.
+        '''
+
+        P = np.asarray(P, dtype=float).reshape(-1, 2)
+
+        if self.cell_keys.shape[0] == 0:
+            return np.empty(shape=0, dtype=int), np.empty(shape=0, dtype=int)
+
+        # Cells overlapping the square around each point
+        lower = np.floor((P - radius) / self.cell_size).astype(np.int64)
+        width = int(np.ceil(2 * radius / self.cell_size)) + 1
+
+        steps_x, steps_y = np.divmod(np.arange(width * width), width)
+
+        keys = self.get_keys(
+            cells_x=lower[:, [0]] + steps_x,
+            cells_y=lower[:, [1]] + steps_y
+        )
+
+        # Look up cells
+        positions = np.searchsorted(self.cell_keys, keys)
+        positions = np.minimum(positions, self.cell_keys.shape[0] - 1)
+
+        found = self.cell_keys[positions] == keys
+
+        starts = np.where(found, self.cell_starts[positions], 0)
+        counts = np.where(found, self.cell_starts[positions + 1] - starts, 0)
+
+        # Gather the segments of each cell
+        counts = counts.ravel()
+        starts = starts.ravel()
+
+        point_ids = np.repeat(np.arange(P.shape[0]), width * width)
+        point_ids = np.repeat(point_ids, counts)
+
+        ranks = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        segment_ids = self.segment_ids[np.repeat(starts, counts) + ranks]
+
+        return point_ids, segment_ids
+
+    def query(
+            self,
+            point: np.ndarray,
+            radius: float
+        ) -> np.ndarray:
+        '''
+        Find the candidate segments within a radius of a point.
+
+        Parameters
+        ----------
+        point : np.ndarray
+            The projected (x, y) of the point.
+        radius : float
+            The radius, in meters.
+
+        Returns
+        -------
+        np.ndarray
+            The sorted, unique indices of the candidate segments.
+        '''
+
+        _, segment_ids = self.query_pairs(P=point, radius=radius)
+
+        return np.unique(segment_ids)
+
+    def snap(
+            self,
+            P: np.ndarray,
+            radius: float,
+            chunk_size: int = 10000
+        ) -> tuple:
+        '''
+        Find the closest segment to each point among the segments within
+        a radius of it. Ties are resolved in favour of the first segment.
+
+        Parameters
+        ----------
+        P : np.ndarray
+            Array of shape (m, 2) holding the projected points.
+        radius : float
+            The radius, in meters.
+        chunk_size : int, optional
+            The maximum number of points queried at a time, by default
+            10000.
+
+        Returns
+        -------
+        tuple
+            The index of the closest segment to each point, the distance,
+            in meters, to it, and the clamped segment parameter of the
+            closest point. Points with no segment within radius get the
+            index -1, an infinite distance and a NaN parameter.
+        '''
+
+        P = np.asarray(P, dtype=float).reshape(-1, 2)
+
+        indices = np.full(shape=P.shape[0], fill_value=-1)
+        closest_distances = np.full(shape=P.shape[0], fill_value=np.inf)
+        closest_t = np.full(shape=P.shape[0], fill_value=np.nan)
+
+        for start in range(0, P.shape[0], chunk_size):
+            chunk = P[start:start + chunk_size]
+
+            point_ids, segment_ids = self.query_pairs(P=chunk, radius=radius)
+
+            distances, t = calculate_distances_to_segments(
+                A=self.A[segment_ids],
+                B=self.B[segment_ids],
+                P=chunk[point_ids]
+            )
+
+            within = distances <= radius
+
+            point_ids = point_ids[within]
+            segment_ids = segment_ids[within]
+            distances = distances[within]
+            t = t[within]
+
+            # Keep the closest, then first, candidate of each point
+            order = np.lexsort((segment_ids, distances, point_ids))
+            first = order[np.unique(point_ids[order], return_index=True)[1]]
+
+            indices[start + point_ids[first]] = segment_ids[first]
+            closest_distances[start + point_ids[first]] = distances[first]
+            closest_t[start + point_ids[first]] = t[first]
+
+        return indices, closest_distances, closest_t
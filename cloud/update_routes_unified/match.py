@@ -0,0 +1,222 @@
+import itertools
+import numpy as np
+import pandas as pd
+from geometry import calculate_haversine_distances
+
+# Function: calculate_extremities
+
+
+def calculate_extremities(
+        table: pd.DataFrame,
+        id_column: str
+    ) -> pd.DataFrame:
+    """
+    Calculate the start and end of every route or itinerary of every line
+    in a single pass.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        Routes or stops of any number of lines.
+    id_column : str
+        'route_id' for routes, or 'itinerary_id' for stops.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (line_number, id_column) pair, holding the latitude
+        and longitude of its first and last points by order.
+    """
+
+    table = table.sort_values(by=['line_number', id_column, 'order'])
+
+    groups = table.groupby(
+        by=['line_number', id_column],
+        sort=True
+    )[['latitude', 'longitude']]
+
+    starts = groups.first()
+    ends = groups.last()
+
+    extremities = pd.concat(
+        objs=[
+            starts.add_prefix('start_'),
+            ends.add_prefix('end_')
+        ],
+        axis=1
+    )
+
+    extremities.reset_index(inplace=True)
+
+    return extremities
+
+# Function: assign
+
+
+def assign(costs: np.ndarray) -> list:
+    """
+    Assign rows to columns of a cost matrix one to one, minimizing the
+    total cost. Small matrices are solved exactly by enumeration, larger
+    ones greedily by increasing cost.
+
+    Parameters
+    ----------
+    costs : np.ndarray
+        Array of shape (n, m) holding the cost of each assignment.
+
+    Returns
+    -------
+    list
+        The (row, column) pairs assigned, min(n, m) of them.
+    """
+
+    n, m = costs.shape
+
+    if min(n, m) == 0:
+        return []
+
+    if max(n, m) <= 8:
+        rows = np.arange(n)
+        best_pairs = None
+        best_cost = np.inf
+
+        if n <= m:
+            for columns in itertools.permutations(range(m), n):
+                cost = costs[rows, list(columns)].sum()
+                if cost < best_cost:
+                    best_cost = cost
+                    best_pairs = list(zip(rows, columns))
+
+        else:
+            columns = np.arange(m)
+            for rows in itertools.permutations(range(n), m):
+                cost = costs[list(rows), columns].sum()
+                if cost < best_cost:
+                    best_cost = cost
+                    best_pairs = sorted(zip(rows, columns))
+
+        return [(int(row), int(column)) for row, column in best_pairs]
+
+    pairs = []
+    used_rows = set()
+    used_columns = set()
+
+    for flat_index in np.argsort(costs, axis=None, kind='stable'):
+        row, column = divmod(int(flat_index), m)
+        if row not in used_rows and column not in used_columns:
+            pairs.append((row, column))
+            used_rows.add(row)
+            used_columns.add(column)
+
+    return sorted(pairs)
+
+# Function: match_routes_to_itineraries
+
+
+def match_routes_to_itineraries(
+        routes: pd.DataFrame,
+        stops: pd.DataFrame,
+        tolerance: float = 200
+    ) -> pd.DataFrame:
+    """
+    Match the route IDs of every line to its itinerary IDs.
+
+    The cost of matching a route with an itinerary is the larger of the
+    distances between their starts and between their ends. Routes and
+    itineraries of each line are assigned one to one so as to minimize
+    the total cost. Routes left over, when a line has more routes than
+    itineraries, are matched with their cheapest itinerary.
+
+    The confidence of a match is 1 for a perfect match with no close
+    alternative and decreases to 0 as its cost reaches the tolerance or
+    the cost of the next best itinerary for the route. Routes whose
+    cheapest match costs more than the tolerance are left unmatched.
+
+    Parameters
+    ----------
+    routes : pd.DataFrame
+        The routes of any number of lines.
+    stops : pd.DataFrame
+        The stops of any number of lines.
+    tolerance : float, optional
+        The tolerance, in meters, for defining two points as
+        sufficiently close to one another, by default 200.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per route, holding its line number, route ID, matched
+        itinerary ID (None if unmatched), match cost, in meters, and
+        confidence.
+    """
+
+    route_extremities = calculate_extremities(table=routes, id_column='route_id')
+    itinerary_extremities = calculate_extremities(table=stops, id_column='itinerary_id')
+
+    starts = ['start_latitude', 'start_longitude']
+    ends = ['end_latitude', 'end_longitude']
+
+    matches = []
+
+    itinerary_groups = dict(list(itinerary_extremities.groupby(by='line_number', sort=False)))
+
+    for line_number, line_routes in route_extremities.groupby(by='line_number', sort=True):
+        line_itineraries = itinerary_groups.get(line_number, itinerary_extremities.iloc[:0])
+
+        # Cost matrix between routes and itineraries
+        costs = np.maximum(
+            calculate_haversine_distances(
+                P=line_routes[starts].to_numpy()[:, np.newaxis, :],
+                Q=line_itineraries[starts].to_numpy()[np.newaxis, :, :]
+            ),
+            calculate_haversine_distances(
+                P=line_routes[ends].to_numpy()[:, np.newaxis, :],
+                Q=line_itineraries[ends].to_numpy()[np.newaxis, :, :]
+            )
+        )
+
+        # Assign routes to itineraries
+        columns = np.full(shape=costs.shape[0], fill_value=-1)
+
+        for row, column in assign(costs=costs):
+            columns[row] = column
+
+        if costs.shape[1] > 0:
+            columns = np.where(columns < 0, np.argmin(costs, axis=1), columns)
+
+        # Score matches
+        for row, route_id in enumerate(line_routes['route_id']):
+            column = columns[row]
+
+            if column < 0 or costs[row, column] > tolerance:
+                matches.append((line_number, route_id, None, np.nan, 0.0))
+                continue
+
+            cost = costs[row, column]
+            alternatives = np.delete(costs[row], column)
+            alternative = alternatives.min() if alternatives.shape[0] > 0 else np.inf
+
+            confidence = (1 - cost / tolerance) * (1 - cost / alternative if alternative > 0 else 0)
+
+            matches.append(
+                (
+                    line_number,
+                    route_id,
+                    line_itineraries['itinerary_id'].iloc[column],
+                    cost,
+                    float(np.clip(confidence, 0, 1))
+                )
+            )
+
+    matches = pd.DataFrame(
+        data=matches,
+        columns=[
+            'line_number',
+            'route_id',
+            'itinerary_id',
+            'cost',
+            'confidence'
+        ]
+    )
+
+    return matches
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from generate import generate_route_unified
+
+# Preamble.
+
+# Per-line routes and stops shared with worker processes. They are set
+# before the pool starts, so that forked workers inherit them copy-on-write
+# instead of receiving pickled DataFrames with each task.
+shared = {}
+
+# Function: generate_line_route_unified
+
+
+def generate_line_route_unified(
+        line_number: str,
+        itinerary_ids: dict
+    ) -> pd.DataFrame:
+    """
+    Generate the unified route of a line from the shared routes and
+    stops, reporting failures instead of raising them.
+
+    Parameters
+    ----------
+    line_number : str
+        The line number whose unified route is to be generated.
+    itinerary_ids : dict
+        The mapping from route IDs into their matched itinerary IDs.
+
+    Returns
+    -------
+    pd.DataFrame
+        A unified route, or None if its generation has failed.
+    """
+
+    try:
+        return generate_route_unified(
+            line_number=line_number,
+            line_routes=shared['routes'][line_number],
+            line_stops=shared['stops'][line_number],
+            itinerary_ids=itinerary_ids
+        )
+
+    except Exception as e:
+        print(f'Unified route generation for line number {line_number} has failed ({e!r}).')
+        return None
+
+# Function: generate_routes_unified
+
+
+def generate_routes_unified(
+        routes: dict,
+        stops: dict,
+        itinerary_ids: dict,
+        max_workers: int = None
+    ) -> list:
+    """
+    Generate the unified routes of several lines, one line per task over
+    a pool of forked worker processes.
+
+    Parameters
+    ----------
+    routes : dict
+        The mapping from line numbers into their routes, e.g. output by
+        split_by_line.
+    stops : dict
+        The mapping from line numbers into their stops, e.g. output by
+        split_by_line.
+    itinerary_ids : dict
+        The mapping from line numbers into the mapping from their route
+        IDs into matched itinerary IDs. Lines are generated in its order.
+    max_workers : int, optional
+        The number of worker processes, by default None, i.e. the number
+        of CPUs available. If 1, lines are generated in this process.
+
+    Returns
+    -------
+    list
+        The unified routes generated, in the order of itinerary_ids.
+    """
+
+    if max_workers is None:
+        max_workers = len(os.sched_getaffinity(0))
+
+    shared['routes'] = routes
+    shared['stops'] = stops
+
+    try:
+        if max_workers == 1 or len(itinerary_ids) <= 1:
+            routes_unified = [
+                generate_line_route_unified(
+                    line_number=line_number,
+                    itinerary_ids=line_itinerary_ids
+                )
+                for line_number, line_itinerary_ids in itinerary_ids.items()
+            ]
+
+        else:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('fork')
+            ) as executor:
+                routes_unified = list(
+                    executor.map(
+                        generate_line_route_unified,
+                        itinerary_ids.keys(),
+                        itinerary_ids.values()
+                    )
+                )
+
+    finally:
+        shared.clear()
+
+    return [route_unified for route_unified in routes_unified if route_unified is not None]
@@ -1,121 +1,190 @@
 from google.cloud import bigquery
 import pandas as pd
-import json
-from generate import generate_route_unified
-from fetch import fetch_line_routes_from_bq, fetch_line_stops_from_bq
-
-# Load mapping from line numbers into their respective route IDs
-with open('line_numbers_to_route_ids_map.json', 'r') as f:
-    line_numbers_to_route_ids_map = json.load(f)
-
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.routes.routes_unified'
+from parallel import generate_routes_unified
+from fetch import fetch_lines_from_bq, fetch_routes_from_bq, fetch_stops_from_bq, split_by_line
+from match import match_routes_to_itineraries
+from clients import get_bigquery_client, get_table_id
 
 # Function: update_routes_unified
 
 
-def update_routes_unified():
+def update_routes_unified(
+        tolerance: float = 200,
+        minimum_confidence: float = 0,
+        max_workers: int = None
+    ):
     """
-    Update table containing unified bus routes.
+    Update table containing unified bus routes of all lines, matching
+    their route IDs to itinerary IDs automatically.
+
+    Parameters
+    ----------
+    tolerance : float, optional
+        The tolerance, in meters, for matching the extremities of routes
+        and itineraries, by default 200.
+    minimum_confidence : float, optional
+        The minimum confidence of a match for its route to be unified,
+        by default 0.
+    max_workers : int, optional
+        The number of worker processes generating unified routes, by
+        default None, i.e. the number of CPUs available.
     """
-    # Prepare dataframe for unified routes
-    routes_unified = pd.DataFrame()
-
-    # Loop over line numbers whose route IDs have been mapped
-    for line_number, value in line_numbers_to_route_ids_map.items():
-        line_routes = fetch_line_routes_from_bq(line_number=line_number)
-        line_stops = fetch_line_stops_from_bq(line_number=line_number)
-
-        route_unified = generate_route_unified(
-            line_number=line_number,
-            line_routes=line_routes,
-            line_stops=line_stops
-        )
+    client = get_bigquery_client()
+    table_id = get_table_id(table='routes.routes_unified')
 
-        routes_unified = pd.concat(
-            objs=[
-                routes_unified,
-                route_unified
-            ],
-            ignore_index=True
-        )
+    # Fetch routes and stops of all line numbers at once
+    line_numbers = fetch_lines_from_bq()['line_number'].to_list()
 
-    if routes_unified.shape[0] > 0:
-        # Set configuration options for load job.
-
-        job_config = bigquery.LoadJobConfig(
-            schema = [
-                bigquery.SchemaField(
-                    name='line_number',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The line number.'
-                ),
-                bigquery.SchemaField(
-                    name='order',
-                    field_type='INTEGER',
-                    mode='REQUIRED',
-                    description='The order of points within the unified route.'
-                ),
-                bigquery.SchemaField(
-                    name='latitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='The point latitude.'
-                ),
-                bigquery.SchemaField(
-                    name='longitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='The point longitude.'
-                ),
-                bigquery.SchemaField(
-                    name='point_type',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The type of the bus stop if point is a bus stop, NULL otherwise.'
-                ),
-                bigquery.SchemaField(
-                    name='stop_number',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The number of the bus stop if point is a bus stop, NULL otherwise.'
-                ),
-                bigquery.SchemaField(
-                    name='stop_name',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The name of the bus stop if point is a bus stop, NULL otherwise.'
-                ),
-                bigquery.SchemaField(
-                    name='direction',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The direction associated with the point.'
-                )
-            ],
-            write_disposition='WRITE_TRUNCATE',
-        )
+    routes = fetch_routes_from_bq(line_numbers=line_numbers)
+    stops = fetch_stops_from_bq(line_numbers=line_numbers)
 
-        # Load data.
-        job = client.load_table_from_dataframe(
-            dataframe=routes_unified,
-            destination=table_id,
-            job_config=job_config
-        )
-        job.result()
-
-        table = client.get_table(table_id)
-        print(
-            'Loaded {0} rows to {1}, which now has {2} rows.'.format(
-                routes_unified.shape[0],
-                table_id,
-                table.num_rows
-            )
+    # Match route IDs to itinerary IDs
+    matches = match_routes_to_itineraries(
+        routes=routes,
+        stops=stops,
+        tolerance=tolerance
+    )
+
+    unmatched = matches.loc[matches['itinerary_id'].isna()]
+    uncertain = matches.loc[matches['itinerary_id'].notna() & (matches['confidence'] < minimum_confidence)]
+
+    print(
+        'Matched {0} out of {1} routes; {2} matches have a confidence below {3}.'.format(
+            matches.shape[0] - unmatched.shape[0],
+            matches.shape[0],
+            uncertain.shape[0],
+            minimum_confidence
         )
+    )
+
+    if uncertain.shape[0] > 0:
+        print(uncertain.to_string(index=False))
 
-    else:
+    matches = matches.loc[matches['itinerary_id'].notna() & (matches['confidence'] >= minimum_confidence)]
+
+    itinerary_ids = {
+        line_number: dict(zip(line_matches['route_id'], line_matches['itinerary_id']))
+        for line_number, line_matches in matches.groupby(by='line_number')
+    }
+
+    routes = split_by_line(table=routes)
+    stops = split_by_line(table=stops)
+
+    # Generate unified routes of line numbers with matched route IDs
+    routes_unified = generate_routes_unified(
+        routes=routes,
+        stops=stops,
+        itinerary_ids={
+            line_number: itinerary_ids[line_number]
+            for line_number in line_numbers
+            if line_number in itinerary_ids
+        },
+        max_workers=max_workers
+    )
+
+    # Lines whose routes could not be unified yield empty frames.
+    routes_unified = [
+        route_unified
+        for route_unified in routes_unified
+        if route_unified.shape[0] > 0
+    ]
+
+    if len(routes_unified) == 0:
         print('No rows have been loaded.')
+        return
+
+    routes_unified = pd.concat(
+        objs=routes_unified,
+        ignore_index=True
+    )
+
+    # Set configuration options for load job.
+
+    job_config = bigquery.LoadJobConfig(
+        schema = [
+            bigquery.SchemaField(
+                name='line_number',
+                field_type='STRING',
+                mode='REQUIRED',
+                description='The line number.'
+            ),
+            bigquery.SchemaField(
+                name='order',
+                field_type='INTEGER',
+                mode='REQUIRED',
+                description='The order of points within the unified route.'
+            ),
+            bigquery.SchemaField(
+                name='latitude',
+                field_type='FLOAT',
+                mode='REQUIRED',
+                description='The point latitude.'
+            ),
+            bigquery.SchemaField(
+                name='longitude',
+                field_type='FLOAT',
+                mode='REQUIRED',
+                description='The point longitude.'
+            ),
+            bigquery.SchemaField(
+                name='point_type',
+                field_type='STRING',
+                mode='NULLABLE',
+                description='The type of the bus stop if point is a bus stop, NULL otherwise.'
+            ),
+            bigquery.SchemaField(
+                name='stop_number',
+                field_type='STRING',
+                mode='NULLABLE',
+                description='The number of the bus stop if point is a bus stop, NULL otherwise.'
+            ),
+            bigquery.SchemaField(
+                name='stop_name',
+                field_type='STRING',
+                mode='NULLABLE',
+                description='The name of the bus stop if point is a bus stop, NULL otherwise.'
+            ),
+            bigquery.SchemaField(
+                name='direction',
+                field_type='STRING',
+                mode='REQUIRED',
+                description='The direction associated with the point.'
+            ),
+            bigquery.SchemaField(
+                name='chainage',
+                field_type='FLOAT',
+                mode='REQUIRED',
+                description='The distance, in meters, along the unified route from its first point to the point.'
+            ),
+            bigquery.SchemaField(
+                name='segment_length',
+                field_type='FLOAT',
+                mode='NULLABLE',
+                description='The distance, in meters, along the unified route from the point to the next one, NULL for the last point.'
+            ),
+            bigquery.SchemaField(
+                name='bearing',
+                field_type='FLOAT',
+                mode='REQUIRED',
+                description='The bearing, in degrees clockwise from north, of the route segment the point lies on.'
+            )
+        ],
+        write_disposition='WRITE_TRUNCATE',
+    )
+
+    # Load data.
+    job = client.load_table_from_dataframe(
+        dataframe=routes_unified,
+        destination=table_id,
+        job_config=job_config
+    )
+    job.result()
+
+    table = client.get_table(table_id)
+    print(
+        'Loaded {0} rows to {1}, which now has {2} rows.'.format(
+            routes_unified.shape[0],
+            table_id,
+            table.num_rows
+        )
+    )
@@ -54,6 +54,24 @@ schema = [
         field_type='STRING',
         mode='REQUIRED',
         description='The direction associated with the point.'
+    ),
+    bigquery.SchemaField(
+        name='chainage',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The distance, in meters, along the unified route from its first point to the point.'
+    ),
+    bigquery.SchemaField(
+        name='segment_length',
+        field_type='FLOAT',
+        mode='NULLABLE',
+        description='The distance, in meters, along the unified route from the point to the next one, NULL for the last point.'
+    ),
+    bigquery.SchemaField(
+        name='bearing',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The bearing, in degrees clockwise from north, of the route segment the point lies on.'
     )
 ]
 
@@ -5,7 +5,8 @@ gcloud functions deploy update_routes_unified \
     --gen2 \
     --runtime=python312 \
     --timeout=540s \
-    --memory=512M \
+    --memory=2G \
+    --cpu=2 \
     --trigger-topic=update_routes_unified
 gcloud scheduler jobs create pubsub update_routes_unified \
     --location=southamerica-east1 \
@@ -1,13 +1,7 @@
-import requests
-from keys import api_key_bus_data
+import urbs
+from parse import parse_line_stops
 import pandas as pd
-from google.cloud import bigquery
-
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.routes.stops'
+from clients import get_bigquery_client
 
 # Function: fetch_line_stops
 
@@ -25,116 +19,26 @@ def fetch_line_stops(line_number: str) -> pd.DataFrame:
 
     # 1. Perform request.
 
-    url = f'https://transporteservico.urbs.curitiba.pr.gov.br/getPontosLinha.php?linha={line_number}&c={api_key_bus_data}'
-
-    try:
-        r = requests.request(
-            method='GET',
-            url=url,
-            timeout=15
-        )
-
-        if r.status_code == 200:
-            r_json = r.json()
-
-            if len(r_json) > 0:
-                # 2. Format data.
-
-                stops = pd.DataFrame()
-
-                index = 0
-
-                for point in r_json:
-                    stops = pd.concat(
-                        objs=[
-                            stops,
-                            pd.DataFrame(
-                                data=point,
-                                index=[index]
-                            )
-                        ]
-                    )
-
-                    index += 1
-
-                stops.reset_index(
-                    drop=True,
-                    inplace=True
-                )
-
-                stops.rename(
-                    mapper={
-                        'NOME': 'name',
-                        'NUM': 'number',
-                        'LAT': 'latitude',
-                        'LON': 'longitude',
-                        'SEQ': 'order',
-                        'GRUPO': 'group',
-                        'SENTIDO': 'direction',
-                        'TIPO': 'type',
-                        'ITINERARY_ID': 'itinerary_id'
-                    },
-                    axis=1,
-                    inplace=True
-                )
-
-                stops['line_number'] = line_number
-
-                for column in ['latitude', 'longitude']:
-                    stops[column] = stops[column].str.replace(',', '.')
-
-                stops = stops.astype(
-                    dtype={
-                        'name': str,
-                        'number': str,
-                        'latitude': str,
-                        'longitude': str,
-                        'order': int,
-                        'group': str,
-                        'direction': str,
-                        'type': str,
-                        'itinerary_id': str,
-                        'line_number': str
-                    }
-                )
-
-                stops = stops[
-                    [
-                        'line_number',
-                        'itinerary_id',
-                        'group',
-                        'number',
-                        'name',
-                        'type',
-                        'order',
-                        'direction',
-                        'latitude',
-                        'longitude'
-                    ]
-                ]
-
-                # 3. Return data.
-
-                return stops
-
-            else:
-                print(f'Stops request for line number {line_number} has resulted in an empty list.')
-                return None
-
-    # 4. Handle errors.
-
-    except requests.Timeout:
-        print('Stops request has timed out.')
-        return None
+    result = urbs.get(
+        endpoint='getPontosLinha',
+        line_number=line_number
+    )
 
-    except requests.JSONDecodeError:
-        print('JSON decode error.')
-        return None
+    # 2. Handle errors.
 
-    except requests.ConnectionError:
-        print('Connection error.')
+    if not result.ok:
+        print(f'Stops request for line number {line_number} has failed ({result.error}).')
         return None
 
+    # 3. Format and return data.
+
+    stops = parse_line_stops(
+        r_json=result.data,
+        line_number=line_number
+    )
+
+    return stops
+
 # Function: fetch_lines
 
 
@@ -146,6 +50,8 @@ def fetch_lines() -> pd.DataFrame:
         pd.DataFrame: Data on bus lines.
     '''
 
+    client = get_bigquery_client()
+
     QUERY = f'''
     SELECT *
     FROM `{client.project}.lines.lines`
@@ -160,24 +66,39 @@ def fetch_lines() -> pd.DataFrame:
 # Function: fetch stops.
 
 
-def fetch_stops() -> pd.DataFrame:
+def fetch_stops(
+        lines: pd.DataFrame = None,
+        max_workers: int = 16
+    ) -> pd.DataFrame:
     '''
-    Fetch all bus stops.
+    Fetch all bus stops, requesting several lines
+    concurrently.
+
+    Args:
+        lines (pd.DataFrame): The lines whose data is fetched. Defaults to
+            None, in which case all lines in lines.lines are fetched.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
 
     Returns:
         pd.DataFrame: All bus stops.
     '''
 
-    lines = fetch_lines()
+    if lines is None:
+        lines = fetch_lines()
 
-    stops = pd.DataFrame()
+    stops, failures = urbs.map_lines(
+        function=fetch_line_stops,
+        line_numbers=lines['line_number'].to_list(),
+        max_workers=max_workers
+    )
+
+    if len(failures) > 0:
+        print(f'Stops requests have failed for {len(failures)} out of {lines.shape[0]} lines: {failures}')
+
+    if len(stops) == 0:
+        return None
 
-    for index, row in lines.iterrows():
-        stops = pd.concat(
-            objs=[
-                stops,
-                fetch_line_stops(line_number=row['line_number'])
-            ]
-        )
+    stops = pd.concat(objs=stops)
 
     return stops
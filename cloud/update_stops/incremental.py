@@ -0,0 +1,227 @@
+import datetime as dt
+from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
+import pandas as pd
+from clients import get_bigquery_client
+
+hashes_columns = [
+    'line_number',
+    'content_hash',
+    'updated_datetime'
+]
+
+hashes_schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='content_hash',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='A hash of the rows of the line.'
+    ),
+    bigquery.SchemaField(
+        name='updated_datetime',
+        field_type='TIMESTAMP',
+        mode='REQUIRED',
+        description='The date and time at which the rows of the line last changed.'
+    )
+]
+
+# Function: hash_lines
+
+
+def hash_lines(data: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Compute a content hash for each line number.
+
+    Each row is hashed over all of its columns, and the row hashes of a
+    line are summed, so that the hash of a line does not depend on the
+    order of its rows but changes whenever a row is added, removed or
+    modified.
+
+    Args:
+        data (pd.DataFrame): Rows holding a line_number column.
+
+    Returns:
+        pd.DataFrame: The line number and content hash of each line.
+    '''
+
+    row_hashes = pd.util.hash_pandas_object(
+        obj=data.astype(str),
+        index=False
+    )
+
+    hashes = row_hashes.groupby(data['line_number'].to_numpy()).sum()
+
+    hashes = hashes.map('{0:016x}'.format).rename('content_hash')
+    hashes = hashes.rename_axis('line_number').reset_index()
+
+    return hashes
+
+# Function: fetch_content_hashes
+
+
+def fetch_content_hashes(hashes_table_id: str) -> pd.DataFrame:
+    '''
+    Fetch the stored content hash of each line.
+
+    Args:
+        hashes_table_id (str): The ID of the table holding the hashes.
+
+    Returns:
+        pd.DataFrame: The stored hashes, empty if the table does not exist
+            yet.
+    '''
+
+    query = f'''
+    SELECT *
+    FROM `{hashes_table_id}`
+    '''
+
+    try:
+        hashes = get_bigquery_client().query_and_wait(query=query).to_dataframe()
+
+    except NotFound:
+        print(f'Table {hashes_table_id} not found.')
+        return pd.DataFrame(columns=hashes_columns)
+
+    return hashes
+
+# Function: update_incrementally
+
+
+def update_incrementally(
+        data: pd.DataFrame,
+        line_numbers: list,
+        table_id: str,
+        job_config_options: dict = None
+    ) -> list:
+    '''
+    Write only the lines whose content has changed since the last update.
+
+    Lines whose hash differs from the stored one, or that have no stored
+    hash, are loaded into a staging table with the schema of the
+    destination table and replace the rows of those
+    lines in the destination table through a single MERGE. Lines with a
+    stored hash that are no longer in line_numbers have their rows
+    deleted. Lines in line_numbers that are missing from data, e.g.
+    because their request has failed, are left untouched.
+
+    The hashes are stored in the table <table_id>_hashes, together with
+    the date and time at which each line last changed, so that downstream
+    jobs can tell which lines to recompute.
+
+    Args:
+        data (pd.DataFrame): The current rows of all fetched lines.
+        line_numbers (list): All current line numbers.
+        table_id (str): The ID of the destination table.
+        job_config_options (dict): Additional options of the staging load
+            job. Defaults to None.
+
+    Returns:
+        list: The line numbers whose rows have been replaced or deleted.
+    '''
+
+    client = get_bigquery_client()
+    staging_table_id = f'{table_id}_staging'
+    hashes_table_id = f'{table_id}_hashes'
+
+    # 1. Compare current and stored hashes.
+
+    current_hashes = hash_lines(data=data)
+    stored_hashes = fetch_content_hashes(hashes_table_id=hashes_table_id)
+
+    hashes = current_hashes.merge(
+        right=stored_hashes,
+        how='outer',
+        on='line_number',
+        suffixes=('', '_stored')
+    )
+
+    changed = hashes['content_hash'].notna() & (hashes['content_hash'] != hashes['content_hash_stored'])
+    deleted = hashes['content_hash'].isna() & ~hashes['line_number'].isin(line_numbers)
+    unfetched = hashes['content_hash'].isna() & ~deleted
+
+    changed_line_numbers = sorted(hashes.loc[changed | deleted, 'line_number'])
+
+    if len(changed_line_numbers) == 0:
+        print(f'No line has changed in {table_id}.')
+        return changed_line_numbers
+
+    # 2. Load the rows of changed lines into the staging table.
+
+    schema = client.get_table(table_id).schema
+
+    job_config = bigquery.LoadJobConfig(
+        schema=schema,
+        write_disposition='WRITE_TRUNCATE',
+        **(job_config_options or {})
+    )
+
+    job = client.load_table_from_dataframe(
+        dataframe=data.loc[data['line_number'].isin(changed_line_numbers), [field.name for field in schema]],
+        destination=staging_table_id,
+        job_config=job_config
+    )
+    job.result()
+
+    # 3. Replace the rows of changed and deleted lines.
+
+    query = f'''
+    MERGE `{table_id}` AS T
+    USING `{staging_table_id}` AS S
+    ON FALSE
+    WHEN NOT MATCHED BY SOURCE AND T.line_number IN UNNEST(@line_numbers) THEN
+        DELETE
+    WHEN NOT MATCHED THEN
+        INSERT ROW
+    '''
+
+    query_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter(
+                name='line_numbers',
+                array_type='STRING',
+                values=changed_line_numbers
+            )
+        ]
+    )
+
+    client.query_and_wait(
+        query=query,
+        job_config=query_config
+    )
+
+    # 4. Store hashes.
+
+    now = pd.Timestamp(dt.datetime.now(dt.timezone.utc))
+
+    hashes['updated_datetime'] = pd.to_datetime(hashes['updated_datetime'], utc=True).where(~changed, now)
+    hashes.loc[unfetched, 'content_hash'] = hashes.loc[unfetched, 'content_hash_stored']
+    hashes = hashes.loc[~deleted, hashes_columns]
+
+    job_config = bigquery.LoadJobConfig(
+        schema=hashes_schema,
+        write_disposition='WRITE_TRUNCATE',
+    )
+
+    job = client.load_table_from_dataframe(
+        dataframe=hashes,
+        destination=hashes_table_id,
+        job_config=job_config
+    )
+    job.result()
+
+    print(
+        'Replaced the rows of {0} changed lines in {1}: {2}'.format(
+            len(changed_line_numbers),
+            table_id,
+            changed_line_numbers
+        )
+    )
+
+    return changed_line_numbers
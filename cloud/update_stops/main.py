@@ -1,6 +1,10 @@
 from update import update_stops
+from archive import flush_archive
 import functions_framework
 
 @functions_framework.cloud_event
 def update_stops_entry_point(cloud_event):
-    update_stops()
+    try:
+        update_stops(incremental=True)
+    finally:
+        flush_archive()
@@ -0,0 +1,80 @@
+import pandas as pd
+
+# Function: parse_line_stops
+
+
+def parse_line_stops(
+        r_json: list,
+        line_number: str
+    ) -> pd.DataFrame:
+    '''
+    Parse a getPontosLinha payload into the stops of a line.
+
+    Args:
+        r_json (list): The decoded getPontosLinha payload.
+        line_number (str): The line number.
+
+    Returns:
+        pd.DataFrame: The stops of the route.
+    '''
+
+    # 1. Format data.
+
+    # Points are collected into a single frame in one pass; a point that
+    # lacks a field gets NaN in that column, as with a row-by-row concat.
+    stops = pd.DataFrame.from_records(data=r_json)
+
+    stops.rename(
+        mapper={
+            'NOME': 'name',
+            'NUM': 'number',
+            'LAT': 'latitude',
+            'LON': 'longitude',
+            'SEQ': 'order',
+            'GRUPO': 'group',
+            'SENTIDO': 'direction',
+            'TIPO': 'type',
+            'ITINERARY_ID': 'itinerary_id'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    stops['line_number'] = line_number
+
+    for column in ['latitude', 'longitude']:
+        stops[column] = stops[column].str.replace(',', '.')
+
+    stops = stops.astype(
+        dtype={
+            'name': str,
+            'number': str,
+            'latitude': str,
+            'longitude': str,
+            'order': int,
+            'group': str,
+            'direction': str,
+            'type': str,
+            'itinerary_id': str,
+            'line_number': str
+        }
+    )
+
+    stops = stops[
+        [
+            'line_number',
+            'itinerary_id',
+            'group',
+            'number',
+            'name',
+            'type',
+            'order',
+            'direction',
+            'latitude',
+            'longitude'
+        ]
+    ]
+
+    # 2. Return data.
+
+    return stops
@@ -0,0 +1,97 @@
+import argparse
+import datetime as dt
+import json
+from pathlib import Path
+from archive import replay_archive
+from parse import parse_line_stops
+
+# Function: parse_archived_stops
+
+
+def parse_archived_stops(record: dict):
+    '''
+    Parse an archived getPontosLinha record into the stops of a line.
+
+    Args:
+        record (dict): An archived record.
+
+    Returns:
+        pd.DataFrame: The parsed data, or None if the payload is empty.
+    '''
+
+    r_json = json.loads(record['body'])
+
+    if len(r_json) == 0:
+        return None
+
+    return parse_line_stops(
+        r_json=r_json,
+        line_number=record['line_number']
+    )
+
+# Function: replay_stops
+
+
+def replay_stops(
+        start: dt.datetime,
+        end: dt.datetime,
+        output: str,
+        line_number: str = None,
+        max_workers: int = None
+    ) -> int:
+    '''
+    Re-parse the archived getPontosLinha responses within a time range and
+    write each resulting batch as a Parquet file.
+
+    Args:
+        start (dt.datetime): The start of the range, naive in UTC.
+        end (dt.datetime): The end of the range, naive in UTC, exclusive.
+        output (str): The directory where Parquet files are written.
+        line_number (str): If given, only this line is replayed. Defaults
+            to None.
+        max_workers (int): The number of worker processes. Defaults to
+            None, i.e. the number of CPUs.
+
+    Returns:
+        int: The number of rows written.
+    '''
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    count = 0
+
+    batches = replay_archive(
+        endpoint='getPontosLinha',
+        parse=parse_archived_stops,
+        start=start,
+        end=end,
+        line_number=line_number,
+        max_workers=max_workers
+    )
+
+    for index, batch in enumerate(batches):
+        batch.to_parquet(path=output / 'part-{0:05d}.parquet'.format(index), index=False)
+        count += batch.shape[0]
+
+    print('Replayed {0} rows of stops.'.format(count))
+
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay archived getPontosLinha responses.')
+    parser.add_argument('--start', type=dt.datetime.fromisoformat, required=True, help='Start of the range, in UTC.')
+    parser.add_argument('--end', type=dt.datetime.fromisoformat, required=True, help='End of the range, in UTC, exclusive.')
+    parser.add_argument('--output', required=True, help='Directory where Parquet files are written.')
+    parser.add_argument('--line-number', default=None)
+    parser.add_argument('--max-workers', type=int, default=None)
+    args = parser.parse_args()
+
+    replay_stops(
+        start=args.start,
+        end=args.end,
+        output=args.output,
+        line_number=args.line_number,
+        max_workers=args.max_workers
+    )
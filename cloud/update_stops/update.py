@@ -1,89 +1,107 @@
 from google.cloud import bigquery
 import pandas as pd
-from fetch import fetch_stops
+from fetch import fetch_lines, fetch_stops
+from clients import get_bigquery_client, get_table_id
+from incremental import update_incrementally
 
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.routes.stops'
+schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='itinerary_id',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The itinerary ID.'
+    ),
+    bigquery.SchemaField(
+        name='group',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The group of points.'
+    ),
+    bigquery.SchemaField(
+        name='number',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The stop number.'
+    ),
+    bigquery.SchemaField(
+        name='name',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop name.'
+    ),
+    bigquery.SchemaField(
+        name='type',
+        field_type='STRING',
+        mode='NULLABLE',
+        description='The stop type.'
+    ),
+    bigquery.SchemaField(
+        name='order',
+        field_type='INT64',
+        mode='REQUIRED',
+        description='The order of the stop within the pair (line_number, itinerary_id).'
+    ),
+    bigquery.SchemaField(
+        name='direction',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop direction.'
+    ),
+    bigquery.SchemaField(
+        name='latitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The stop latitude.'
+    ),
+    bigquery.SchemaField(
+        name='longitude',
+        field_type='FLOAT',
+        mode='REQUIRED',
+        description='The stop longitude.'
+    )
+]
 
 # Function: update_stops
 
-def update_stops():
+def update_stops(incremental: bool = False) -> list:
     """
     Update table containing bus stops.
+
+    If incremental is True, only the rows of lines whose content has
+    changed are rewritten, and the changed line numbers are returned.
     """
+    client = get_bigquery_client()
+    table_id = get_table_id(table='routes.stops')
+
     # Fetch routes.
 
-    stops = fetch_stops()
+    lines = fetch_lines()
+    stops = fetch_stops(lines=lines)
+
+    if stops is not None and incremental:
+        # Replace the rows of changed lines only.
+
+        return update_incrementally(
+            data=stops,
+            line_numbers=lines['line_number'].to_list(),
+            table_id=table_id,
+            job_config_options={
+                'autodetect': False,
+                'source_format': bigquery.SourceFormat.CSV
+            }
+        )
 
     if stops is not None:
         # Set configuration options for load job.
 
         job_config = bigquery.LoadJobConfig(
-            schema = [
-                bigquery.SchemaField(
-                    name='line_number',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The line number.'
-                ),
-                bigquery.SchemaField(
-                    name='itinerary_id',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The itinerary ID.'
-                ),
-                bigquery.SchemaField(
-                    name='group',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The group of points.'
-                ),
-                bigquery.SchemaField(
-                    name='number',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The stop number.'
-                ),
-                bigquery.SchemaField(
-                    name='name',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop name.'
-                ),
-                bigquery.SchemaField(
-                    name='type',
-                    field_type='STRING',
-                    mode='NULLABLE',
-                    description='The stop type.'
-                ),
-                bigquery.SchemaField(
-                    name='order',
-                    field_type='INT64',
-                    mode='REQUIRED',
-                    description='The order of the stop within the pair (line_number, itinerary_id).'
-                ),
-                bigquery.SchemaField(
-                    name='direction',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop direction.'
-                ),
-                bigquery.SchemaField(
-                    name='latitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='The stop latitude.'
-                ),
-                bigquery.SchemaField(
-                    name='longitude',
-                    field_type='FLOAT',
-                    mode='REQUIRED',
-                    description='The stop longitude.'
-                )
-            ],
+            schema=schema,
             autodetect=False,
             source_format=bigquery.SourceFormat.CSV,
             write_disposition='WRITE_TRUNCATE',
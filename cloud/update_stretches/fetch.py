@@ -1,13 +1,7 @@
-import requests
-from keys import api_key_bus_data
+import urbs
+from parse import parse_stretch
 import pandas as pd
-from google.cloud import bigquery
-
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.lines.lines'
+from clients import get_bigquery_client
 
 # Function: fetch_stretch
 
@@ -25,141 +19,23 @@ def fetch_stretch(line_number: str) -> pd.DataFrame:
 
     # 1. Perform request.
 
-    url = f'https://transporteservico.urbs.curitiba.pr.gov.br/getTrechosItinerarios.php?linha={line_number}&c={api_key_bus_data}'
-
-    try:
-        r = requests.request(
-            method='GET',
-            url=url,
-            timeout=15
-        )
-
-        if r.status_code == 200:
-            r_json = r.json()
-
-            if len(r_json) > 0:
-                # 2. Format data.
-
-                stretch = pd.DataFrame()
-
-                for point in r_json:
-                    point = pd.json_normalize(point)
-                    stretch = pd.concat(
-                        objs=[
-                            stretch,
-                            point
-                        ]
-                    )
-
-                stretch.reset_index(
-                    drop=False,
-                    inplace=True
-                )
-
-                stretch.rename(
-                    mapper={
-                        'COD_LINHA': 'line_number',
-                        'NOME_LINHA': 'line_name_original',
-                        'COD_CATEGORIA': 'service_category_code',
-                        'NOME_CATEGORIA': 'service_category',
-                        'COD_EMPRESA': 'company_code',
-                        'NOME_EMPRESA': 'company',
-                        'COD_PTO_PARADA_TH': 'stop_code_timetable',
-                        'NOME_PTO_PARADA_TH': 'stop_name_timetable',
-                        'SEQ_PTO_ITI_TH': 'order_itinerary',
-                        'COD_ITINERARIO': 'itinerary_code',
-                        'NOME_ITINERARIO': 'itinerary',
-                        'PTO_ESPECIAL': 'special_stop',
-                        'COD_PTO_TRECHO_A': 'point_code_stretch_start',
-                        'SEQ_PONTO_TRECHO_A': 'point_order_start',
-                        'COD_PTO_TRECHO_B': 'point_code_strech_end',
-                        'SEQ_PONTO_TRECHO_B': 'point_order_end',
-                        'EXTENSAO_TRECHO_A_ATE_B': 'distance_start_to_end',
-                        'TIPO_TRECHO': 'stretch_type',
-                        'STOP_CODE': 'stop_code',
-                        'STOP_NAME': 'stop_name',
-                        'CODIGO_URBS': 'urbs_code'
-                    },
-                    axis=1,
-                    inplace=True
-                )
-
-                stretch['distance_start_to_end'] = stretch['distance_start_to_end'].str.replace(',', '.')
-
-                stretch = stretch.astype(
-                    dtype={
-                        'line_number': str,
-                        'line_name_original': str,
-                        'service_category_code': str,
-                        'service_category': str,
-                        'company_code': str,
-                        'company': str,
-                        'stop_code_timetable': str,
-                        'stop_name_timetable': str,
-                        'order_itinerary': str,
-                        'itinerary_code': str,
-                        'itinerary': str,
-                        'special_stop': str,
-                        'point_code_stretch_start': str,
-                        'point_order_start': str,
-                        'point_code_strech_end': str,
-                        'point_order_end': str,
-                        'distance_start_to_end': float,
-                        'stretch_type': str,
-                        'stop_code': str,
-                        'stop_name': str,
-                        'urbs_code': str
-                    }
-                )
-
-                stretch = stretch[
-                    [
-                        'line_number',
-                        'line_name_original',
-                        'service_category_code',
-                        'service_category',
-                        'company_code',
-                        'company',
-                        'stop_code_timetable',
-                        'stop_name_timetable',
-                        'order_itinerary',
-                        'itinerary_code',
-                        'itinerary',
-                        'special_stop',
-                        'point_code_stretch_start',
-                        'point_order_start',
-                        'point_code_strech_end',
-                        'point_order_end',
-                        'distance_start_to_end',
-                        'stretch_type',
-                        'stop_code',
-                        'stop_name',
-                        'urbs_code'
-                    ]
-                ]
-
-                # 3. Return data.
-
-                return stretch
-
-            else:
-                print(f'Stretch request for line number {line_number} has resulted in an empty list.')
-                return None
-
-    # 4. Handle errors.
-
-    except requests.Timeout:
-        print('Stretch request has timed out.')
-        return None
+    result = urbs.get(
+        endpoint='getTrechosItinerarios',
+        line_number=line_number
+    )
 
-    except requests.JSONDecodeError:
-        print('JSON decode error.')
-        return None
+    # 2. Handle errors.
 
-    except requests.ConnectionError:
-        print('Connection error.')
+    if not result.ok:
+        print(f'Stretch request for line number {line_number} has failed ({result.error}).')
         return None
 
+    # 3. Format and return data.
+
+    stretch = parse_stretch(r_json=result.data)
+
+    return stretch
+
 # Function: fetch_lines
 
 
@@ -171,6 +47,8 @@ def fetch_lines() -> pd.DataFrame:
         pd.DataFrame: Data on bus lines.
     '''
 
+    client = get_bigquery_client()
+
     QUERY = f'''
     SELECT *
     FROM `{client.project}.lines.lines`
@@ -185,24 +63,39 @@ def fetch_lines() -> pd.DataFrame:
 # Function: fetch_stretches
 
 
-def fetch_stretches() -> pd.DataFrame:
+def fetch_stretches(
+        lines: pd.DataFrame = None,
+        max_workers: int = 16
+    ) -> pd.DataFrame:
     '''
-    Fetch all stretches.
+    Fetch all stretches, requesting several lines
+    concurrently.
+
+    Args:
+        lines (pd.DataFrame): The lines whose data is fetched. Defaults to
+            None, in which case all lines in lines.lines are fetched.
+        max_workers (int): The maximum number of concurrent requests.
+            Defaults to 16.
 
     Returns:
         pd.DataFrame: All bus stretches.
     '''
 
-    lines = fetch_lines()
+    if lines is None:
+        lines = fetch_lines()
 
-    stretches = pd.DataFrame()
+    stretches, failures = urbs.map_lines(
+        function=fetch_stretch,
+        line_numbers=lines['line_number'].to_list(),
+        max_workers=max_workers
+    )
+
+    if len(failures) > 0:
+        print(f'Stretch requests have failed for {len(failures)} out of {lines.shape[0]} lines: {failures}')
+
+    if len(stretches) == 0:
+        return None
 
-    for index, row in lines.iterrows():
-        stretches = pd.concat(
-            objs=[
-                stretches,
-                fetch_stretch(line_number=row['line_number'])
-            ]
-        )
+    stretches = pd.concat(objs=stretches)
 
     return stretches
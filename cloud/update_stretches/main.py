@@ -1,6 +1,10 @@
 from update import update_stretches
+from archive import flush_archive
 import functions_framework
 
 @functions_framework.cloud_event
 def update_stretches_entry_point(cloud_event):
-    update_stretches()
+    try:
+        update_stretches(incremental=True)
+    finally:
+        flush_archive()
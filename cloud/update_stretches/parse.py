@@ -0,0 +1,106 @@
+import pandas as pd
+
+# Function: parse_stretch
+
+
+def parse_stretch(r_json: list) -> pd.DataFrame:
+    '''
+    Parse a getTrechosItinerarios payload into the stretch of a route.
+
+    Args:
+        r_json (list): The decoded getTrechosItinerarios payload.
+
+    Returns:
+        pd.DataFrame: The stretch of the route.
+    '''
+
+    # 1. Format data.
+
+    # Points are flattened into a single frame in one pass.
+    stretch = pd.json_normalize(data=r_json)
+
+    stretch.rename(
+        mapper={
+            'COD_LINHA': 'line_number',
+            'NOME_LINHA': 'line_name_original',
+            'COD_CATEGORIA': 'service_category_code',
+            'NOME_CATEGORIA': 'service_category',
+            'COD_EMPRESA': 'company_code',
+            'NOME_EMPRESA': 'company',
+            'COD_PTO_PARADA_TH': 'stop_code_timetable',
+            'NOME_PTO_PARADA_TH': 'stop_name_timetable',
+            'SEQ_PTO_ITI_TH': 'order_itinerary',
+            'COD_ITINERARIO': 'itinerary_code',
+            'NOME_ITINERARIO': 'itinerary',
+            'PTO_ESPECIAL': 'special_stop',
+            'COD_PTO_TRECHO_A': 'point_code_stretch_start',
+            'SEQ_PONTO_TRECHO_A': 'point_order_start',
+            'COD_PTO_TRECHO_B': 'point_code_strech_end',
+            'SEQ_PONTO_TRECHO_B': 'point_order_end',
+            'EXTENSAO_TRECHO_A_ATE_B': 'distance_start_to_end',
+            'TIPO_TRECHO': 'stretch_type',
+            'STOP_CODE': 'stop_code',
+            'STOP_NAME': 'stop_name',
+            'CODIGO_URBS': 'urbs_code'
+        },
+        axis=1,
+        inplace=True
+    )
+
+    stretch['distance_start_to_end'] = stretch['distance_start_to_end'].str.replace(',', '.')
+
+    stretch = stretch.astype(
+        dtype={
+            'line_number': str,
+            'line_name_original': str,
+            'service_category_code': str,
+            'service_category': str,
+            'company_code': str,
+            'company': str,
+            'stop_code_timetable': str,
+            'stop_name_timetable': str,
+            'order_itinerary': str,
+            'itinerary_code': str,
+            'itinerary': str,
+            'special_stop': str,
+            'point_code_stretch_start': str,
+            'point_order_start': str,
+            'point_code_strech_end': str,
+            'point_order_end': str,
+            'distance_start_to_end': float,
+            'stretch_type': str,
+            'stop_code': str,
+            'stop_name': str,
+            'urbs_code': str
+        }
+    )
+
+    stretch = stretch[
+        [
+            'line_number',
+            'line_name_original',
+            'service_category_code',
+            'service_category',
+            'company_code',
+            'company',
+            'stop_code_timetable',
+            'stop_name_timetable',
+            'order_itinerary',
+            'itinerary_code',
+            'itinerary',
+            'special_stop',
+            'point_code_stretch_start',
+            'point_order_start',
+            'point_code_strech_end',
+            'point_order_end',
+            'distance_start_to_end',
+            'stretch_type',
+            'stop_code',
+            'stop_name',
+            'urbs_code'
+        ]
+    ]
+
+    # 2. Return data.
+
+    return stretch
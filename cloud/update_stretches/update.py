@@ -1,155 +1,173 @@
 from google.cloud import bigquery
 import pandas as pd
-from fetch import fetch_stretches
+from fetch import fetch_lines, fetch_stretches
+from clients import get_bigquery_client, get_table_id
+from incremental import update_incrementally
 
-# Construct a BigQuery client object.
-client = bigquery.Client()
-
-# Set table_id to the ID of the table to create.
-table_id = f'{client.project}.routes.stretches'
+schema = [
+    bigquery.SchemaField(
+        name='line_number',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The line number.'
+    ),
+    bigquery.SchemaField(
+        name='line_name_original',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The original line name.'
+    ),
+    bigquery.SchemaField(
+        name='service_category_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The service category code.'
+    ),
+    bigquery.SchemaField(
+        name='service_category',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The service category name.'
+    ),
+    bigquery.SchemaField(
+        name='company_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The code of the company operating the line.'
+    ),
+    bigquery.SchemaField(
+        name='company',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The code of the company operating the line.'
+    ),
+    bigquery.SchemaField(
+        name='stop_code_timetable',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop code in the timetable.'
+    ),
+    bigquery.SchemaField(
+        name='stop_name_timetable',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop name in the timetable.'
+    ),
+    bigquery.SchemaField(
+        name='order_itinerary',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The order of the stop in the itinerary.'
+    ),
+    bigquery.SchemaField(
+        name='itinerary_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The itinerary code.'
+    ),
+    bigquery.SchemaField(
+        name='itinerary',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The itinerary name.'
+    ),
+    bigquery.SchemaField(
+        name='special_stop',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='S = yes; N = no.'
+    ),
+    bigquery.SchemaField(
+        name='point_code_stretch_start',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop code at the start of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='point_order_start',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop order at the start of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='point_code_strech_end',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop code at the end of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='point_order_end',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stop order at the end of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='distance_start_to_end',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The distance from the start to the end of the stretch.'
+    ),
+    bigquery.SchemaField(
+        name='stretch_type',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The stretch type.'
+    ),
+    bigquery.SchemaField(
+        name='stop_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The unique stop code.'
+    ),
+    bigquery.SchemaField(
+        name='stop_name',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The unique stop name.'
+    ),
+    bigquery.SchemaField(
+        name='urbs_code',
+        field_type='STRING',
+        mode='REQUIRED',
+        description='The internal stop code.'
+    )
+]
 
 # Function: update_stretches
 
-def update_stretches():
+def update_stretches(incremental: bool = False) -> list:
     """
     Update table containing stretches.
+
+    If incremental is True, only the rows of lines whose content has
+    changed are rewritten, and the changed line numbers are returned.
     """
+    client = get_bigquery_client()
+    table_id = get_table_id(table='routes.stretches')
+
     # Fetch stretches.
 
-    stretches = fetch_stretches()
+    lines = fetch_lines()
+    stretches = fetch_stretches(lines=lines)
+
+    if stretches is not None and incremental:
+        # Replace the rows of changed lines only.
+
+        return update_incrementally(
+            data=stretches,
+            line_numbers=lines['line_number'].to_list(),
+            table_id=table_id,
+            job_config_options={
+                'autodetect': False,
+                'source_format': bigquery.SourceFormat.CSV
+            }
+        )
 
     if stretches is not None:
         # Set configuration options for load job.
 
         job_config = bigquery.LoadJobConfig(
-            schema = [
-                bigquery.SchemaField(
-                    name='line_number',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The line number.'
-                ),
-                bigquery.SchemaField(
-                    name='line_name_original',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The original line name.'
-                ),
-                bigquery.SchemaField(
-                    name='service_category_code',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The service category code.'
-                ),
-                bigquery.SchemaField(
-                    name='service_category',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The service category name.'
-                ),
-                bigquery.SchemaField(
-                    name='company_code',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The code of the company operating the line.'
-                ),
-                bigquery.SchemaField(
-                    name='company',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The code of the company operating the line.'
-                ),
-                bigquery.SchemaField(
-                    name='stop_code_timetable',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop code in the timetable.'
-                ),
-                bigquery.SchemaField(
-                    name='stop_name_timetable',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop name in the timetable.'
-                ),
-                bigquery.SchemaField(
-                    name='order_itinerary',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The order of the stop in the itinerary.'
-                ),
-                bigquery.SchemaField(
-                    name='itinerary_code',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The itinerary code.'
-                ),
-                bigquery.SchemaField(
-                    name='itinerary',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The itinerary name.'
-                ),
-                bigquery.SchemaField(
-                    name='special_stop',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='S = yes; N = no.'
-                ),
-                bigquery.SchemaField(
-                    name='point_code_stretch_start',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop code at the start of the stretch.'
-                ),
-                bigquery.SchemaField(
-                    name='point_order_start',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop order at the start of the stretch.'
-                ),
-                bigquery.SchemaField(
-                    name='point_code_strech_end',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop code at the end of the stretch.'
-                ),
-                bigquery.SchemaField(
-                    name='point_order_end',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stop order at the end of the stretch.'
-                ),
-                bigquery.SchemaField(
-                    name='distance_start_to_end',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The distance from the start to the end of the stretch.'
-                ),
-                bigquery.SchemaField(
-                    name='stretch_type',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The stretch type.'
-                ),
-                bigquery.SchemaField(
-                    name='stop_code',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The unique stop code.'
-                ),
-                bigquery.SchemaField(
-                    name='stop_name',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The unique stop name.'
-                ),
-                bigquery.SchemaField(
-                    name='urbs_code',
-                    field_type='STRING',
-                    mode='REQUIRED',
-                    description='The internal stop code.'
-                )
-            ],
+            schema=schema,
             autodetect=False,
             source_format=bigquery.SourceFormat.CSV,
             write_disposition='WRITE_TRUNCATE',
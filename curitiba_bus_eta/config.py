@@ -0,0 +1,26 @@
+"""Paths and settings shared across the package."""
+
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file, if there is one.
+load_dotenv()
+
+# Paths
+PROJ_ROOT = Path(__file__).resolve().parents[1]
+
+DATA_DIR = PROJ_ROOT / "data"
+RAW_DATA_DIR = DATA_DIR / "raw"
+INTERIM_DATA_DIR = DATA_DIR / "interim"
+PROCESSED_DATA_DIR = DATA_DIR / "processed"
+EXTERNAL_DATA_DIR = DATA_DIR / "external"
+
+MODELS_DIR = PROJ_ROOT / "models"
+
+# The Google Cloud project holding the BigQuery datasets, by default that of the credentials.
+GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
+
+# The time zone of Curitiba, used for dates and times of day.
+TIMEZONE = "America/Sao_Paulo"
@@ -0,0 +1,476 @@
+"""Incremental export of the BigQuery tables into a local Parquet dataset."""
+
+import argparse
+import datetime as dt
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from curitiba_bus_eta.config import GOOGLE_CLOUD_PROJECT, RAW_DATA_DIR, TIMEZONE
+
+# Tables exported in full at every run, partitioned by line.
+REFERENCE_TABLES = {
+    "stops": "routes.stops",
+    "routes": "routes.routes",
+    "stretches": "routes.stretches",
+    "routes_unified": "routes.routes_unified",
+}
+
+# The table exported incrementally, partitioned by date and line. In BigQuery, it is partitioned
+# by day of update_datetime, so that reading a window only scans the days it spans.
+LOCATIONS_TABLE = "locations.locations"
+
+# The columns of the locations table, as in BigQuery. Every page is cast to it before it is
+# written, since a nullable column with no values in a page would otherwise get the null type.
+LOCATIONS_SCHEMA = pa.schema(
+    [
+        pa.field("fleet_number", pa.string(), nullable=False),
+        pa.field("update_datetime", pa.timestamp("ns", tz="UTC"), nullable=False),
+        pa.field("latitude", pa.float64(), nullable=False),
+        pa.field("longitude", pa.float64(), nullable=False),
+        pa.field("line_number", pa.string(), nullable=False),
+        pa.field("wheelchair_accessibility", pa.int64()),
+        pa.field("bus_type", pa.string()),
+        pa.field("timetable", pa.int64()),
+        pa.field("status_time", pa.string()),
+        pa.field("status_route", pa.string()),
+        pa.field("direction", pa.string()),
+        pa.field("cycle_count", pa.int64(), nullable=False),
+        pa.field("destination", pa.string()),
+    ]
+)
+
+
+class BigQueryBackend:
+    """
+    Read the tables of the project from BigQuery.
+
+    Parameters
+    ----------
+    project : str, optional
+        The Google Cloud project, by default that of the environment or credentials.
+    page_size : int, optional
+        The number of rows per page of streamed results, by default 100000.
+    """
+
+    def __init__(self, project: str = GOOGLE_CLOUD_PROJECT, page_size: int = 100000):
+        from google.cloud import bigquery
+
+        self.bigquery = bigquery
+        self.client = bigquery.Client(project=project)
+        self.page_size = page_size
+
+    def _get_table_id(self, table: str) -> str:
+        return f"{self.client.project}.{table}"
+
+    def read_table(self, table: str) -> pd.DataFrame:
+        """
+        Read a whole table.
+
+        Parameters
+        ----------
+        table : str
+            The table, as dataset.table.
+
+        Returns
+        -------
+        pd.DataFrame
+            The rows of the table.
+        """
+
+        return self.client.list_rows(self._get_table_id(table)).to_dataframe()
+
+    def get_minimum(self, table: str, column: str) -> pd.Timestamp:
+        """
+        Get the earliest value of a timestamp column.
+
+        Parameters
+        ----------
+        table : str
+            The table, as dataset.table.
+        column : str
+            The timestamp column.
+
+        Returns
+        -------
+        pd.Timestamp
+            The earliest value, or None if the table is empty.
+        """
+
+        query = f"SELECT MIN(`{column}`) AS minimum FROM `{self._get_table_id(table)}`"
+        minimum = self.client.query(query).to_dataframe()["minimum"].iloc[0]
+
+        return None if pd.isna(minimum) else pd.Timestamp(minimum)
+
+    def read_pages(self, table: str, column: str, start: pd.Timestamp, end: pd.Timestamp):
+        """
+        Stream the rows of a table within a time window, one page at a time.
+
+        Parameters
+        ----------
+        table : str
+            The table, as dataset.table.
+        column : str
+            The timestamp column the window applies to.
+        start, end : pd.Timestamp
+            The exclusive start and inclusive end of the window.
+
+        Yields
+        ------
+        pd.DataFrame
+            Pages of at most `page_size` rows, in no particular order.
+        """
+
+        query = (
+            f"SELECT * FROM `{self._get_table_id(table)}` "
+            f"WHERE `{column}` > @start AND `{column}` <= @end"
+        )
+
+        job_config = self.bigquery.QueryJobConfig(
+            query_parameters=[
+                self.bigquery.ScalarQueryParameter("start", "TIMESTAMP", start.to_pydatetime()),
+                self.bigquery.ScalarQueryParameter("end", "TIMESTAMP", end.to_pydatetime()),
+            ]
+        )
+
+        rows = self.client.query(query, job_config=job_config).result(page_size=self.page_size)
+
+        yield from rows.to_dataframe_iterable()
+
+
+class LocalBackend:
+    """
+    Read tables from local Parquet files, as a stand-in for BigQuery.
+
+    Each table is a Parquet file, or directory, named after it, e.g.
+    `locations.locations.parquet`.
+
+    Parameters
+    ----------
+    path : str
+        The directory holding the tables.
+    page_size : int, optional
+        The number of rows per page of streamed results, by default 100000.
+    """
+
+    def __init__(self, path: str, page_size: int = 100000):
+        self.path = Path(path)
+        self.page_size = page_size
+
+    def _get_file(self, table: str) -> Path:
+        return self.path / f"{table}.parquet"
+
+    def read_table(self, table: str) -> pd.DataFrame:
+        """
+        Read a whole table, as `BigQueryBackend.read_table`.
+        """
+
+        return pd.read_parquet(self._get_file(table))
+
+    def get_minimum(self, table: str, column: str) -> pd.Timestamp:
+        """
+        Get the earliest value of a timestamp column, as `BigQueryBackend.get_minimum`.
+        """
+
+        values = pd.read_parquet(self._get_file(table), columns=[column])[column]
+
+        return None if values.isna().all() else pd.Timestamp(values.min())
+
+    def read_pages(self, table: str, column: str, start: pd.Timestamp, end: pd.Timestamp):
+        """
+        Stream the rows of a table within a time window, as `BigQueryBackend.read_pages`.
+        """
+
+        rows = pd.read_parquet(
+            self._get_file(table), filters=[(column, ">", start), (column, "<=", end)]
+        )
+
+        for offset in range(0, rows.shape[0], self.page_size):
+            yield rows.iloc[offset : offset + self.page_size]
+
+
+def read_state(path: Path) -> dict:
+    """
+    Read the export state of a dataset.
+
+    Parameters
+    ----------
+    path : Path
+        The directory of the dataset.
+
+    Returns
+    -------
+    dict
+        The state, empty if the dataset has never been exported.
+    """
+
+    if not (path / "state.json").exists():
+        return {}
+
+    with open(path / "state.json") as file:
+        return json.load(file)
+
+
+def write_state(path: Path, state: dict):
+    """
+    Replace the export state of a dataset atomically.
+
+    Parameters
+    ----------
+    path : Path
+        The directory of the dataset.
+    state : dict
+        The state.
+    """
+
+    with open(path / "state.json.tmp", "w") as file:
+        json.dump(state, file, indent=2)
+
+    os.replace(path / "state.json.tmp", path / "state.json")
+
+
+def export_reference_table(backend, name: str, path: Path) -> int:
+    """
+    Export a whole reference table, partitioned by line, replacing its previous export.
+
+    Parameters
+    ----------
+    backend : BigQueryBackend or LocalBackend
+        The backend to read from.
+    name : str
+        The name of the table, a key of `REFERENCE_TABLES`.
+    path : Path
+        The directory of the dataset.
+
+    Returns
+    -------
+    int
+        The number of rows exported.
+    """
+
+    data = backend.read_table(REFERENCE_TABLES[name])
+
+    target = path / name
+    temporary = path / f"{name}.tmp"
+    previous = path / f"{name}.old"
+
+    for directory in (temporary, previous):
+        shutil.rmtree(directory, ignore_errors=True)
+
+    data.to_parquet(temporary, partition_cols=["line_number"], index=False)
+
+    # Swap the new export in.
+    if target.exists():
+        os.replace(target, previous)
+
+    os.replace(temporary, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    return data.shape[0]
+
+
+def export_locations_window(backend, path: Path, start: pd.Timestamp, end: pd.Timestamp) -> int:
+    """
+    Export the locations updated within a time window, partitioned by local date and line.
+
+    Pages are appended as they arrive to one file per partition, named after the start of the
+    window, so that at most a page is held in memory and exporting a window again overwrites
+    the files of an interrupted attempt. Every file has the columns of `LOCATIONS_SCHEMA` but
+    line_number, whatever the values of its first page.
+
+    Parameters
+    ----------
+    backend : BigQueryBackend or LocalBackend
+        The backend to read from.
+    path : Path
+        The directory of the locations export.
+    start, end : pd.Timestamp
+        The exclusive start and inclusive end of the window of update_datetime.
+
+    Returns
+    -------
+    int
+        The number of rows exported.
+    """
+
+    file_name = f"part-{start.tz_convert('UTC'):%Y%m%dT%H%M%S%fZ}.parquet"
+    schema = LOCATIONS_SCHEMA.remove(LOCATIONS_SCHEMA.get_field_index("line_number"))
+    writers = {}
+    rows = 0
+
+    try:
+        for page in backend.read_pages(LOCATIONS_TABLE, "update_datetime", start, end):
+            dates = (
+                pd.to_datetime(page["update_datetime"], utc=True)
+                .dt.tz_convert(TIMEZONE)
+                .dt.strftime("%Y-%m-%d")
+            )
+
+            for (date, line_number), group in page.groupby(
+                [dates.to_numpy(), page["line_number"].astype(str).to_numpy()], sort=False
+            ):
+                table = pa.Table.from_pandas(group, preserve_index=False)
+                table = table.select(schema.names).cast(schema)
+
+                if (date, line_number) not in writers:
+                    directory = path / f"date={date}" / f"line_number={line_number}"
+                    directory.mkdir(parents=True, exist_ok=True)
+
+                    writers[date, line_number] = pq.ParquetWriter(directory / file_name, schema)
+
+                writers[date, line_number].write_table(table)
+
+            rows += page.shape[0]
+
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return rows
+
+
+def export_dataset(
+    backend,
+    path: Path = RAW_DATA_DIR,
+    tables: list = None,
+    settle: dt.timedelta = dt.timedelta(minutes=15),
+    window: dt.timedelta = dt.timedelta(days=1),
+    now: pd.Timestamp = None,
+) -> dict:
+    """
+    Bring a local Parquet dataset up to date with the tables of the project.
+
+    Reference tables are exported in full. Locations are exported incrementally: each run
+    only fetches rows whose update_datetime lies after the high-water mark recorded in
+    state.json by the previous run, up to `settle` before now, so that late rows are not
+    skipped. They are fetched one window at a time, each read scanning only the daily
+    partitions of locations.locations the window spans, and the mark is advanced after each
+    window.
+
+    Parameters
+    ----------
+    backend : BigQueryBackend or LocalBackend
+        The backend to read from.
+    path : Path, optional
+        The directory of the dataset, by default data/raw.
+    tables : list, optional
+        The tables to export, among the keys of `REFERENCE_TABLES` and "locations", by default
+        all of them.
+    settle : dt.timedelta, optional
+        The time given to rows to land before they are exported, by default 15 minutes.
+    window : dt.timedelta, optional
+        The span of update_datetime fetched at a time, by default a day.
+    now : pd.Timestamp, optional
+        The current time, by default the system time.
+
+    Returns
+    -------
+    dict
+        The number of rows exported per table.
+    """
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    tables = list(REFERENCE_TABLES) + ["locations"] if tables is None else tables
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+
+    state = read_state(path)
+    rows = {}
+
+    for name in tables:
+        if name == "locations":
+            continue
+
+        rows[name] = export_reference_table(backend, name, path)
+        state[name] = {"exported_datetime": now.isoformat(), "rows": rows[name]}
+        write_state(path, state)
+
+        print(f"Exported {rows[name]} rows of {REFERENCE_TABLES[name]}.")
+
+    if "locations" not in tables:
+        return rows
+
+    rows["locations"] = 0
+
+    end = now - settle
+    mark = state.get("locations", {}).get("high_water_mark")
+
+    if mark is not None:
+        start = pd.Timestamp(mark)
+
+    else:
+        minimum = backend.get_minimum(LOCATIONS_TABLE, "update_datetime")
+        start = None if minimum is None else minimum - pd.Timedelta(microseconds=1)
+
+    while start is not None and start < end:
+        stop = min(start + window, end)
+
+        rows["locations"] += export_locations_window(backend, path / "locations", start, stop)
+
+        state["locations"] = {"high_water_mark": stop.isoformat()}
+        write_state(path, state)
+
+        start = stop
+
+    print(f"Exported {rows['locations']} rows of {LOCATIONS_TABLE}.")
+
+    return rows
+
+
+def read_dataset_table(name: str, path: Path = RAW_DATA_DIR, filters: list = None) -> pd.DataFrame:
+    """
+    Read an exported table, keeping its partition keys as strings.
+
+    Parameters
+    ----------
+    name : str
+        The name of the table, a key of `REFERENCE_TABLES` or "locations".
+    path : Path, optional
+        The directory of the dataset, by default data/raw.
+    filters : list, optional
+        Filters on columns, including the partition keys date and line_number, e.g.
+        [("date", ">=", "2024-06-01"), ("line_number", "in", ["216", "303"])], so that only
+        the matching partitions are read, by default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        The rows of the table.
+    """
+
+    keys = [("date", pa.string()), ("line_number", pa.string())]
+    partitioning = ds.partitioning(
+        pa.schema(keys if name == "locations" else keys[1:]), flavor="hive"
+    )
+
+    return pd.read_parquet(Path(path) / name, partitioning=partitioning, filters=filters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--path", default=RAW_DATA_DIR, type=Path, help="The directory of the dataset."
+    )
+    parser.add_argument(
+        "--local", help="Read tables from Parquet files in this directory instead of BigQuery."
+    )
+    parser.add_argument(
+        "--tables", nargs="+", choices=list(REFERENCE_TABLES) + ["locations"], default=None
+    )
+
+    args = parser.parse_args()
+
+    backend = LocalBackend(args.local) if args.local else BigQueryBackend()
+
+    export_dataset(backend, path=args.path, tables=args.tables)
+
+
+if __name__ == "__main__":
+    main()
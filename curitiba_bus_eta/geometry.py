@@ -0,0 +1,162 @@
+"""Array geometry on a local metric projection of latitude and longitude."""
+
+import numpy as np
+
+# Mean Earth radius, in meters.
+EARTH_RADIUS = 6371008.8
+
+
+def get_origin(coordinates: np.ndarray) -> np.ndarray:
+    """
+    Get the origin of a local projection suited to a set of coordinates.
+
+    Parameters
+    ----------
+    coordinates : np.ndarray
+        Array of shape (..., 2) holding (latitude, longitude) pairs.
+
+    Returns
+    -------
+    np.ndarray
+        The mean (latitude, longitude) of the coordinates.
+    """
+
+    return np.asarray(coordinates, dtype=float).reshape(-1, 2).mean(axis=0)
+
+
+def project(coordinates: np.ndarray, origin: np.ndarray) -> np.ndarray:
+    """
+    Project coordinates onto a local equirectangular plane centred at an origin.
+
+    Within the extent of a city, the distortion of distances is well below the accuracy of GPS
+    fixes.
+
+    Parameters
+    ----------
+    coordinates : np.ndarray
+        Array of shape (..., 2) holding (latitude, longitude) pairs.
+    origin : np.ndarray
+        The (latitude, longitude) of the origin, e.g. output by `get_origin`.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (..., 2) holding (x, y) pairs, in meters, where x points east and y
+        points north.
+    """
+
+    coordinates = np.radians(np.asarray(coordinates, dtype=float))
+    origin = np.radians(np.asarray(origin, dtype=float))
+
+    x = EARTH_RADIUS * (coordinates[..., 1] - origin[1]) * np.cos(origin[0])
+    y = EARTH_RADIUS * (coordinates[..., 0] - origin[0])
+
+    return np.stack([x, y], axis=-1)
+
+
+def haversine(P: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    """
+    Calculate great-circle distances between points, elementwise and with broadcasting.
+
+    Parameters
+    ----------
+    P, Q : np.ndarray
+        Arrays of shape (..., 2) holding (latitude, longitude) pairs.
+
+    Returns
+    -------
+    np.ndarray
+        The distances, in meters.
+    """
+
+    P = np.radians(np.asarray(P, dtype=float))
+    Q = np.radians(np.asarray(Q, dtype=float))
+
+    d = (
+        np.sin((Q[..., 0] - P[..., 0]) / 2) ** 2
+        + np.cos(P[..., 0]) * np.cos(Q[..., 0]) * np.sin((Q[..., 1] - P[..., 1]) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(d))
+
+
+def segment_parameters(A: np.ndarray, B: np.ndarray, P: np.ndarray) -> np.ndarray:
+    """
+    Calculate the parameter of the closest point to P on the segment from A to B.
+
+    The closest point is A + t (B - A), with t clamped to [0, 1]. Degenerate segments, where A
+    and B coincide, get t = 0.
+
+    Parameters
+    ----------
+    A, B : np.ndarray
+        Arrays of shape (..., 2) holding the projected segment starts and ends.
+    P : np.ndarray
+        Array of shape (..., 2) holding the projected points.
+
+    Returns
+    -------
+    np.ndarray
+        The clamped parameters, broadcast over A, B and P.
+    """
+
+    AB = B - A
+    squared_lengths = np.sum(AB * AB, axis=-1)
+
+    t = np.divide(
+        np.sum((P - A) * AB, axis=-1),
+        squared_lengths,
+        out=np.zeros(np.broadcast_shapes(P.shape[:-1], squared_lengths.shape)),
+        where=squared_lengths > 0,
+    )
+
+    return np.clip(t, 0, 1)
+
+
+def distances_to_segments(A: np.ndarray, B: np.ndarray, P: np.ndarray) -> tuple:
+    """
+    Calculate signed distances from points to segments, elementwise and with broadcasting.
+
+    Parameters
+    ----------
+    A, B : np.ndarray
+        Arrays of shape (..., 2) holding the projected segment starts and ends.
+    P : np.ndarray
+        Array of shape (..., 2) holding the projected points.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The distances, in meters, signed positive when P lies to the left of the direction from
+        A to B, and the clamped segment parameters.
+    """
+
+    t = segment_parameters(A, B, P)
+
+    AB = B - A
+    D = P - (A + t[..., np.newaxis] * AB)
+
+    distances = np.linalg.norm(D, axis=-1)
+    sides = np.sign(AB[..., 0] * D[..., 1] - AB[..., 1] * D[..., 0])
+
+    return np.where(sides < 0, -distances, distances), t
+
+
+def bearings(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Calculate the bearings of projected segments.
+
+    Parameters
+    ----------
+    A, B : np.ndarray
+        Arrays of shape (..., 2) holding the projected segment starts and ends.
+
+    Returns
+    -------
+    np.ndarray
+        The bearings, in degrees clockwise from north, within [0, 360).
+    """
+
+    AB = B - A
+
+    return np.degrees(np.arctan2(AB[..., 0], AB[..., 1])) % 360
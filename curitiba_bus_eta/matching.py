@@ -0,0 +1,284 @@
+"""Map-matching of vehicle locations onto the unified routes of their lines."""
+
+import numpy as np
+import pandas as pd
+
+from curitiba_bus_eta.geometry import distances_to_segments, get_origin, project
+from curitiba_bus_eta.routes import encode
+
+
+class SegmentGrid:
+    """
+    A uniform grid over projected segments, stored in compressed sparse row form.
+
+    Each segment is registered in every cell of its group that its bounding box overlaps, so
+    that lookups only return segments of the group of each point. Candidate lookups for a batch
+    of points take a fixed number of binary searches per point for a given radius,
+    independently of the number of segments.
+
+    Parameters
+    ----------
+    A, B : np.ndarray
+        Arrays of shape (n, 2) holding the projected segment starts and ends.
+    groups : np.ndarray
+        Array of shape (n,) holding the non-negative group, e.g. the line, of each segment.
+    cell_size : float, optional
+        The side of each cell, in meters, by default 100.
+    """
+
+    def __init__(self, A: np.ndarray, B: np.ndarray, groups: np.ndarray, cell_size: float = 100.0):
+        self.cell_size = cell_size
+
+        lower = np.floor(np.minimum(A, B) / cell_size).astype(np.int64)
+        upper = np.floor(np.maximum(A, B) / cell_size).astype(np.int64)
+
+        self.lower = lower.min(axis=0) if len(lower) > 0 else np.zeros(2, dtype=np.int64)
+        self.n_columns = int(upper[:, 0].max() - self.lower[0] + 1) if len(upper) > 0 else 1
+        self.n_rows = int(upper[:, 1].max() - self.lower[1] + 1) if len(upper) > 0 else 1
+
+        # Enumerate the (segment, cell) pairs.
+        spans = upper - lower + 1
+        counts = spans[:, 0] * spans[:, 1]
+
+        segment_ids = np.repeat(np.arange(len(A)), counts)
+        ranks = np.arange(len(segment_ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        keys = self._keys(
+            lower[segment_ids, 0] + ranks // spans[segment_ids, 1],
+            lower[segment_ids, 1] + ranks % spans[segment_ids, 1],
+            groups[segment_ids],
+        )
+
+        # Group the pairs by cell.
+        order = np.lexsort((segment_ids, keys))
+
+        self.cell_keys, cell_starts = np.unique(keys[order], return_index=True)
+        self.cell_starts = np.append(cell_starts, len(order))
+        self.segment_ids = segment_ids[order]
+
+    def _keys(self, cells_x: np.ndarray, cells_y: np.ndarray, groups: np.ndarray) -> np.ndarray:
+        columns = cells_x - self.lower[0]
+        rows = cells_y - self.lower[1]
+        keys = (groups * self.n_columns + columns) * self.n_rows + rows
+
+        inside = (columns >= 0) & (columns < self.n_columns) & (rows >= 0) & (rows < self.n_rows)
+
+        return np.where(inside & (groups >= 0), keys, -1)
+
+    def candidates(self, P: np.ndarray, groups: np.ndarray, radius: float) -> tuple:
+        """
+        Find candidate segments of the same group within a radius of each point.
+
+        Every such segment within the radius of a point is returned, possibly along with farther
+        ones.
+
+        Parameters
+        ----------
+        P : np.ndarray
+            Array of shape (m, 2) holding the projected points.
+        groups : np.ndarray
+            Array of shape (m,) holding the group of each point, or -1 for none.
+        radius : float
+            The radius, in meters.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            The point and segment indices of each (point, candidate) pair.
+        """
+
+        if len(self.cell_keys) == 0 or len(P) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        lower = np.floor((P - radius) / self.cell_size).astype(np.int64)
+        width = int(np.ceil(2 * radius / self.cell_size)) + 1
+        steps_x, steps_y = np.divmod(np.arange(width * width), width)
+
+        keys = self._keys(
+            lower[:, [0]] + steps_x, lower[:, [1]] + steps_y, groups[:, np.newaxis]
+        ).ravel()
+
+        positions = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        found = self.cell_keys[positions] == keys
+
+        starts = np.where(found, self.cell_starts[positions], 0)
+        counts = np.where(found, self.cell_starts[positions + 1] - starts, 0)
+
+        point_ids = np.repeat(np.repeat(np.arange(len(P)), width * width), counts)
+        ranks = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        return point_ids, self.segment_ids[np.repeat(starts, counts) + ranks]
+
+
+class RouteMatcher:
+    """
+    Snap vehicle locations onto the unified routes of their lines.
+
+    The matcher is built once from `routes.routes_unified` and then matches any number of
+    batches. Each location is compared only with the nearby segments of its own line, found
+    through a `SegmentGrid` over the segments of all lines grouped by line.
+
+    Parameters
+    ----------
+    routes_unified : pd.DataFrame
+        Unified routes with columns line_number, order, latitude and longitude. If they have a
+        chainage column, chainages are interpolated from it, so that they are comparable with
+        those of `RouteTable`.
+    cell_size : float, optional
+        The side of each grid cell, in meters, by default 100.
+
+    Attributes
+    ----------
+    line_numbers : np.ndarray
+        The sorted line numbers covered by the matcher.
+    orders : np.ndarray
+        The order of each route point, grouped by line.
+    chainages : np.ndarray
+        The distance, in meters, from the start of its route to each route point.
+    segment_starts : np.ndarray
+        The index, into the route point arrays, of the start of each segment.
+    segment_lengths : np.ndarray
+        The length of each segment, in meters.
+    """
+
+    def __init__(self, routes_unified: pd.DataFrame, cell_size: float = 100.0):
+        routes = routes_unified.sort_values(["line_number", "order"], ignore_index=True)
+
+        self.line_numbers, line_codes = np.unique(
+            routes["line_number"].to_numpy(dtype=str), return_inverse=True
+        )
+        self.orders = routes["order"].to_numpy()
+
+        coordinates = routes[["latitude", "longitude"]].to_numpy(dtype=float)
+        self.origin = get_origin(coordinates)
+        points = project(coordinates, self.origin)
+
+        # Segments join consecutive points of the same line.
+        self.segment_starts = np.flatnonzero(line_codes[1:] == line_codes[:-1])
+        self.segment_lines = line_codes[self.segment_starts]
+
+        self.A = points[self.segment_starts]
+        self.B = points[self.segment_starts + 1]
+        self.segment_lengths = np.linalg.norm(self.B - self.A, axis=1)
+
+        # Chainage restarts at zero at the first point of each line.
+        if "chainage" in routes:
+            self.chainages = routes["chainage"].to_numpy(dtype=float)
+
+        else:
+            steps = np.zeros(len(points))
+            steps[self.segment_starts + 1] = self.segment_lengths
+            cumulative = np.cumsum(steps)
+
+            line_starts = np.searchsorted(line_codes, np.arange(len(self.line_numbers)))
+            self.chainages = cumulative - cumulative[line_starts][line_codes]
+
+        self.grid = SegmentGrid(self.A, self.B, self.segment_lines, cell_size=cell_size)
+
+    def match_arrays(
+        self,
+        line_numbers: np.ndarray,
+        coordinates: np.ndarray,
+        max_distance: float = 50.0,
+        chunk_size: int = 20000,
+    ) -> tuple:
+        """
+        Snap locations given as arrays onto the routes of their lines.
+
+        Parameters
+        ----------
+        line_numbers : np.ndarray
+            Array of shape (n,) holding the line number of each location.
+        coordinates : np.ndarray
+            Array of shape (n, 2) holding the (latitude, longitude) of each location.
+        max_distance : float, optional
+            The largest distance, in meters, between a location and its route for the location
+            to be matched, by default 50.
+        chunk_size : int, optional
+            The maximum number of locations matched at a time, by default 20000.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            The index of the matched segment (-1 if unmatched), the chainage, in meters, of the
+            snapped point, and the cross-track error, in meters, signed positive to the left of
+            the direction of travel along the route. Unmatched locations get NaN distances. Ties
+            between segments are resolved in favour of the earliest one along the route.
+        """
+
+        P = project(np.asarray(coordinates, dtype=float).reshape(-1, 2), self.origin)
+
+        # Locations on lines without a route get a code of -1, which never matches.
+        codes = encode(np.asarray(line_numbers, dtype=str), self.line_numbers)
+
+        segments = np.full(len(P), -1)
+        chainages = np.full(len(P), np.nan)
+        cross_tracks = np.full(len(P), np.nan)
+
+        for start in range(0, len(P), chunk_size):
+            chunk = P[start : start + chunk_size]
+            point_ids, segment_ids = self.grid.candidates(
+                chunk, codes[start : start + chunk_size], max_distance
+            )
+
+            distances, t = distances_to_segments(
+                self.A[segment_ids], self.B[segment_ids], chunk[point_ids]
+            )
+
+            within = np.abs(distances) <= max_distance
+            point_ids, segment_ids = point_ids[within], segment_ids[within]
+            distances, t = distances[within], t[within]
+
+            # Keep the closest, then earliest, candidate of each location.
+            order = np.lexsort((segment_ids, np.abs(distances), point_ids))
+            first = order[np.unique(point_ids[order], return_index=True)[1]]
+
+            matched = start + point_ids[first]
+            starts = self.segment_starts[segment_ids[first]]
+
+            segments[matched] = segment_ids[first]
+            chainages[matched] = self.chainages[starts] + t[first] * (
+                self.chainages[starts + 1] - self.chainages[starts]
+            )
+            cross_tracks[matched] = distances[first]
+
+        return segments, chainages, cross_tracks
+
+    def match(self, locations: pd.DataFrame, max_distance: float = 50.0) -> pd.DataFrame:
+        """
+        Snap a batch of locations onto the routes of their lines.
+
+        Parameters
+        ----------
+        locations : pd.DataFrame
+            Rows of `locations.locations`, with columns line_number, latitude and longitude.
+        max_distance : float, optional
+            The largest distance, in meters, between a location and its route for the location
+            to be matched, by default 50.
+
+        Returns
+        -------
+        pd.DataFrame
+            Indexed like locations, with columns segment_order (the order of the route point
+            starting the matched segment, or -1 if unmatched), chainage and cross_track, both in
+            meters and NaN if unmatched.
+        """
+
+        segments, chainages, cross_tracks = self.match_arrays(
+            locations["line_number"].to_numpy(dtype=str),
+            locations[["latitude", "longitude"]].to_numpy(dtype=float),
+            max_distance=max_distance,
+        )
+
+        matched = segments >= 0
+        segment_orders = np.full(len(segments), -1, dtype=np.int64)
+        segment_orders[matched] = self.orders[self.segment_starts[segments[matched]]]
+
+        return pd.DataFrame(
+            {
+                "segment_order": segment_orders,
+                "chainage": chainages,
+                "cross_track": cross_tracks,
+            },
+            index=locations.index,
+        )
@@ -0,0 +1,493 @@
+"""Historical travel-time profiles of the stop-to-stop segments of every line."""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from curitiba_bus_eta.config import TIMEZONE
+from curitiba_bus_eta.matching import RouteMatcher
+from curitiba_bus_eta.routes import RouteTable, encode
+
+# Day types: weekdays, Saturdays and Sundays.
+N_DAY_TYPES = 3
+
+# Time-of-day buckets of 15 minutes.
+BUCKET_MINUTES = 15
+N_BUCKETS = 24 * 60 // BUCKET_MINUTES
+
+
+def get_day_types_and_buckets(times: np.ndarray) -> tuple:
+    """
+    Get the day type and time-of-day bucket of times, in local time.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Array of shape (n,) holding times, in seconds since the epoch.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The day type of each time (0 for weekdays, 1 for Saturdays and 2 for Sundays) and its
+        bucket, counting 15-minute buckets from midnight.
+    """
+
+    local = pd.to_datetime(np.asarray(times, dtype=float), unit="s", utc=True).tz_convert(TIMEZONE)
+
+    day_types = np.clip(local.dayofweek.to_numpy() - 4, 0, N_DAY_TYPES - 1)
+    buckets = (local.hour.to_numpy() * 60 + local.minute.to_numpy()) // BUCKET_MINUTES
+
+    return day_types, buckets
+
+
+class ProfileStore:
+    """
+    Travel-time statistics per (line, segment, day type, 15-minute bucket), kept on disk.
+
+    Segment k of a line goes from the k-th to the (k + 1)-th occurrence of a stop along its
+    unified route, the last segment closing the loop back to the first stop. Segments of all
+    lines are numbered contiguously, those of line i from `segment_starts[i]` on.
+
+    The count, mean and sum of squared deviations of the traversal times of each cell are held
+    in arrays of shape (n_segments, 3, 96) saved as .npy files, which are memory-mapped, so that
+    looking a cell up is a single index computation. Statistics are updated incrementally with
+    Welford's method, batch by batch. Between batches, the last location and last stop crossing
+    of every vehicle seen are kept, so that traversals spanning two batches are counted once
+    and locations already added are not added again.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store, created if it does not exist.
+    routes : RouteTable
+        The routes the segments refer to. They must match those the store was created with.
+    readonly : bool, optional
+        Whether to open the statistics read-only, by default False.
+    max_gap : float, optional
+        The longest time, in seconds, between consecutive locations of a vehicle for its
+        movement between them to be trusted, by default 180.
+    max_speed : float, optional
+        The highest plausible speed, in meters per second, between consecutive locations, by
+        default 25.
+    """
+
+    statistics = {"count": np.uint32, "mean": np.float64, "m2": np.float64}
+
+    def __init__(
+        self,
+        path: str,
+        routes: RouteTable,
+        readonly: bool = False,
+        max_gap: float = 180.0,
+        max_speed: float = 25.0,
+    ):
+        self.path = path
+        self.routes = routes
+        self.max_gap = max_gap
+        self.max_speed = max_speed
+
+        # One segment per stop occurrence.
+        self.segment_starts = routes.line_stop_starts
+        self.n_segments = int(self.segment_starts[-1])
+
+        segment_lines = np.repeat(
+            np.arange(len(routes.line_numbers)), np.diff(self.segment_starts)
+        )
+        segment_ranks = np.arange(self.n_segments) - self.segment_starts[segment_lines]
+        stop_counts = np.diff(self.segment_starts)[segment_lines]
+
+        self.from_stop_numbers = routes.line_stop_numbers
+        self.to_stop_numbers = routes.line_stop_numbers[
+            self.segment_starts[segment_lines] + (segment_ranks + 1) % np.maximum(stop_counts, 1)
+        ]
+
+        # Stops are keyed by line and chainage, with lines a stride apart.
+        self.stride = 3 * routes.line_lengths.max() + 1 if len(routes.line_numbers) > 0 else 1.0
+        self.stop_keys = segment_lines * self.stride + routes.line_stop_chainages
+
+        # Stop crossings are found among the stops of two laps.
+        self.crossing_keys = np.concatenate(
+            [self.stop_keys, self.stop_keys + routes.line_lengths[segment_lines]]
+        )
+        self.crossing_ranks = np.concatenate([segment_ranks, segment_ranks])
+
+        order = np.argsort(self.crossing_keys, kind="stable")
+        self.crossing_keys = self.crossing_keys[order]
+        self.crossing_ranks = self.crossing_ranks[order]
+
+        self._open(readonly)
+
+    def _get_file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open(self, readonly: bool):
+        shape = (self.n_segments, N_DAY_TYPES, N_BUCKETS)
+        segments = {
+            "line_numbers": self.routes.line_numbers,
+            "segment_starts": self.segment_starts,
+            "from_stop_numbers": self.from_stop_numbers,
+            "to_stop_numbers": self.to_stop_numbers,
+        }
+
+        if not os.path.exists(self._get_file("segments.npz")):
+            if readonly:
+                raise FileNotFoundError(f"There is no profile store at {self.path}.")
+
+            os.makedirs(self.path, exist_ok=True)
+
+            for name, dtype in self.statistics.items():
+                np.lib.format.open_memmap(
+                    self._get_file(f"{name}.npy"), mode="w+", dtype=dtype, shape=shape
+                ).flush()
+
+            np.savez(self._get_file("segments.npz"), **segments)
+
+        with np.load(self._get_file("segments.npz")) as stored:
+            if any(not np.array_equal(stored[key], value) for key, value in segments.items()):
+                raise ValueError(
+                    f"The profile store at {self.path} was built for other routes; "
+                    "rebuild it into a new directory."
+                )
+
+        for name in self.statistics:
+            setattr(
+                self,
+                name,
+                np.load(self._get_file(f"{name}.npy"), mmap_mode="r" if readonly else "r+"),
+            )
+
+        if os.path.exists(self._get_file("vehicles.npz")):
+            with np.load(self._get_file("vehicles.npz")) as stored:
+                self.vehicles = dict(stored)
+
+        else:
+            self.vehicles = {
+                "fleet_numbers": np.empty(0, dtype=str),
+                "line_codes": np.empty(0, dtype=np.int64),
+                "chainages": np.empty(0),
+                "times": np.empty(0),
+                "crossing_ranks": np.empty(0, dtype=np.int64),
+                "crossing_times": np.empty(0),
+            }
+
+    def get_segments(self, line_codes: np.ndarray, chainages: np.ndarray) -> np.ndarray:
+        """
+        Find the segment each chainage falls on.
+
+        Parameters
+        ----------
+        line_codes : np.ndarray
+            Array of shape (n,) holding line codes, i.e. positions in `routes.line_numbers`.
+        chainages : np.ndarray
+            Array of shape (n,) holding chainages, in meters.
+
+        Returns
+        -------
+        np.ndarray
+            The segment of each chainage, or -1 if its line has no stops.
+        """
+
+        starts = self.segment_starts[line_codes]
+        ends = self.segment_starts[line_codes + 1]
+
+        positions = (
+            np.searchsorted(self.stop_keys, line_codes * self.stride + chainages, side="right") - 1
+        )
+
+        # Chainages before the first stop are on the segment closing the loop.
+        positions = np.where(positions < starts, ends - 1, positions)
+
+        return np.where(ends > starts, positions, -1)
+
+    def get_cells(self, segments: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Get the flat index of the cell of each (segment, time) pair.
+
+        Parameters
+        ----------
+        segments : np.ndarray
+            Array of shape (n,) holding segments.
+        times : np.ndarray
+            Array of shape (n,) holding times, in seconds since the epoch.
+
+        Returns
+        -------
+        np.ndarray
+            The flat indices into the statistics arrays.
+        """
+
+        day_types, buckets = get_day_types_and_buckets(times)
+
+        return (np.asarray(segments) * N_DAY_TYPES + day_types) * N_BUCKETS + buckets
+
+    def lookup(self, segments: np.ndarray, times: np.ndarray) -> tuple:
+        """
+        Look up the travel-time statistics of segments at times.
+
+        Parameters
+        ----------
+        segments : np.ndarray
+            Array of shape (n,) holding segments.
+        times : np.ndarray
+            Array of shape (n,) holding times, in seconds since the epoch.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            The number of traversals, and the mean and standard deviation of their durations,
+            in seconds, NaN for cells with no traversals.
+        """
+
+        cells = self.get_cells(segments, times)
+
+        counts = self.count.reshape(-1)[cells]
+        means = np.where(counts > 0, self.mean.reshape(-1)[cells], np.nan)
+        deviations = np.sqrt(
+            np.divide(
+                self.m2.reshape(-1)[cells],
+                counts - 1,
+                out=np.full(len(cells), np.nan),
+                where=counts > 1,
+            )
+        )
+
+        return counts, means, deviations
+
+    def update(self, pings: pd.DataFrame) -> int:
+        """
+        Add the traversals completed by a batch of matched locations to the statistics.
+
+        Each vehicle's stop crossings are interpolated between consecutive locations on the same
+        line no more than `max_gap` apart, and the time between crossings of consecutive stops
+        of a line is a traversal of the segment between them. The last location of every vehicle
+        seen is held, and locations no newer than it are ignored, so batches may overlap or be
+        run again. The statistics are flushed before the vehicle state is saved, so a batch
+        interrupted between the two may be counted twice if run again.
+
+        Parameters
+        ----------
+        pings : pd.DataFrame
+            Locations with columns fleet_number, line_number, update_datetime and chainage,
+            e.g. `locations.locations` joined with the output of `RouteMatcher.match`.
+
+        Returns
+        -------
+        int
+            The number of traversals added.
+        """
+
+        vehicles = self.vehicles
+
+        line_codes = encode(pings["line_number"].to_numpy(dtype=str), self.routes.line_numbers)
+        fleet_numbers = pings["fleet_number"].to_numpy(dtype=str)
+        chainages = pings["chainage"].to_numpy(dtype=float)
+        times = (
+            pd.to_datetime(pings["update_datetime"], utc=True) - pd.Timestamp(0, tz="UTC")
+        ) / pd.Timedelta(seconds=1)
+        times = times.to_numpy(dtype=float)
+
+        # Keep matched locations newer than the last one of their vehicle.
+        prior = pd.Index(vehicles["fleet_numbers"]).get_indexer(fleet_numbers)
+        prior_times = (
+            np.where(prior >= 0, vehicles["times"][prior], -np.inf)
+            if len(vehicles["times"]) > 0
+            else np.full(len(prior), -np.inf)
+        )
+        kept = (line_codes >= 0) & np.isfinite(chainages) & (times > prior_times)
+
+        # Sort the last locations of known vehicles and the new ones by vehicle and time.
+        n_vehicles = len(vehicles["fleet_numbers"])
+
+        F = np.concatenate([vehicles["fleet_numbers"], fleet_numbers[kept]])
+        L = np.concatenate([vehicles["line_codes"], line_codes[kept]])
+        C = np.concatenate([vehicles["chainages"], chainages[kept]])
+        T = np.concatenate([vehicles["times"], times[kept]])
+
+        order = np.lexsort((T, F))
+        F, L, C, T = F[order], L[order], C[order], T[order]
+
+        vehicle_positions = np.empty(len(order), dtype=np.int64)
+        vehicle_positions[order] = np.arange(len(order))
+        vehicle_positions = vehicle_positions[:n_vehicles]
+
+        # Runs are stretches of locations over which movement is trusted.
+        lengths = self.routes.line_lengths[L[:-1]]
+        elapsed = T[1:] - T[:-1]
+        advanced = np.mod(C[1:] - C[:-1], lengths)
+
+        trusted = (
+            (F[1:] == F[:-1])
+            & (L[1:] == L[:-1])
+            & (elapsed > 0)
+            & (elapsed <= self.max_gap)
+            & (advanced < lengths / 2)
+            & (advanced <= self.max_speed * elapsed)
+        )
+        runs = np.cumsum(np.concatenate([[True], ~trusted]))
+
+        # Interpolate stop crossings between consecutive trusted locations.
+        pairs = np.flatnonzero(trusted)
+        starts = L[pairs] * self.stride + C[pairs]
+
+        lower = np.searchsorted(self.crossing_keys, starts, side="right")
+        upper = np.searchsorted(self.crossing_keys, starts + advanced[pairs], side="right")
+        counts = upper - lower
+
+        crossings = np.repeat(lower, counts) + _ranks(counts)
+        pairs = np.repeat(pairs, counts)
+
+        crossing_runs = runs[pairs]
+        crossing_lines = L[pairs]
+        crossing_ranks = self.crossing_ranks[crossings]
+        crossing_times = T[pairs] + elapsed[pairs] * (
+            self.crossing_keys[crossings] - L[pairs] * self.stride - C[pairs]
+        ) / np.maximum(advanced[pairs], np.finfo(float).tiny)
+
+        # Prepend the last crossing of known vehicles, in the run of their last location.
+        crossed = vehicles["crossing_ranks"] >= 0
+
+        crossing_runs = np.concatenate([runs[vehicle_positions][crossed], crossing_runs])
+        crossing_lines = np.concatenate([vehicles["line_codes"][crossed], crossing_lines])
+        crossing_ranks = np.concatenate([vehicles["crossing_ranks"][crossed], crossing_ranks])
+        crossing_times = np.concatenate([vehicles["crossing_times"][crossed], crossing_times])
+
+        order = np.lexsort((crossing_times, crossing_runs))
+        crossing_runs = crossing_runs[order]
+        crossing_lines = crossing_lines[order]
+        crossing_ranks = crossing_ranks[order]
+        crossing_times = crossing_times[order]
+
+        # Traversals join crossings of consecutive stops within a run.
+        stop_counts = np.diff(self.segment_starts)[crossing_lines[:-1]]
+        traversed = (crossing_runs[1:] == crossing_runs[:-1]) & (
+            crossing_ranks[1:] == (crossing_ranks[:-1] + 1) % np.maximum(stop_counts, 1)
+        )
+
+        segments = (self.segment_starts[crossing_lines[:-1]] + crossing_ranks[:-1])[traversed]
+        entry_times = crossing_times[:-1][traversed]
+        durations = (crossing_times[1:] - crossing_times[:-1])[traversed]
+
+        self._add(self.get_cells(segments, entry_times), durations)
+
+        # Keep the last location of every vehicle, and its last crossing if in the same run.
+        # Vehicles that stopped reporting are kept too, so that their last time still filters
+        # their locations if a batch is run again; their runs end there, as later locations
+        # are more than `max_gap` away.
+        last = np.flatnonzero(np.append(F[1:] != F[:-1], len(F) > 0))
+
+        last_crossings = np.searchsorted(crossing_runs, runs[last], side="right") - 1
+        found = last_crossings >= 0
+        found[found] = crossing_runs[last_crossings[found]] == runs[last][found]
+
+        self.vehicles = {
+            "fleet_numbers": F[last],
+            "line_codes": L[last],
+            "chainages": C[last],
+            "times": T[last],
+            "crossing_ranks": np.where(found, crossing_ranks[last_crossings], -1),
+            "crossing_times": np.where(found, crossing_times[last_crossings], np.nan),
+        }
+
+        self.flush()
+
+        return int(len(durations))
+
+    def _add(self, cells: np.ndarray, durations: np.ndarray):
+        if len(cells) == 0:
+            return
+
+        # Statistics of the batch per cell.
+        cells, inverse = np.unique(cells, return_inverse=True)
+
+        batch_counts = np.bincount(inverse)
+        batch_means = np.bincount(inverse, weights=durations) / batch_counts
+        batch_m2 = np.bincount(inverse, weights=(durations - batch_means[inverse]) ** 2)
+
+        # Combine them with the stored statistics (Chan et al.'s form of Welford's update).
+        count = self.count.reshape(-1)
+        mean = self.mean.reshape(-1)
+        m2 = self.m2.reshape(-1)
+
+        counts = count[cells].astype(np.float64)
+        totals = counts + batch_counts
+        deltas = batch_means - mean[cells]
+
+        mean[cells] += deltas * batch_counts / totals
+        m2[cells] += batch_m2 + deltas**2 * counts * batch_counts / totals
+        count[cells] = totals
+
+    def flush(self):
+        """
+        Write the statistics and the vehicle state to disk.
+        """
+
+        for name in self.statistics:
+            getattr(self, name).flush()
+
+        temporary = self._get_file("vehicles.tmp.npz")
+        np.savez(temporary, **self.vehicles)
+        os.replace(temporary, self._get_file("vehicles.npz"))
+
+
+def _ranks(counts: np.ndarray) -> np.ndarray:
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def update_profiles(
+    path: str, routes_unified: pd.DataFrame, locations: pd.DataFrame, max_distance: float = 50.0
+) -> int:
+    """
+    Match a batch of historical locations onto their routes and add them to a profile store.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store, created if it does not exist.
+    routes_unified : pd.DataFrame
+        Unified routes with chainages, e.g. `routes.routes_unified`.
+    locations : pd.DataFrame
+        Locations with columns fleet_number, update_datetime, line_number, latitude and
+        longitude, e.g. rows of `locations.locations`.
+    max_distance : float, optional
+        The largest distance, in meters, between a location and its route for the location to
+        be used, by default 50.
+
+    Returns
+    -------
+    int
+        The number of traversals added.
+    """
+
+    store = ProfileStore(path, RouteTable(routes_unified))
+    matched = RouteMatcher(routes_unified).match(locations, max_distance=max_distance)
+
+    return store.update(locations.assign(chainage=matched["chainage"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("routes", help="A Parquet export of routes.routes_unified.")
+    parser.add_argument("store", help="The directory of the profile store.")
+    parser.add_argument(
+        "locations", nargs="+", help="Parquet files of locations, in chronological order."
+    )
+
+    args = parser.parse_args()
+
+    routes_unified = pd.read_parquet(args.routes)
+
+    store = ProfileStore(args.store, RouteTable(routes_unified))
+    matcher = RouteMatcher(routes_unified)
+
+    for path in args.locations:
+        locations = pd.read_parquet(path)
+        matched = matcher.match(locations)
+
+        added = store.update(locations.assign(chainage=matched["chainage"]))
+        print(f"Added {added} traversals from {path}.")
+
+
+if __name__ == "__main__":
+    main()
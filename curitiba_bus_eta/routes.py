@@ -0,0 +1,366 @@
+"""Linear referencing lookups over the unified routes of all lines."""
+
+import numpy as np
+import pandas as pd
+
+from curitiba_bus_eta.geometry import haversine
+
+
+def encode(values: np.ndarray, vocabulary: np.ndarray) -> np.ndarray:
+    """
+    Encode values as their positions in a sorted vocabulary.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The values to encode.
+    vocabulary : np.ndarray
+        The sorted, unique values that have a code.
+
+    Returns
+    -------
+    np.ndarray
+        The position of each value in the vocabulary, or -1 if it is not in it.
+    """
+
+    codes = np.full(len(values), -1)
+
+    if len(vocabulary) > 0:
+        positions = np.minimum(np.searchsorted(vocabulary, values), len(vocabulary) - 1)
+        known = vocabulary[positions] == values
+        codes[known] = positions[known]
+
+    return codes
+
+
+class RouteTable:
+    """
+    The unified routes of all lines held as contiguous arrays, for O(log n) lookups by chainage.
+
+    The points of all lines are sorted by line and order, so that the points of line i occupy
+    the positions from `line_starts[i]` to `line_starts[i + 1]`, and their chainages are
+    non-decreasing within each line. The stops of all lines are sorted by line, stop number and
+    chainage, with one entry per occurrence of a stop along its route.
+
+    Each unified route is treated as a loop: after its last point, a vehicle continues onto its
+    first point, the straight line between them closing the loop.
+
+    Parameters
+    ----------
+    routes_unified : pd.DataFrame
+        Unified routes with columns line_number, order, latitude, longitude, stop_number,
+        chainage, segment_length and bearing, e.g. `routes.routes_unified`.
+
+    Attributes
+    ----------
+    line_numbers : np.ndarray
+        The sorted line numbers covered by the table.
+    line_starts : np.ndarray
+        The position of the first point of each line, followed by the number of points.
+    line_lengths : np.ndarray
+        The length, in meters, of the loop of each line.
+    chainages, segment_lengths, bearings : np.ndarray
+        The attributes of each point, in meters and degrees clockwise from north.
+    line_stop_starts, line_stop_numbers, line_stop_chainages : np.ndarray
+        The stop numbers and chainages of the occurrences of stops along the route of each line,
+        in route order, those of line i being from `line_stop_starts[i]` to
+        `line_stop_starts[i + 1]`.
+    stop_numbers : np.ndarray
+        The sorted stop numbers of all lines.
+    stop_line_starts, stop_line_codes : np.ndarray
+        The codes, i.e. positions in `line_numbers`, of the lines serving each stop, stop i
+        being served by the lines from `stop_line_starts[i]` to `stop_line_starts[i + 1]`.
+    """
+
+    def __init__(self, routes_unified: pd.DataFrame):
+        routes = routes_unified.sort_values(["line_number", "order"], ignore_index=True)
+
+        self.line_numbers, line_codes = np.unique(
+            routes["line_number"].to_numpy(dtype=str), return_inverse=True
+        )
+        self.line_starts = np.searchsorted(line_codes, np.arange(len(self.line_numbers) + 1))
+
+        self.orders = routes["order"].to_numpy()
+        self.coordinates = routes[["latitude", "longitude"]].to_numpy(dtype=float)
+        self.chainages = routes["chainage"].to_numpy(dtype=float)
+        self.segment_lengths = routes["segment_length"].to_numpy(dtype=float)
+        self.bearings = routes["bearing"].to_numpy(dtype=float)
+
+        firsts = self.line_starts[:-1]
+        lasts = self.line_starts[1:] - 1
+
+        self.line_lengths = self.chainages[lasts] + haversine(
+            self.coordinates[lasts], self.coordinates[firsts]
+        )
+
+        # Chainages of different lines are made comparable by spacing lines a stride apart.
+        self.stride = 2 * self.line_lengths.max() + 1 if len(self.line_numbers) > 0 else 1.0
+        self.point_positions = line_codes * self.stride + self.chainages
+
+        # Occurrences of stops, grouped by (line, stop) and sorted by chainage within groups.
+        is_stop = routes["stop_number"].notna().to_numpy()
+        stop_numbers = routes.loc[is_stop, "stop_number"].to_numpy(dtype=str)
+
+        # Occurrences of stops in route order, with those of line i from `line_stop_starts[i]` on.
+        self.line_stop_numbers = stop_numbers
+        self.line_stop_chainages = self.chainages[is_stop]
+        self.line_stop_starts = np.searchsorted(
+            line_codes[is_stop], np.arange(len(self.line_numbers) + 1)
+        )
+
+        self.stop_numbers, stop_codes = np.unique(stop_numbers, return_inverse=True)
+
+        stop_groups = line_codes[is_stop] * len(self.stop_numbers) + stop_codes
+        stop_chainages = self.chainages[is_stop]
+
+        order = np.lexsort((stop_chainages, stop_groups))
+
+        self.stop_groups, group_ranks, group_counts = np.unique(
+            stop_groups[order], return_inverse=True, return_counts=True
+        )
+        self.group_starts = np.cumsum(group_counts) - group_counts
+        self.group_ends = np.cumsum(group_counts)
+
+        self.stop_chainages = stop_chainages[order]
+        self.stop_positions = group_ranks * self.stride + self.stop_chainages
+
+        # Lines serving each stop, with the lines of stop i from `stop_line_starts[i]` on.
+        n_stops = max(len(self.stop_numbers), 1)
+        self.stop_line_codes = (self.stop_groups // n_stops)[
+            np.argsort(self.stop_groups % n_stops, kind="stable")
+        ]
+        self.stop_line_starts = np.searchsorted(
+            np.sort(self.stop_groups % n_stops), np.arange(len(self.stop_numbers) + 1)
+        )
+
+    def get_line_slice(self, line_number: str) -> slice:
+        """
+        Get the positions of the points of a line.
+
+        Parameters
+        ----------
+        line_number : str
+            The line number.
+
+        Returns
+        -------
+        slice
+            The positions of the points of the line, empty if the line is not in the table.
+        """
+
+        code = encode(np.asarray([line_number], dtype=str), self.line_numbers)[0]
+
+        if code < 0:
+            return slice(0, 0)
+
+        return slice(self.line_starts[code], self.line_starts[code + 1])
+
+    def locate(self, line_numbers: np.ndarray, chainages: np.ndarray) -> np.ndarray:
+        """
+        Find the point starting the part of its route each chainage falls on.
+
+        Parameters
+        ----------
+        line_numbers : np.ndarray
+            Array of shape (n,) holding the line number of each chainage.
+        chainages : np.ndarray
+            Array of shape (n,) holding chainages, in meters.
+
+        Returns
+        -------
+        np.ndarray
+            The position of the last point of the line at or before each chainage, or -1 if the
+            line is unknown or the chainage is NaN.
+        """
+
+        codes = encode(np.asarray(line_numbers, dtype=str), self.line_numbers)
+        chainages = np.asarray(chainages, dtype=float)
+
+        valid = (codes >= 0) & np.isfinite(chainages)
+        positions = np.full(len(codes), -1)
+
+        found = np.searchsorted(
+            self.point_positions, codes[valid] * self.stride + chainages[valid], side="right"
+        )
+
+        # Chainages before the first point of their line fall on it.
+        positions[valid] = np.maximum(found - 1, self.line_starts[codes[valid]])
+
+        return positions
+
+    def get_stop_lines(self, stop_number: str) -> np.ndarray:
+        """
+        Get the line numbers serving a stop.
+
+        Parameters
+        ----------
+        stop_number : str
+            The stop number.
+
+        Returns
+        -------
+        np.ndarray
+            The sorted line numbers, empty if no line serves the stop.
+        """
+
+        code = encode(np.asarray([stop_number], dtype=str), self.stop_numbers)[0]
+
+        if code < 0:
+            return self.line_numbers[:0]
+
+        start, end = self.stop_line_starts[code], self.stop_line_starts[code + 1]
+
+        return self.line_numbers[self.stop_line_codes[start:end]]
+
+    def get_stop_chainages(self, line_number: str, stop_number: str) -> np.ndarray:
+        """
+        Get the chainages of every occurrence of a stop along the route of a line.
+
+        Parameters
+        ----------
+        line_number : str
+            The line number.
+        stop_number : str
+            The stop number.
+
+        Returns
+        -------
+        np.ndarray
+            The sorted chainages, in meters, empty if the stop is not on the line.
+        """
+
+        ranks = self.get_group_ranks(
+            encode(np.asarray([line_number], dtype=str), self.line_numbers),
+            encode(np.asarray([stop_number], dtype=str), self.stop_numbers),
+        )
+
+        if ranks[0] < 0:
+            return np.empty(0)
+
+        return self.stop_chainages[self.group_starts[ranks[0]] : self.group_ends[ranks[0]]]
+
+    def calculate_remaining_distances(
+        self, line_numbers: np.ndarray, chainages: np.ndarray, stop_numbers: np.ndarray
+    ) -> np.ndarray:
+        """
+        Calculate the distances along their routes from vehicles to the next occurrence of stops.
+
+        Parameters
+        ----------
+        line_numbers : np.ndarray
+            Array of shape (n,) holding the line number of each vehicle.
+        chainages : np.ndarray
+            Array of shape (n,) holding the chainage, in meters, of each vehicle, e.g. output by
+            `RouteMatcher.match`.
+        stop_numbers : np.ndarray
+            Array of shape (n,) holding the stop number for each vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The distances, in meters, wrapping around the loop of the line when the stop lies
+            behind the vehicle, or NaN if the stop is not on the line or the chainage is NaN.
+        """
+
+        line_codes = encode(np.asarray(line_numbers, dtype=str), self.line_numbers)
+        stop_codes = encode(np.asarray(stop_numbers, dtype=str), self.stop_numbers)
+
+        ranks = self.get_group_ranks(line_codes, stop_codes)
+
+        return self.calculate_group_distances(ranks, chainages)
+
+    def calculate_group_distances(self, ranks: np.ndarray, chainages: np.ndarray) -> np.ndarray:
+        """
+        Calculate remaining distances as `calculate_remaining_distances`, given group ranks.
+
+        Parameters
+        ----------
+        ranks : np.ndarray
+            Array of shape (n,) holding the (line, stop) group ranks, e.g. output by
+            `get_group_ranks`.
+        chainages : np.ndarray
+            Array of shape (n,) holding the chainage, in meters, of each vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The distances, in meters, or NaN if the rank is -1 or the chainage is NaN.
+        """
+
+        chainages = np.asarray(chainages, dtype=float)
+
+        valid = (ranks >= 0) & np.isfinite(chainages)
+        ranks, vehicle_chainages = ranks[valid], chainages[valid]
+
+        positions = np.searchsorted(self.stop_positions, ranks * self.stride + vehicle_chainages)
+        ahead = positions < self.group_ends[ranks]
+
+        # Stops behind the vehicle are reached on the next lap.
+        lines = self.stop_groups[ranks] // max(len(self.stop_numbers), 1)
+        stop_chainages = np.where(
+            ahead,
+            self.stop_chainages[np.minimum(positions, len(self.stop_chainages) - 1)],
+            self.stop_chainages[self.group_starts[ranks]] + self.line_lengths[lines],
+        )
+
+        distances = np.full(len(chainages), np.nan)
+        distances[valid] = stop_chainages - vehicle_chainages
+
+        return distances
+
+    def calculate_distance_between_stops(
+        self, line_number: str, origin_stop_number: str, destination_stop_number: str
+    ) -> float:
+        """
+        Calculate the shortest distance along the route of a line from one stop to another.
+
+        Parameters
+        ----------
+        line_number : str
+            The line number.
+        origin_stop_number, destination_stop_number : str
+            The stop numbers of the origin and destination.
+
+        Returns
+        -------
+        float
+            The distance, in meters, or NaN if either stop is not on the line.
+        """
+
+        origins = self.get_stop_chainages(line_number, origin_stop_number)
+
+        if len(origins) == 0:
+            return np.nan
+
+        distances = self.calculate_remaining_distances(
+            np.full(len(origins), line_number),
+            origins,
+            np.full(len(origins), destination_stop_number),
+        )
+
+        return float(distances.min())
+
+    def get_group_ranks(self, line_codes: np.ndarray, stop_codes: np.ndarray) -> np.ndarray:
+        """
+        Get the ranks of (line, stop) groups from the codes of their lines and stops.
+
+        Parameters
+        ----------
+        line_codes : np.ndarray
+            Array of shape (n,) holding positions in `line_numbers`, or -1.
+        stop_codes : np.ndarray
+            Array of shape (n,) holding positions in `stop_numbers`, or -1.
+
+        Returns
+        -------
+        np.ndarray
+            The rank of each group, or -1 if a code is -1 or the stop is not on the line.
+        """
+
+        groups = np.where(
+            (line_codes >= 0) & (stop_codes >= 0),
+            line_codes * len(self.stop_numbers) + stop_codes,
+            -1,
+        )
+
+        return encode(groups, self.stop_groups)
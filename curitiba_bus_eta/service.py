@@ -0,0 +1,466 @@
+"""Asynchronous HTTP service answering next-arrival queries from memory."""
+
+import argparse
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from curitiba_bus_eta.matching import RouteMatcher
+from curitiba_bus_eta.routes import RouteTable, encode
+
+
+class Snapshot:
+    """
+    The latest position of every vehicle at one instant, grouped by line.
+
+    Snapshots are never modified once built. Ingestion builds a new snapshot and swaps it in, so
+    that readers holding the previous one are neither blocked nor exposed to a partial update.
+
+    Parameters
+    ----------
+    routes : RouteTable
+        The routes the chainages refer to.
+    line_codes : np.ndarray
+        Array of shape (n,) holding the code, i.e. position in `routes.line_numbers`, of the line
+        of each vehicle.
+    fleet_numbers : np.ndarray
+        Array of shape (n,) holding the fleet number of each vehicle.
+    chainages : np.ndarray
+        Array of shape (n,) holding the chainage, in meters, of each vehicle.
+    speeds : np.ndarray
+        Array of shape (n,) holding the smoothed speed, in meters per second, of each vehicle.
+    update_times : np.ndarray
+        Array of shape (n,) holding the time, in seconds since the epoch, of each position.
+    """
+
+    def __init__(
+        self,
+        routes: RouteTable,
+        line_codes: np.ndarray,
+        fleet_numbers: np.ndarray,
+        chainages: np.ndarray,
+        speeds: np.ndarray,
+        update_times: np.ndarray,
+    ):
+        order = np.lexsort((fleet_numbers, line_codes))
+
+        self.routes = routes
+        self.line_codes = line_codes[order]
+        self.fleet_numbers = fleet_numbers[order]
+        self.chainages = chainages[order]
+        self.speeds = speeds[order]
+        self.update_times = update_times[order]
+
+        # The vehicles of line i occupy the positions from `line_starts[i]` on.
+        self.line_starts = np.searchsorted(
+            self.line_codes, np.arange(len(routes.line_numbers) + 1)
+        )
+
+        for array in (
+            self.line_codes,
+            self.fleet_numbers,
+            self.chainages,
+            self.speeds,
+            self.update_times,
+            self.line_starts,
+        ):
+            array.flags.writeable = False
+
+    @classmethod
+    def empty(cls, routes: RouteTable) -> "Snapshot":
+        """
+        Build a snapshot with no vehicles.
+
+        Parameters
+        ----------
+        routes : RouteTable
+            The routes the chainages refer to.
+
+        Returns
+        -------
+        Snapshot
+            The empty snapshot.
+        """
+
+        return cls(
+            routes,
+            line_codes=np.empty(0, dtype=np.int64),
+            fleet_numbers=np.empty(0, dtype=str),
+            chainages=np.empty(0),
+            speeds=np.empty(0),
+            update_times=np.empty(0),
+        )
+
+
+class ArrivalService:
+    """
+    Keep the latest positions of all vehicles in memory and predict their arrivals at stops.
+
+    The time to arrival of a vehicle at a stop is the distance along its route to the next
+    occurrence of the stop, divided by the smoothed speed of the vehicle, less the time since its
+    position was reported. Queries only read the current snapshot and take a fixed number of
+    vectorised passes, however many vehicles, stops and lines they involve.
+
+    Parameters
+    ----------
+    routes_unified : pd.DataFrame
+        Unified routes with chainages, e.g. `routes.routes_unified`.
+    max_distance : float, optional
+        The largest distance, in meters, between a location and its route for the location to
+        be ingested, by default 50.
+    default_speed : float, optional
+        The speed, in meters per second, of vehicles with no speed measured yet, by default 5.
+    min_speed, max_speed : float, optional
+        The range, in meters per second, speeds are clipped to, by default 1 and 25.
+    smoothing : float, optional
+        The weight of each new speed measurement in the smoothed speed, by default 0.3.
+    max_age : float, optional
+        The time, in seconds, after which a vehicle that has not reported is dropped, by default
+        600.
+    """
+
+    def __init__(
+        self,
+        routes_unified: pd.DataFrame,
+        max_distance: float = 50.0,
+        default_speed: float = 5.0,
+        min_speed: float = 1.0,
+        max_speed: float = 25.0,
+        smoothing: float = 0.3,
+        max_age: float = 600.0,
+    ):
+        self.max_distance = max_distance
+        self.default_speed = default_speed
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.smoothing = smoothing
+        self.max_age = max_age
+
+        self.routes = RouteTable(routes_unified)
+        self.matcher = RouteMatcher(routes_unified)
+        self.snapshot = Snapshot.empty(self.routes)
+
+        # Serializes writers; readers never take it.
+        self._lock = threading.Lock()
+
+    def ingest(self, locations: pd.DataFrame, now: float = None) -> int:
+        """
+        Snap new locations onto their routes and swap in a snapshot updated with them.
+
+        Only the latest location of each vehicle in the batch is kept, and locations no newer
+        than the one already held for their vehicle are ignored. Vehicles absent from the batch
+        keep their previous positions until they are older than `max_age`.
+
+        Parameters
+        ----------
+        locations : pd.DataFrame
+            Locations with columns fleet_number, update_datetime, line_number, latitude and
+            longitude, e.g. rows of `locations.locations`.
+        now : float, optional
+            The current time, in seconds since the epoch, by default the system time.
+
+        Returns
+        -------
+        int
+            The number of vehicles whose position has been updated.
+        """
+
+        now = time.time() if now is None else now
+
+        update_times = (
+            pd.to_datetime(locations["update_datetime"], utc=True) - pd.Timestamp(0, tz="UTC")
+        ) / pd.Timedelta(seconds=1)
+
+        # Keep the latest location of each vehicle.
+        latest = (
+            locations.assign(update_time=update_times.to_numpy())
+            .sort_values("update_time", kind="stable")
+            .drop_duplicates("fleet_number", keep="last")
+        )
+
+        segments, chainages, _ = self.matcher.match_arrays(
+            latest["line_number"].to_numpy(dtype=str),
+            latest[["latitude", "longitude"]].to_numpy(dtype=float),
+            max_distance=self.max_distance,
+        )
+
+        matched = segments >= 0
+        line_codes = encode(
+            latest["line_number"].to_numpy(dtype=str)[matched], self.routes.line_numbers
+        )
+        fleet_numbers = latest["fleet_number"].to_numpy(dtype=str)[matched]
+        chainages = chainages[matched]
+        update_times = latest["update_time"].to_numpy(dtype=float)[matched]
+
+        with self._lock:
+            previous = self.snapshot
+
+            prior = pd.Index(previous.fleet_numbers).get_indexer(fleet_numbers)
+            has_prior = prior >= 0
+
+            def get_prior(values: np.ndarray, fill) -> np.ndarray:
+                if len(values) == 0:
+                    return np.full(len(prior), fill)
+
+                return np.where(has_prior, values[prior], fill)
+
+            prior_times = get_prior(previous.update_times, -np.inf)
+            fresh = update_times > prior_times
+
+            # Speeds are measured forward along the loop, between positions on the same line.
+            same_line = get_prior(previous.line_codes, -1) == line_codes
+            lengths = self.routes.line_lengths[line_codes]
+
+            elapsed = update_times - prior_times
+            advanced = np.mod(chainages - get_prior(previous.chainages, 0.0), lengths)
+
+            measured = same_line & fresh & (advanced < lengths / 2)
+            measured_speeds = np.clip(
+                np.divide(advanced, elapsed, out=np.zeros(len(elapsed)), where=measured),
+                0,
+                self.max_speed,
+            )
+
+            prior_speeds = np.where(
+                same_line, get_prior(previous.speeds, self.default_speed), self.default_speed
+            )
+            speeds = np.where(
+                measured,
+                self.smoothing * measured_speeds + (1 - self.smoothing) * prior_speeds,
+                prior_speeds,
+            )
+
+            # Carry over recent vehicles that have not been updated.
+            kept = np.ones(len(previous.fleet_numbers), dtype=bool)
+            kept[prior[has_prior & fresh]] = False
+            kept &= previous.update_times >= now - self.max_age
+
+            self.snapshot = Snapshot(
+                self.routes,
+                line_codes=np.concatenate([previous.line_codes[kept], line_codes[fresh]]),
+                fleet_numbers=np.concatenate([previous.fleet_numbers[kept], fleet_numbers[fresh]]),
+                chainages=np.concatenate([previous.chainages[kept], chainages[fresh]]),
+                speeds=np.concatenate([previous.speeds[kept], speeds[fresh]]),
+                update_times=np.concatenate([previous.update_times[kept], update_times[fresh]]),
+            )
+
+        return int(fresh.sum())
+
+    def get_arrivals(
+        self, stop_numbers: list, line_number: str = None, limit: int = 3, now: float = None
+    ) -> list:
+        """
+        Predict the next arrivals at stops.
+
+        Parameters
+        ----------
+        stop_numbers : list
+            The stop numbers.
+        line_number : str, optional
+            The only line to consider, by default None, i.e. every line serving each stop.
+        limit : int, optional
+            The maximum number of arrivals per stop, by default 3.
+        now : float, optional
+            The current time, in seconds since the epoch, by default the system time.
+
+        Returns
+        -------
+        list
+            One dictionary per stop, in order, holding its stop number and its next arrivals,
+            soonest first, each with its line number, fleet number, distance, in meters, time
+            to arrival, in seconds, and arrival datetime.
+        """
+
+        snapshot = self.snapshot
+        routes = snapshot.routes
+        now = time.time() if now is None else now
+
+        stop_numbers = np.asarray(stop_numbers, dtype=str)
+        stop_codes = encode(stop_numbers, routes.stop_numbers)
+
+        # Enumerate the (stop, line) pairs.
+        if line_number is None:
+            known = stop_codes >= 0
+            starts = np.where(known, routes.stop_line_starts[stop_codes], 0)
+            counts = np.where(known, routes.stop_line_starts[stop_codes + 1] - starts, 0)
+
+            pair_stops = np.repeat(np.arange(len(stop_numbers)), counts)
+            pair_lines = routes.stop_line_codes[np.repeat(starts, counts) + _ranks(counts)]
+
+        else:
+            code = encode(np.asarray([line_number], dtype=str), routes.line_numbers)[0]
+            pair_stops = np.arange(len(stop_numbers)) if code >= 0 else np.empty(0, dtype=int)
+            pair_lines = np.full(len(pair_stops), code)
+
+        # Enumerate the (stop, vehicle) pairs.
+        starts = snapshot.line_starts[pair_lines]
+        counts = snapshot.line_starts[pair_lines + 1] - starts
+
+        vehicles = np.repeat(starts, counts) + _ranks(counts)
+        queries = np.repeat(pair_stops, counts)
+
+        ranks = routes.get_group_ranks(snapshot.line_codes[vehicles], stop_codes[queries])
+        distances = routes.calculate_group_distances(ranks, snapshot.chainages[vehicles])
+
+        ages = now - snapshot.update_times[vehicles]
+        etas = np.maximum(
+            distances / np.maximum(snapshot.speeds[vehicles], self.min_speed) - ages, 0
+        )
+
+        # Keep the soonest arrivals of each stop, from vehicles that are still reporting.
+        found = np.isfinite(etas) & (ages <= self.max_age)
+        vehicles, queries, distances, etas = (
+            vehicles[found],
+            queries[found],
+            distances[found],
+            etas[found],
+        )
+
+        order = np.lexsort((etas, queries))
+        counts = np.bincount(queries, minlength=len(stop_numbers))
+        order = order[_ranks(counts) < limit]
+
+        vehicles, etas = vehicles[order], etas[order]
+
+        # Columns are converted in bulk, leaving only dictionary assembly to Python.
+        columns = zip(
+            routes.line_numbers[snapshot.line_codes[vehicles]].tolist(),
+            snapshot.fleet_numbers[vehicles].tolist(),
+            np.round(distances[order], 1).tolist(),
+            np.round(etas, 1).tolist(),
+            np.datetime_as_string(
+                np.round(now + etas).astype("datetime64[s]"), timezone="UTC"
+            ).tolist(),
+        )
+        keys = ("line_number", "fleet_number", "distance", "eta", "arrival_datetime")
+
+        arrivals = [[] for _ in stop_numbers]
+
+        for query, values in zip(queries[order].tolist(), columns):
+            arrivals[query].append(dict(zip(keys, values)))
+
+        return [
+            {"stop_number": str(stop_number), "arrivals": stop_arrivals}
+            for stop_number, stop_arrivals in zip(stop_numbers, arrivals)
+        ]
+
+
+def _ranks(counts: np.ndarray) -> np.ndarray:
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _get_limit(value) -> int:
+    try:
+        return int(value)
+
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(text="limit must be an integer.")
+
+
+async def _read_json(request: web.Request):
+    try:
+        return await request.json()
+
+    except ValueError:
+        raise web.HTTPBadRequest(text="The request body must be JSON.")
+
+
+def create_app(service: ArrivalService) -> web.Application:
+    """
+    Create the HTTP application serving a service.
+
+    Routes are:
+
+    - GET /stops/{stop_number}/arrivals: the next arrivals of any line at a stop.
+    - GET /lines/{line_number}/stops/{stop_number}/arrivals: the next arrivals of a line at a
+      stop.
+    - POST /arrivals: the next arrivals at many stops, given a JSON object with stop_numbers
+      and, optionally, line_number and limit.
+    - POST /locations: ingest a JSON list of locations, without blocking queries.
+
+    Parameters
+    ----------
+    service : ArrivalService
+        The service answering queries.
+
+    Returns
+    -------
+    web.Application
+        The application.
+    """
+
+    async def get_stop_arrivals(request: web.Request) -> web.Response:
+        arrivals = service.get_arrivals(
+            [request.match_info["stop_number"]], limit=_get_limit(request.query.get("limit", 3))
+        )
+
+        return web.json_response(arrivals[0])
+
+    async def get_line_stop_arrivals(request: web.Request) -> web.Response:
+        arrivals = service.get_arrivals(
+            [request.match_info["stop_number"]],
+            line_number=request.match_info["line_number"],
+            limit=_get_limit(request.query.get("limit", 3)),
+        )
+
+        return web.json_response(arrivals[0])
+
+    async def post_arrivals(request: web.Request) -> web.Response:
+        body = await _read_json(request)
+
+        if not isinstance(body, dict) or not isinstance(body.get("stop_numbers"), list):
+            raise web.HTTPBadRequest(text="stop_numbers must be a list.")
+
+        arrivals = service.get_arrivals(
+            body["stop_numbers"],
+            line_number=body.get("line_number"),
+            limit=_get_limit(body.get("limit", 3)),
+        )
+
+        return web.json_response(arrivals)
+
+    async def post_locations(request: web.Request) -> web.Response:
+        body = await _read_json(request)
+
+        if not isinstance(body, list):
+            raise web.HTTPBadRequest(text="locations must be a list.")
+
+        # Matching runs in a worker thread, so that queries keep being served meanwhile.
+        updated = await asyncio.get_running_loop().run_in_executor(
+            None, service.ingest, pd.DataFrame.from_records(body)
+        )
+
+        return web.json_response({"updated": updated})
+
+    app = web.Application()
+    app.router.add_get("/stops/{stop_number}/arrivals", get_stop_arrivals)
+    app.router.add_get("/lines/{line_number}/stops/{stop_number}/arrivals", get_line_stop_arrivals)
+    app.router.add_post("/arrivals", post_arrivals)
+    app.router.add_post("/locations", post_locations)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("routes", help="A Parquet or CSV export of routes.routes_unified.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+
+    args = parser.parse_args()
+
+    if args.routes.endswith(".csv"):
+        routes_unified = pd.read_csv(args.routes, dtype={"line_number": str, "stop_number": str})
+
+    else:
+        routes_unified = pd.read_parquet(args.routes)
+
+    web.run_app(create_app(ArrivalService(routes_unified)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
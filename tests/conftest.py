@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from curitiba_bus_eta.geometry import EARTH_RADIUS
+
+
+def make_route(
+    line_number: str, stop_numbers: list, spacing: float = 100.0, latitude: float = -25.43
+) -> pd.DataFrame:
+    """
+    Make the unified route of a line running straight east, one point every `spacing` meters.
+    """
+
+    chainages = spacing * np.arange(len(stop_numbers))
+    longitudes = -49.27 + np.degrees(chainages / (EARTH_RADIUS * np.cos(np.radians(latitude))))
+
+    return pd.DataFrame(
+        {
+            "line_number": line_number,
+            "order": np.arange(len(stop_numbers)),
+            "latitude": latitude,
+            "longitude": longitudes,
+            "stop_number": stop_numbers,
+            "chainage": chainages,
+            "segment_length": np.append(np.diff(chainages), np.nan),
+            "bearing": 90.0,
+        }
+    )
+
+
+@pytest.fixture(name="make_route")
+def make_route_fixture():
+    return make_route
+
+
+@pytest.fixture
+def routes_unified() -> pd.DataFrame:
+    """
+    Two lines: 216, whose loop passes stop S1 twice, and 303, about 1 km north of it.
+    """
+
+    return pd.concat(
+        [
+            make_route("303", ["S2", None, "S3"], latitude=-25.42),
+            make_route("216", ["S1", None, "S2", None, "S1"]),
+        ],
+        ignore_index=True,
+    )
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules of a Cloud Function import each other by their bare names.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'cloud' / 'ingest_locations'))
@@ -0,0 +1,39 @@
+import datetime as dt
+import archive
+
+
+class FakeResponse:
+    def __init__(self, date: str, text: str):
+        self.headers = {'Date': date}
+        self.status_code = 200
+        self.text = text
+
+
+def test_writes_one_new_segment_per_partition_at_each_flush(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'archive_path', str(tmp_path))
+    monkeypatch.setattr(archive, 'buffer', {})
+
+    archive.archive_response(endpoint='getVeiculos', line_number='216', r=FakeResponse('Wed, 12 Jun 2024 13:01:00 GMT', '{"a": 1}'))
+    archive.archive_response(endpoint='getVeiculos', line_number='216', r=FakeResponse('Wed, 12 Jun 2024 13:02:00 GMT', '{"a": 2}'))
+    archive.archive_response(endpoint='getVeiculos', line_number='216', r=FakeResponse('Wed, 12 Jun 2024 14:01:00 GMT', '{"a": 3}'))
+
+    # Only the hour that has ended is written.
+    assert archive.flush_archive(before=dt.datetime(2024, 6, 12, 14, 30)) == 1
+    assert len(list(tmp_path.rglob('*.jsonl.gz'))) == 1
+
+    archive.archive_response(endpoint='getVeiculos', line_number='216', r=FakeResponse('Wed, 12 Jun 2024 14:02:00 GMT', '{"a": 4}'))
+
+    assert archive.flush_archive() == 1
+    assert archive.flush_archive() == 0
+
+    segments = archive.list_segments(
+        endpoint='getVeiculos',
+        start=dt.datetime(2024, 6, 12, 13),
+        end=dt.datetime(2024, 6, 12, 15)
+    )
+
+    assert len(segments) == 2
+    assert [
+        [record['body'] for record in archive.read_segment(path=segment)]
+        for segment in segments
+    ] == [['{"a": 1}', '{"a": 2}'], ['{"a": 3}', '{"a": 4}']]
@@ -0,0 +1,157 @@
+import json
+import pandas as pd
+import pytest
+
+pytest.importorskip('google.cloud.bigquery')
+pytest.importorskip('google.cloud.secretmanager')
+
+import poll  # noqa: E402
+import urbs  # noqa: E402
+
+
+class StopPolling(Exception):
+    pass
+
+
+class FakeTime:
+    '''
+    A clock that advances only when slept on, stopping the poller after a
+    number of ticks.
+    '''
+
+    def __init__(self, ticks: int):
+        self.now = 0.0
+        self.ticks = ticks
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.ticks -= 1
+
+        if self.ticks == 0:
+            raise StopPolling()
+
+        self.now += max(seconds, 1)
+
+
+class FlakySink:
+    '''
+    A sink that rejects its first writes.
+    '''
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.batches = []
+
+    def write(self, batch: pd.DataFrame, row_ids: list):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError('sink unavailable')
+
+        self.batches.append(batch)
+
+
+def make_result(line_number: str, minute: int, drop: str = None) -> urbs.Result:
+    vehicle = {
+        'COD': 'BC{0}'.format(line_number),
+        'REFRESH': '12:{0:02d}'.format(minute),
+        'LAT': '-25.43',
+        'LON': '-49.27',
+        'CODIGOLINHA': line_number,
+        'ADAPT': '1',
+        'TIPO_VEIC': '3',
+        'TABELA': '1',
+        'SITUACAO': 'NO HORÁRIO',
+        'SITUACAO2': 'REALIZANDO ROTA',
+        'SENT': 'IDA',
+        'TCOUNT': '1',
+        'SENTIDO': 'Centro'
+    }
+
+    if drop is not None:
+        del vehicle[drop]
+
+    data = {'0': vehicle}
+
+    return urbs.Result(
+        endpoint='getVeiculos',
+        line_number=line_number,
+        status_code=200,
+        date='Wed, 12 Jun 2024 15:59:00 GMT',
+        content=json.dumps(data).encode(),
+        data=data
+    )
+
+
+@pytest.fixture
+def polled(monkeypatch):
+    '''
+    Stub the API and BigQuery around poll_locations, and return the calls
+    made to them.
+    '''
+
+    calls = {'fetch': [], 'store': []}
+
+    def fetch_locations_response(line_number, timeout):
+        calls['fetch'].append(line_number)
+        minute = calls['fetch'].count(line_number)
+
+        if line_number == 'raises':
+            raise RuntimeError('connection reset')
+
+        if line_number == 'malformed':
+            return make_result(line_number=line_number, minute=minute, drop='SENTIDO')
+
+        return make_result(line_number=line_number, minute=minute)
+
+    store_failures = [RuntimeError('quota exceeded')]
+
+    def store_last_seen(last_seen):
+        if len(store_failures) > 0:
+            raise store_failures.pop()
+
+        calls['store'].append(last_seen)
+
+    empty = pd.DataFrame(columns=['fleet_number', 'update_datetime', 'latitude', 'longitude'])
+
+    monkeypatch.setattr(poll, 'fetch_locations_response', fetch_locations_response)
+    monkeypatch.setattr(poll, 'fetch_last_seen', lambda: empty)
+    monkeypatch.setattr(poll, 'fetch_recent_locations', lambda hours: empty)
+    monkeypatch.setattr(poll, 'store_last_seen', store_last_seen)
+
+    return calls
+
+
+def test_poller_survives_failing_lines_and_sinks(monkeypatch, polled):
+    fake_time = FakeTime(ticks=5)
+    monkeypatch.setattr(poll, 'time', fake_time)
+
+    sink = FlakySink(failures=1)
+
+    with pytest.raises(StopPolling):
+        poll.poll_locations(
+            line_numbers=['216', 'raises', 'malformed'],
+            min_interval=1,
+            max_interval=4,
+            max_workers=2,
+            max_seconds=0,
+            sink=sink
+        )
+
+    # Every line is rescheduled: the failing ones are backed off, and the
+    # healthy one is polled at each tick.
+    assert polled['fetch'].count('216') == 5
+    assert 1 < polled['fetch'].count('raises') < 5
+    assert 1 < polled['fetch'].count('malformed') < 5
+
+    # The batch rejected by the sink is kept and written at the next tick,
+    # with nothing from the failing lines.
+    written = pd.concat(objs=sink.batches, ignore_index=True)
+
+    assert written['line_number'].to_list() == ['216'] * 5
+    assert written['update_datetime'].is_unique
+
+    # The last-seen index is stored once its first update has been retried.
+    assert len(polled['store']) > 0
+    assert polled['store'][-1]['update_datetime'].max() == written['update_datetime'].max()
@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('google.cloud.bigquery')
+
+from fetch import fingerprint_locations  # noqa: E402
+from state import drop_seen_locations, fold_last_seen, summarize_last_seen  # noqa: E402
+
+
+def make_locations(rows: list) -> pd.DataFrame:
+    locations = pd.DataFrame(
+        data=rows,
+        columns=['fleet_number', 'update_datetime', 'latitude', 'longitude']
+    )
+    locations['update_datetime'] = pd.to_datetime(locations['update_datetime']).dt.tz_localize('America/Sao_Paulo')
+    locations['line_number'] = '216'
+
+    return locations
+
+
+def test_keeps_locations_whose_values_are_seen_on_other_vehicles():
+    last_seen = summarize_last_seen(
+        locations=make_locations(
+            rows=[
+                ('AA001', '2024-06-12 10:00', -25.40, -49.20),
+                ('AA002', '2024-06-12 10:01', -25.50, -49.30),
+            ]
+        )
+    )
+
+    # Every value of the new location appears in the last-seen index, but
+    # never all on the same vehicle: four independent isin checks used to
+    # drop it.
+    set_of_locations = make_locations(
+        rows=[
+            ('AA001', '2024-06-12 10:01', -25.50, -49.30),
+        ]
+    )
+
+    kept = drop_seen_locations(last_seen=last_seen, set_of_locations=set_of_locations)
+
+    pd.testing.assert_frame_equal(kept, set_of_locations)
+
+
+def test_keeps_moved_locations_with_the_same_update_time():
+    last_seen = summarize_last_seen(
+        locations=make_locations(rows=[('AA001', '2024-06-12 10:00', -25.40, -49.20)])
+    )
+    set_of_locations = make_locations(rows=[('AA001', '2024-06-12 10:00', -25.41, -49.20)])
+
+    kept = drop_seen_locations(last_seen=last_seen, set_of_locations=set_of_locations)
+
+    assert kept.shape[0] == 1
+
+
+def test_drops_true_duplicates():
+    last_seen = summarize_last_seen(
+        locations=make_locations(
+            rows=[
+                ('AA001', '2024-06-12 10:00', -25.40, -49.20),
+                ('AA002', '2024-06-12 10:01', -25.50, -49.30),
+            ]
+        )
+    )
+    set_of_locations = make_locations(
+        rows=[
+            ('AA001', '2024-06-12 10:00', -25.40, -49.20),
+            ('AA002', '2024-06-12 09:59', -25.45, -49.25),
+            ('AA003', '2024-06-12 10:02', -25.60, -49.10),
+            ('AA003', '2024-06-12 10:02', -25.60, -49.10),
+        ]
+    )
+
+    kept = drop_seen_locations(last_seen=last_seen, set_of_locations=set_of_locations)
+
+    assert kept['fleet_number'].to_list() == ['AA003']
+
+
+def test_matches_last_seen_read_back_with_other_dtypes():
+    # Locations parsed from the API hold float32 coordinates, while the
+    # last-seen index read back from BigQuery holds float64 coordinates in
+    # UTC.
+    set_of_locations = make_locations(rows=[('AA001', '2024-06-12 10:00', -25.4321, -49.2765)])
+    set_of_locations[['latitude', 'longitude']] = set_of_locations[['latitude', 'longitude']].astype('float32')
+
+    last_seen = summarize_last_seen(locations=set_of_locations)
+    last_seen[['latitude', 'longitude']] = last_seen[['latitude', 'longitude']].astype('float64')
+    last_seen['update_datetime'] = last_seen['update_datetime'].dt.tz_convert('UTC')
+
+    kept = drop_seen_locations(last_seen=last_seen, set_of_locations=set_of_locations)
+
+    assert kept.shape[0] == 0
+
+
+def test_folds_fingerprints_of_new_locations_only_into_last_seen():
+    last_seen = summarize_last_seen(
+        locations=make_locations(
+            rows=[
+                ('AA001', '2024-06-12 10:00', -25.40, -49.20),
+                ('AA002', '2024-06-12 10:01', -25.50, -49.30),
+            ]
+        )
+    )
+    set_of_locations = make_locations(rows=[('AA001', '2024-06-12 10:02', -25.41, -49.21)])
+
+    last_seen = fold_last_seen(last_seen=last_seen, set_of_locations=set_of_locations)
+
+    assert last_seen['update_datetime'].dt.minute.to_list() == [1, 2]
+    assert last_seen['fingerprint'].to_list() == fingerprint_locations(locations=last_seen).to_list()
+
+    # The folded location is now the one already seen.
+    kept = drop_seen_locations(last_seen=last_seen, set_of_locations=set_of_locations)
+
+    assert kept.shape[0] == 0
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('google.cloud.bigquery')
+
+from write import LocationsWriter, ParquetSink  # noqa: E402
+
+
+def make_locations(fleet_numbers: list, minute: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        data={
+            'fleet_number': fleet_numbers,
+            'update_datetime': pd.Timestamp('2024-06-12 10:00', tz='America/Sao_Paulo') + pd.Timedelta(minutes=minute),
+            'latitude': -25.43,
+            'longitude': -49.27,
+            'line_number': '216'
+        }
+    )
+
+
+class FailingSink:
+    '''
+    A sink that writes to another sink and then reports a failure, as a
+    write whose acknowledgement is lost.
+    '''
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.failures = 1
+
+    def write(self, batch: pd.DataFrame, row_ids: list):
+        self.sink.write(batch=batch, row_ids=row_ids)
+
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError('acknowledgement lost')
+
+
+def test_flushes_when_the_buffer_is_full(tmp_path):
+    writer = LocationsWriter(sink=ParquetSink(path=tmp_path), max_rows=3, max_seconds=3600)
+
+    assert writer.write(set_of_locations=make_locations(['AA001', 'AA002'], minute=0)) is None
+    assert len(list(tmp_path.glob('*.parquet'))) == 0
+
+    batch = writer.write(set_of_locations=make_locations(['AA001', 'AA002'], minute=1))
+
+    assert batch.shape[0] == 4
+    assert pd.read_parquet(tmp_path).shape[0] == 4
+    assert writer.buffered_rows == 0
+
+
+def test_retried_flush_overwrites_the_same_file(tmp_path):
+    writer = LocationsWriter(sink=FailingSink(sink=ParquetSink(path=tmp_path)))
+
+    # Duplicates within the buffer are written once.
+    writer.append(set_of_locations=make_locations(['AA001', 'AA002'], minute=0))
+    writer.append(set_of_locations=make_locations(['AA002', 'AA003'], minute=0))
+
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+    # The failed batch stays buffered, and writing it again yields the same
+    # row IDs, hence the same file.
+    assert writer.buffered_rows == 4
+
+    batch = writer.flush()
+
+    assert batch.shape[0] == 3
+    assert len(list(tmp_path.glob('*.parquet'))) == 1
+    assert sorted(pd.read_parquet(tmp_path)['fleet_number']) == ['AA001', 'AA002', 'AA003']
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("dotenv")
+
+from curitiba_bus_eta.dataset import (  # noqa: E402
+    LOCATIONS_TABLE,
+    LocalBackend,
+    export_dataset,
+    read_dataset_table,
+    read_state,
+)
+
+
+def make_locations(n_rows: int) -> pd.DataFrame:
+    update_datetimes = pd.date_range("2024-06-12 10:00", periods=n_rows, freq="min", tz="UTC")
+
+    locations = pd.DataFrame(
+        {
+            "fleet_number": "AA001",
+            "update_datetime": update_datetimes,
+            "latitude": -25.43,
+            "longitude": -49.27,
+            "line_number": "216",
+            "wheelchair_accessibility": pd.array([None] * n_rows, dtype="Int64"),
+            "bus_type": None,
+            "timetable": pd.array([None] * n_rows, dtype="Int64"),
+            "status_time": None,
+            "status_route": None,
+            "direction": "Terminal Boqueirão",
+            "cycle_count": 1,
+            "destination": None,
+        }
+    )
+
+    return locations
+
+
+def test_exports_nullable_columns_that_are_all_null_on_the_first_page(tmp_path):
+    locations = make_locations(n_rows=12)
+
+    # The nullable columns only get values after the first page of 5 rows.
+    later = locations.index >= 7
+    locations.loc[later, "destination"] = "Centro"
+    locations.loc[later, "bus_type"] = "Padron"
+    locations.loc[later, "status_time"] = "ADIANTADO"
+    locations.loc[later, "status_route"] = "NA ROTA"
+    locations.loc[later, "wheelchair_accessibility"] = 1
+    locations.loc[later, "timetable"] = 42
+
+    tables = tmp_path / "tables"
+    tables.mkdir()
+    locations.to_parquet(tables / f"{LOCATIONS_TABLE}.parquet", index=False)
+
+    now = pd.Timestamp("2024-06-13 00:00", tz="UTC")
+    rows = export_dataset(
+        LocalBackend(tables, page_size=5), tmp_path / "raw", tables=["locations"], now=now
+    )
+
+    # The export went through, so the high-water mark reached the settled end of the window.
+    state = read_state(tmp_path / "raw")
+
+    assert rows == {"locations": 12}
+    assert state["locations"]["high_water_mark"] == (now - pd.Timedelta(minutes=15)).isoformat()
+
+    exported = read_dataset_table("locations", tmp_path / "raw").sort_values("update_datetime")
+
+    assert exported["destination"].tolist() == [None] * 7 + ["Centro"] * 5
+    assert exported["timetable"].isna().sum() == 7
+    assert (exported["timetable"].dropna() == 42).all()
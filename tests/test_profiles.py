@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from curitiba_bus_eta.profiles import ProfileStore
+from curitiba_bus_eta.routes import RouteTable
+
+T0 = 1718200000.0
+
+
+def make_pings(rows: list) -> pd.DataFrame:
+    """
+    Make matched locations of line 100 from (fleet_number, chainage, update_time) rows.
+    """
+
+    fleet_numbers, chainages, update_times = zip(*rows)
+
+    return pd.DataFrame(
+        {
+            "fleet_number": fleet_numbers,
+            "line_number": "100",
+            "chainage": chainages,
+            "update_datetime": pd.to_datetime(update_times, unit="s", utc=True),
+        }
+    )
+
+
+@pytest.fixture
+def store(tmp_path, make_route) -> ProfileStore:
+    # Five stops 100 m apart, the loop closing 400 m back west.
+    routes_unified = make_route("100", ["S1", "S2", "S3", "S4", "S5"])
+
+    return ProfileStore(str(tmp_path / "profiles"), RouteTable(routes_unified))
+
+
+def test_adds_no_traversals_when_a_batch_is_run_again(store):
+    # One vehicle at 10 m/s along the four segments, another reporting an hour later.
+    pings = make_pings(
+        [("AA001", chainage, T0 + chainage / 10) for chainage in range(0, 410, 20)]
+        + [("BB001", 10.0, T0 + 3600)]
+    )
+
+    assert store.update(pings) == 3
+    assert store.update(pings) == 0
+    assert store.count.sum() == 3
+
+    # The state survives reopening the store.
+    reopened = ProfileStore(store.path, store.routes)
+
+    assert reopened.update(pings) == 0
+    assert sorted(reopened.vehicles["fleet_numbers"]) == ["AA001", "BB001"]
+
+
+def test_counts_a_traversal_spanning_two_batches_once(store):
+    rows = [("AA001", chainage, T0 + chainage / 10) for chainage in range(0, 410, 20)]
+
+    # S1 is not crossed, as the vehicle starts on it. The first batch ends between S3 and S4.
+    assert store.update(make_pings(rows[:13])) == 1
+    assert store.update(make_pings(rows[13:])) == 2
+
+    segments = store.get_segments(np.zeros(3, dtype=int), np.array([150.0, 250.0, 350.0]))
+    counts, means, _ = store.lookup(segments, np.full(3, T0))
+
+    assert counts.tolist() == [1, 1, 1]
+    assert means == pytest.approx([10, 10, 10])
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from curitiba_bus_eta.routes import RouteTable
+
+
+@pytest.fixture
+def table(routes_unified) -> RouteTable:
+    return RouteTable(routes_unified)
+
+
+def test_closes_the_loop_of_each_line(table):
+    # 216 runs 400 m east and closes its loop 400 m back west.
+    assert table.line_numbers.tolist() == ["216", "303"]
+    np.testing.assert_allclose(table.line_lengths, [800, 400], rtol=1e-3)
+
+
+def test_calculates_the_distance_to_a_stop_ahead(table):
+    distances = table.calculate_remaining_distances(
+        np.array(["216", "216", "303"]),
+        np.array([50.0, 200.0, 20.0]),
+        np.array(["S2", "S2", "S3"]),
+    )
+
+    np.testing.assert_allclose(distances, [150, 0, 180])
+
+
+def test_wraps_around_the_loop_to_a_stop_behind(table):
+    distances = table.calculate_remaining_distances(
+        np.array(["216", "303"]), np.array([250.0, 250.0]), np.array(["S2", "S2"])
+    )
+
+    np.testing.assert_allclose(distances, table.line_lengths - [50, 250])
+
+
+def test_goes_to_the_next_occurrence_of_a_repeated_stop(table):
+    distances = table.calculate_remaining_distances(
+        np.full(3, "216"), np.array([0.0, 50.0, 410.0]), np.full(3, "S1")
+    )
+
+    # S1 lies at chainages 0 and 400; past the last, the first is reached on the next lap.
+    np.testing.assert_allclose(distances, [0, 350, table.line_lengths[0] - 410])
+    np.testing.assert_allclose(table.get_stop_chainages("216", "S1"), [0, 400])
+
+
+def test_returns_nan_for_nan_and_unknown_inputs(table):
+    distances = table.calculate_remaining_distances(
+        np.array(["216", "999", "216", "303"]),
+        np.array([np.nan, 50.0, 50.0, 50.0]),
+        np.array(["S2", "S2", "S9", "S1"]),
+    )
+
+    assert np.isnan(distances).all()
+
+
+def test_agrees_with_a_linear_scan(make_route):
+    rng = np.random.default_rng(0)
+    stops = np.array(["A", "B", "C", "D"])
+
+    routes_unified = make_route("100", list(rng.choice(stops, 40)) + ["E"])
+    table = RouteTable(routes_unified)
+
+    chainages = rng.uniform(0, 4000, 200)
+    stop_numbers = rng.choice(stops, 200)
+
+    distances = table.calculate_remaining_distances(np.full(200, "100"), chainages, stop_numbers)
+
+    for chainage, stop_number, distance in zip(chainages, stop_numbers, distances):
+        occurrences = routes_unified.loc[routes_unified["stop_number"] == stop_number, "chainage"]
+        expected = ((occurrences - chainage) % table.line_lengths[0]).min()
+
+        assert distance == pytest.approx(expected)
+
+
+def test_locates_chainages_on_their_line(table):
+    positions = table.locate(
+        np.array(["216", "216", "216", "216", "303", "999", "216"]),
+        np.array([150.0, 100.0, -5.0, 1000.0, 150.0, 50.0, np.nan]),
+    )
+
+    # The points of 216 come first, at positions 0 to 4, then those of 303.
+    assert positions.tolist() == [1, 1, 0, 4, 6, -1, -1]
+
+
+def test_calculates_the_distance_between_stops(table):
+    assert table.calculate_distance_between_stops("216", "S2", "S1") == pytest.approx(200)
+
+    # From either occurrence of S1, the nearest is the one at chainage 0.
+    assert table.calculate_distance_between_stops("216", "S1", "S2") == pytest.approx(200)
+    assert table.calculate_distance_between_stops("303", "S3", "S2") == pytest.approx(
+        table.line_lengths[1] - 200
+    )
+
+    assert np.isnan(table.calculate_distance_between_stops("216", "S1", "S3"))
+    assert np.isnan(table.calculate_distance_between_stops("216", "S3", "S1"))
+    assert np.isnan(table.calculate_distance_between_stops("999", "S1", "S2"))
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from curitiba_bus_eta.geometry import EARTH_RADIUS  # noqa: E402
+from curitiba_bus_eta.service import ArrivalService  # noqa: E402
+
+# The latitudes of the routes of the fixture, which run straight east from -49.27.
+LATITUDES = {"216": -25.43, "303": -25.42}
+
+T0 = 1718200000.0
+
+
+def make_locations(rows: list) -> pd.DataFrame:
+    """
+    Make locations from (fleet_number, line_number, chainage, update_time) rows.
+    """
+
+    fleet_numbers, line_numbers, chainages, update_times = zip(*rows)
+    latitudes = np.array([LATITUDES[line_number] for line_number in line_numbers])
+
+    return pd.DataFrame(
+        {
+            "fleet_number": fleet_numbers,
+            "update_datetime": pd.to_datetime(update_times, unit="s", utc=True),
+            "line_number": line_numbers,
+            "latitude": latitudes,
+            "longitude": -49.27
+            + np.degrees(np.array(chainages) / (EARTH_RADIUS * np.cos(np.radians(latitudes)))),
+        }
+    )
+
+
+@pytest.fixture
+def service(routes_unified) -> ArrivalService:
+    return ArrivalService(routes_unified)
+
+
+def get_arrivals(service: ArrivalService, stop_number: str, **kwargs) -> list:
+    return service.get_arrivals([stop_number], **kwargs)[0]["arrivals"]
+
+
+def test_predicts_arrivals_at_the_default_speed(service):
+    assert service.ingest(make_locations([("AA001", "216", 50, T0)]), now=T0) == 1
+
+    (arrival,) = get_arrivals(service, "S2", now=T0 + 10)
+
+    assert arrival["line_number"] == "216"
+    assert arrival["fleet_number"] == "AA001"
+    assert arrival["distance"] == pytest.approx(150, abs=0.1)
+
+    # 150 m at 5 m/s, reported 10 s ago.
+    assert arrival["eta"] == pytest.approx(20, abs=0.1)
+
+
+def test_smooths_speeds_between_reports(service):
+    service.ingest(make_locations([("AA001", "216", 0, T0)]), now=T0)
+    service.ingest(make_locations([("AA001", "216", 100, T0 + 10)]), now=T0 + 10)
+
+    # 10 m/s measured, weighted 0.3 against the default 5 m/s.
+    assert service.snapshot.speeds.tolist() == pytest.approx([6.5])
+
+    (arrival,) = get_arrivals(service, "S2", now=T0 + 10)
+
+    assert arrival["eta"] == pytest.approx(100 / 6.5, abs=0.1)
+
+
+def test_ignores_locations_no_newer_than_those_held(service):
+    service.ingest(make_locations([("AA001", "216", 100, T0)]), now=T0)
+
+    assert service.ingest(make_locations([("AA001", "216", 50, T0 - 60)]), now=T0) == 0
+    assert service.snapshot.chainages.tolist() == pytest.approx([100], abs=0.1)
+
+
+def test_wraps_around_the_loop_to_a_stop_behind(service):
+    service.ingest(make_locations([("AA001", "216", 300, T0)]), now=T0)
+
+    (arrival,) = get_arrivals(service, "S2", now=T0)
+
+    assert arrival["distance"] == pytest.approx(service.routes.line_lengths[0] - 100, abs=0.1)
+
+
+def test_returns_no_arrivals_for_unknown_stops_and_lines(service):
+    service.ingest(make_locations([("AA001", "216", 50, T0)]), now=T0)
+
+    results = service.get_arrivals(["S9", "S2"], now=T0)
+
+    assert results[0] == {"stop_number": "S9", "arrivals": []}
+    assert len(results[1]["arrivals"]) == 1
+
+    assert get_arrivals(service, "S2", line_number="999", now=T0) == []
+    assert get_arrivals(service, "S3", line_number="216", now=T0) == []
+
+
+def test_filters_by_line_and_limits_arrivals_soonest_first(service):
+    service.ingest(
+        make_locations(
+            [
+                ("AA001", "216", 0, T0),
+                ("AA002", "216", 150, T0),
+                ("AA003", "216", 100, T0),
+                ("BB001", "303", 100, T0),
+            ]
+        ),
+        now=T0,
+    )
+
+    arrivals = get_arrivals(service, "S2", limit=2, now=T0)
+
+    assert [arrival["fleet_number"] for arrival in arrivals] == ["AA002", "AA003"]
+
+    arrivals = get_arrivals(service, "S2", line_number="303", now=T0)
+
+    assert [arrival["fleet_number"] for arrival in arrivals] == ["BB001"]
+
+
+def test_expires_vehicles_that_stop_reporting(service):
+    service.ingest(make_locations([("AA001", "216", 50, T0), ("AA002", "216", 0, T0)]), now=T0)
+
+    assert len(get_arrivals(service, "S2", now=T0 + service.max_age)) == 2
+    assert get_arrivals(service, "S2", now=T0 + service.max_age + 1) == []
+
+    # Vehicles older than max_age are dropped at the next ingestion.
+    later = T0 + service.max_age + 1
+    service.ingest(make_locations([("AA001", "216", 100, later)]), now=later)
+
+    assert service.snapshot.fleet_numbers.tolist() == ["AA001"]
+
+
+def test_ignores_locations_off_route(service):
+    locations = make_locations([("AA001", "216", 50, T0)])
+    locations["latitude"] += 0.001
+
+    assert service.ingest(locations, now=T0) == 0
+    assert get_arrivals(service, "S2", now=T0) == []